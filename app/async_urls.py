@@ -0,0 +1,35 @@
+from django.urls import path
+from . import async_views, views
+
+# Same routes as app/urls.py, with the async variants where they exist, plus the
+# event streams, which only ASGI can hold open without tying up a worker
+urlpatterns = [
+    path("", views.api),
+    path("metrics/", views.metrics, name="metrics"),
+    path("auth/register/", async_views.register_user, name="register_user"),
+    path("auth/login/", async_views.login_user, name="login_user"),
+    path("auth/logout/", views.logout_user, name="logout_user"),
+    path("questions/", async_views.questions, name="questions"),
+    path("questions/bulk/", views.questions_bulk, name="questions_bulk"),
+    path("me/questions/", views.my_questions, name="my_questions"),
+    path("me/answers/", views.my_answers, name="my_answers"),
+    path("me/notifications/", views.my_notifications, name="my_notifications"),
+    path("questions/search/", views.search_questions, name="search_questions"),
+    path("answers/bulk/", views.answers_bulk, name="answers_bulk"),
+    path(
+        "questions/<int:question_id>/",
+        async_views.question_detail,
+        name="question_detail",
+    ),
+    path(
+        "questions/<int:question_id>/events/",
+        async_views.question_events,
+        name="question_events",
+    ),
+    path("questions/<int:question_id>/answers/", async_views.answers, name="answers"),
+    path(
+        "questions/<int:question_id>/answers/<int:answer_id>/",
+        views.answer_detail,
+        name="answer_detail",
+    ),
+]
@@ -0,0 +1,461 @@
+"""
+Async variants of the API views, served by the ASGI deployment.
+
+They answer with the same bodies and status codes as the DRF views in
+`views.py`, but read through Django's async ORM and await password hashing,
+so a request waiting on the database, the hashing pool or a slow client does
+not hold a worker thread.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch, aprefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import exceptions, status
+
+from .auth import JWTAuthentication, aget_principal, cache_principal, sign_token
+from .cache import (
+    cache_response,
+    precondition,
+    question_detail_key,
+    question_list_key,
+)
+from .hashers import HasherBusy, ahash_password, averify_password
+from .idempotency import idempotent
+from .models import Question, User
+from .metrics import timed_serialization
+from .pagination import InvalidCursor, KeysetPaginator, get_page_size
+from .pubsub import OVERFLOW, get_broker, question_channel
+from .renderers import dumps
+from .serializers import (
+    AnswerSerializer,
+    InvalidFields,
+    QuestionSerializer,
+    UserSerializer,
+    sparse_fields,
+)
+from .views import (
+    ANSWER_ORDERING,
+    QUESTION_ORDERING,
+    answer_queryset,
+    batch_results,
+    delete_question,
+    detail_fields,
+    list_queryset,
+    question_batch,
+    question_columns,
+    question_feed,
+    question_list_validators,
+    question_page,
+    question_validators,
+    row_serializer,
+    save_atomic,
+    trending_page,
+    wants_answers,
+)
+
+
+def json_response(data=None, status=status.HTTP_200_OK, headers=None):
+    if data is None:
+        return HttpResponse(status=status, headers=headers)
+    response = HttpResponse(
+        dumps(data), status=status, headers=headers, content_type="application/json"
+    )
+    # what `cache.cache_response` stores, like a DRF response's
+    response.data = data
+    return response
+
+
+async def authenticate(request):
+    """
+    Authenticate a plain Django request like the JWT authentication class
+
+    Returns:
+        user (TokenUser): the token's user, or None when the request is anonymous.
+
+    Raises:
+        AuthenticationFailed: an invalid token was sent.
+    """
+    payload = JWTAuthentication().get_payload(request)
+    if payload is None:
+        return None
+    user = await aget_principal(payload["user_id"])
+    if user is None:
+        raise exceptions.AuthenticationFailed("User not found")
+    return user
+
+
+def unauthorized(detail=None):
+    body = {"detail": detail} if detail else None
+    return json_response(
+        body,
+        status=status.HTTP_401_UNAUTHORIZED,
+        headers={"WWW-Authenticate": JWTAuthentication.keyword},
+    )
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def bad_request(message):
+    return json_response({"message": message}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def read_password(data):
+    """The body's password, None when it is missing, empty or not a string."""
+    password = data.get("password")
+    return password if isinstance(password, str) and password else None
+
+
+def missing_password():
+    return json_response(
+        {"password": ["This field is required."]},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def hasher_busy():
+    return json_response(
+        {"message": "Too many login attempts in flight, retry shortly"},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(settings.PASSWORD_CONF["RETRY_AFTER"])},
+    )
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@idempotent
+async def register_user(request):
+    """
+    Grabs user registration info and stores it
+    """
+    data = read_json(request)
+    if data is None:
+        return bad_request("Malformed JSON body")
+
+    password = read_password(data)
+    if password is None:
+        return missing_password()
+
+    try:
+        password = await ahash_password(password)
+    except HasherBusy:
+        return hasher_busy()
+
+    serializer = UserSerializer(data={"email": data.get("email"), "password": password})
+    if await sync_to_async(serializer.is_valid)():
+        await User.objects.acreate(**serializer.validated_data)
+        return json_response(
+            {"message": "account created"}, status=status.HTTP_201_CREATED
+        )
+    return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def login_user(request):
+    """
+    Grabs user login info and authenticate them.
+    """
+    data = read_json(request)
+    if data is None:
+        return bad_request("Malformed JSON body")
+    password = read_password(data)
+    if password is None:
+        return missing_password()
+
+    user = await User.objects.filter(email=data.get("email")).afirst()
+    if user is None:
+        return json_response(
+            {"message": "This User Does Not Exist"}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    try:
+        correct, stale = await averify_password(password, user.password)
+        if correct and stale:
+            user.password = await ahash_password(password)
+            await user.asave(update_fields=["password", "updated_at"])
+    except HasherBusy:
+        return hasher_busy()
+
+    if correct:
+        cache_principal(user)
+        return json_response({"token": sign_token(user)})
+    return json_response(
+        {"message": "Incorrect Password"}, status=status.HTTP_401_UNAUTHORIZED
+    )
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@idempotent
+async def questions(request):
+    """
+    GET:
+        Fetches a page of questions, newest first, see `views.questions`.
+
+    POST:
+        Posts a question.
+    """
+    try:
+        user = await authenticate(request)
+    except exceptions.AuthenticationFailed as error:
+        return unauthorized(str(error.detail))
+
+    if request.method == "GET":
+        return await list_questions(request)
+
+    if user is None:
+        return unauthorized()
+
+    data = read_json(request)
+    if data is None:
+        return bad_request("Malformed JSON body")
+
+    serializer = QuestionSerializer(data={"question_text": data.get("question_text")})
+    if await sync_to_async(serializer.is_valid)():
+        await Question.objects.acreate(
+            **serializer.validated_data, author_id=user.id, author_email=user.email
+        )
+        return json_response(
+            {"message": "Question Posted"}, status=status.HTTP_201_CREATED
+        )
+    return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@cache_response(question_list_key, question_list_validators)
+async def list_questions(request):
+    """
+    GET of `questions`, behind the response cache like `views.questions`.
+    """
+    try:
+        fields = sparse_fields(QuestionSerializer, request.GET.get("fields"))
+    except InvalidFields as error:
+        return bad_request(str(error))
+
+    if request.GET.get("stream") in ("1", "true"):
+        return stream_questions(fields)
+
+    if "ids" in request.GET:
+        try:
+            ids, queryset, render = question_batch(request)
+        except ValueError as error:
+            return bad_request(str(error))
+        questions = [question async for question in queryset]
+        return json_response(batch_results(ids, questions, render))
+
+    if request.GET.get("ordering") == "trending":
+        try:
+            return json_response(await sync_to_async(trending_page)(request, fields))
+        except InvalidCursor:
+            return bad_request("Invalid cursor")
+
+    feed = question_feed(request)
+    if feed is None:
+        return bad_request("Unknown ordering")
+
+    queryset, ordering = feed
+    paginator = KeysetPaginator(ordering, get_page_size(request))
+    try:
+        window = paginator.window(
+            list_queryset(queryset, QuestionSerializer, fields, ordering),
+            request.GET.get("cursor"),
+        )
+    except InvalidCursor:
+        return bad_request("Invalid cursor")
+
+    page = paginator.page([row async for row in window])
+    serialize = row_serializer(QuestionSerializer, fields)
+    with timed_serialization():
+        results = [serialize(row) for row in page.rows]
+    return json_response(
+        {
+            "results": results,
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+def stream_questions(fields=None):
+    """
+    Stream every question as newline delimited JSON from an async iterator.
+    """
+
+    async def lines():
+        queryset = list_queryset(
+            Question.objects.order_by(*QUESTION_ORDERING), QuestionSerializer, fields
+        ).aiterator(chunk_size=settings.PAGINATION_CONF["STREAM_CHUNK_SIZE"])
+        serialize = row_serializer(QuestionSerializer, fields)
+        async for row in queryset:
+            yield dumps(serialize(row)) + b"\n"
+
+    return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
+@csrf_exempt
+@require_http_methods(["GET", "DELETE"])
+async def question_detail(request, question_id):
+    """
+    GET:
+        Fetch a specific question and a page of its answers, see `views.question_detail`.
+
+    DELETE:
+        Delete a question, only one who created the question can perform this operation
+
+    Args:
+       question_id (int): question unique id
+    """
+    try:
+        user = await authenticate(request)
+    except exceptions.AuthenticationFailed as error:
+        return unauthorized(str(error.detail))
+
+    if request.method == "GET":
+        return await get_question(request, question_id)
+
+    question = await (
+        Question.objects.filter(pk=question_id)
+        .only("author_id", "answer_count")
+        .afirst()
+    )
+    if question is None:
+        return json_response(status=status.HTTP_404_NOT_FOUND)
+
+    if user is None or question.author_id != user.id:
+        return unauthorized()
+
+    return json_response(status=await sync_to_async(delete_question)(question))
+
+
+@cache_response(question_detail_key)
+async def get_question(request, question_id):
+    """
+    GET of `question_detail`, behind the response cache like
+    `views.question_detail`.
+    """
+    try:
+        fields, answer_fields = detail_fields(request)
+    except InvalidFields as error:
+        return bad_request(str(error))
+
+    paginator = KeysetPaginator(
+        ANSWER_ORDERING, get_page_size(request, "answers_page_size")
+    )
+    try:
+        answers = paginator.window(
+            answer_queryset(answer_fields), request.GET.get("answers_cursor")
+        )
+    except InvalidCursor:
+        return bad_request("Invalid cursor")
+
+    question = await (
+        Question.objects.only(*question_columns(fields)).filter(pk=question_id).afirst()
+    )
+    if question is None:
+        return json_response(status=status.HTTP_404_NOT_FOUND)
+
+    headers = question_validators(request, question)
+    code = precondition(request, headers)
+    if code is not None:
+        return json_response(status=code, headers=headers)
+
+    if wants_answers(fields):
+        await aprefetch_related_objects(
+            [question], Prefetch("answers", answers, to_attr="page_answers")
+        )
+    with timed_serialization():
+        data = question_page(question, paginator, fields, answer_fields)
+    return json_response(data, headers=headers)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@idempotent
+async def answers(request, question_id):
+    """
+    Post an answer to a question
+
+    Args:
+        question_id (int): question unique id
+    """
+    try:
+        user = await authenticate(request)
+    except exceptions.AuthenticationFailed as error:
+        return unauthorized(str(error.detail))
+    if user is None:
+        return unauthorized()
+
+    data = read_json(request)
+    if data is None:
+        return bad_request("Malformed JSON body")
+
+    serializer = AnswerSerializer(
+        data={"answer_text": data.get("answer_text"), "question": question_id}
+    )
+    if await sync_to_async(serializer.is_valid)():
+        await sync_to_async(save_atomic)(
+            serializer, author_id=user.id, author_email=user.email
+        )
+        return json_response(
+            {"message": "Answer Posted"}, status=status.HTTP_201_CREATED
+        )
+    return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def sse_event(event, data):
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def event_stream(channel):
+    """
+    Server-sent events of `channel`, with a comment line as heartbeat while
+    there are none.
+    """
+    conf = settings.PUBSUB_CONF
+    async with get_broker().subscribe(channel) as subscription:
+        yield f"retry: {conf['RETRY_MS']}\n\n".encode()
+        while True:
+            message = await subscription.get(conf["HEARTBEAT_SECONDS"])
+            if message is None:
+                yield b": heartbeat\n\n"
+            elif message is OVERFLOW:
+                yield sse_event("reset", {})
+                return
+            else:
+                yield sse_event(message["event"], message["data"])
+                if message["event"] == "question.deleted":
+                    return
+
+
+@require_http_methods(["GET"])
+async def question_events(request, question_id):
+    """
+    Stream the answers written to a question as server-sent events, instead
+    of polling `question_detail`
+
+    Events are "answer.created" and "answer.updated" with the answer,
+    "answer.deleted" with its id, and "question.deleted", which ends the
+    stream. A client too slow to keep up gets "reset" and the stream ends:
+    it should fetch the question again and reconnect.
+
+    Args:
+        question_id (int): question unique id
+    """
+    if not await Question.objects.filter(pk=question_id).aexists():
+        return json_response(status=status.HTTP_404_NOT_FOUND)
+    return StreamingHttpResponse(
+        event_stream(question_channel(question_id)),
+        content_type="text/event-stream",
+        # keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
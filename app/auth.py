@@ -1,41 +1,295 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
 import jwt
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from .metrics import registry
+from .models import User
+
+
+class ExpiringLRUCache:
+    """
+    Bounded, thread-safe LRU whose entries expire at a given time.
+
+    Args:
+        maxsize (int): number of entries kept before the least recently used is dropped.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, expires):
+        """Store `value` until the unix time `expires`."""
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# verified token payloads keyed on the token digest, until the token expires
+token_cache = ExpiringLRUCache(settings.JWT_CONF["CACHE_SIZE"])
+
+# TokenUser of each user id (False for deleted users), dropped when the user
+# is saved or deleted in this process, see app.signals
+principal_cache = ExpiringLRUCache(settings.JWT_CONF["PRINCIPAL_CACHE_SIZE"])
+
+registry.describe(
+    "jwt_token_cache_hits_total", "counter", "Tokens answered from the token cache."
+)
+registry.describe(
+    "jwt_token_cache_misses_total", "counter", "Tokens decoded and verified."
+)
+registry.gauge("jwt_token_cache_hits_total", lambda: token_cache.hits)
+registry.gauge("jwt_token_cache_misses_total", lambda: token_cache.misses)
+registry.describe(
+    "jwt_principal_cache_hits_total",
+    "counter",
+    "Authenticated users answered from the principal cache.",
+)
+registry.describe(
+    "jwt_principal_cache_misses_total",
+    "counter",
+    "Authenticated users loaded from the database.",
+)
+registry.gauge("jwt_principal_cache_hits_total", lambda: principal_cache.hits)
+registry.gauge("jwt_principal_cache_misses_total", lambda: principal_cache.misses)
 
 
-def verify_user(authorization):
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
 
+
+def decode_token(token):
     """
     Verify a JWT token
 
+    Checks the HS256 signature and expiry, answering repeat tokens from
+    `token_cache` without decoding them again.
+
     Args:
-        authorization (str): An authorization header sent in request.
+        token (str): encoded jwt token.
 
     Returns:
-        payload (dict): decode info found in token.
-    """
+        payload (dict): decoded info found in token.
 
-    # Extract the JWT from the Authorization header
-    if authorization is None:
-        return None
+    Raises:
+        AuthenticationFailed: the token is malformed, tampered with or expired.
+    """
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
 
-    # Decode the JWT and verify its signature
     try:
-        # clean the token
-        token = authorization.replace("Bearer", "").replace(" ", "")
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
-            algorithms="HS256",
-            options={"verify_signature": False},
+            algorithms=["HS256"],
+            options={"require": ["exp"]},
         )
-    except:
-        print("Invalid")
-        return None
+    except jwt.InvalidTokenError as error:
+        raise exceptions.AuthenticationFailed(str(error))
 
+    token_cache.set(digest, payload, payload["exp"])
     return payload
 
 
+def revocation_key(jti):
+    return f"jwt:revoked:{jti}"
+
+
+def get_revocation_cache():
+    return caches[settings.JWT_CONF["REVOCATION_CACHE_ALIAS"]]
+
+
+def revoke_token(payload):
+    """
+    Add a token's `jti` to the revocation list until the token expires.
+
+    Tokens signed before tokens carried a `jti` cannot be revoked, they
+    run out at their `exp`.
+    """
+    jti = payload.get("jti")
+    if jti is None:
+        return
+    timeout = max(1, math.ceil(payload["exp"] - time.time()))
+    get_revocation_cache().set(revocation_key(jti), True, timeout)
+
+
+def is_revoked(payload):
+    jti = payload.get("jti")
+    return jti is not None and get_revocation_cache().get(revocation_key(jti), False)
+
+
+class TokenUser:
+    """
+    The authenticated user, as cached in `principal_cache`.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, email):
+        self.id = self.pk = user_id
+        self.email = email
+
+    def __str__(self):
+        return self.email
+
+
+class AnonymousPrincipal:
+    """`request.user` of a request without a token."""
+
+    id = pk = None
+    email = ""
+    is_authenticated = False
+    is_anonymous = True
+
+    def __str__(self):
+        return "AnonymousUser"
+
+
+def principal_expiry():
+    return time.time() + settings.JWT_CONF["PRINCIPAL_TTL"]
+
+
+def cache_principal(user):
+    """Cache the TokenUser of a `User` the caller has loaded anyway."""
+    principal_cache.set(user.pk, TokenUser(user.pk, user.email), principal_expiry())
+
+
+def get_principal(user_id):
+    """
+    The TokenUser of `user_id`, None when the user no longer exists.
+
+    Loaded from the database at most once per PRINCIPAL_TTL per process.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        row = User.objects.filter(pk=user_id).values_list("email", flat=True).first()
+        principal = TokenUser(user_id, row) if row is not None else False
+        principal_cache.set(user_id, principal, principal_expiry())
+    return principal or None
+
+
+async def aget_principal(user_id):
+    """`get_principal` for async views."""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        row = (
+            await User.objects.filter(pk=user_id)
+            .values_list("email", flat=True)
+            .afirst()
+        )
+        principal = TokenUser(user_id, row) if row is not None else False
+        principal_cache.set(user_id, principal, principal_expiry())
+    return principal or None
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Authenticate requests carrying an `Authorization: Bearer <jwt>` header.
+
+    Sets `request.user` to a `TokenUser` and `request.auth` to the payload.
+    The token is checked against the revocation list and the user against
+    `principal_cache`, so a revoked token or a deleted user is refused
+    without a query per request.
+
+    The verified payload is kept on the underlying Django request, so
+    middleware that looked at it already saves DRF a token cache lookup.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        payload = self.get_payload(request)
+        if payload is None:
+            return None
+        user = get_principal(payload["user_id"])
+        if user is None:
+            raise exceptions.AuthenticationFailed("User not found")
+        return user, payload
+
+    def get_payload(self, request):
+        """
+        The verified payload of the request's token, without a database hit
+
+        Returns:
+            payload (dict): or None when the request carries no bearer token.
+
+        Raises:
+            AuthenticationFailed: the token is invalid, expired or revoked.
+        """
+        http_request = getattr(request, "_request", request)
+        payload = getattr(http_request, "_jwt_payload", None)
+        if payload is None:
+            payload = self._get_payload(request)
+            if payload is not None:
+                http_request._jwt_payload = payload
+        return payload
+
+    def _get_payload(self, request):
+        header = request.META.get("HTTP_AUTHORIZATION")
+        if not header:
+            return None
+
+        scheme, _, token = header.partition(" ")
+        if scheme != self.keyword:
+            return None
+
+        token = token.strip()
+        if not token:
+            raise exceptions.AuthenticationFailed("No token provided")
+
+        payload = decode_token(token)
+        if "user_id" not in payload or "user_email" not in payload:
+            raise exceptions.AuthenticationFailed("Token is missing user claims")
+        if is_revoked(payload):
+            raise exceptions.AuthenticationFailed("Token has been revoked")
+        return payload
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
 def sign_token(user):
     """
     Sign a JWT token
@@ -57,6 +311,7 @@ def sign_token(user):
             ).timestamp()
         ),
         "iat": datetime.now().timestamp(),
+        "jti": uuid.uuid4().hex,
     }
 
     # Encode the JWT with your secret key
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import transaction
+
+from .signals import bulk_created
+
+
+def bulk_insert(model, objs):
+    """
+    Insert rows in batches, one transaction per batch
+
+    `bulk_create` skips the model signals, so every batch sends
+    `bulk_created` inside its transaction for the handlers that keep derived
+    data in sync.
+
+    Args:
+        model (Model): model class of the rows.
+        objs (list): unsaved model instances.
+
+    Returns:
+        created (list): the instances, with their primary keys set.
+    """
+    batch_size = settings.BULK_CONF["BATCH_SIZE"]
+    created = []
+    for start in range(0, len(objs), batch_size):
+        with transaction.atomic():
+            batch = model.objects.bulk_create(objs[start : start + batch_size])
+            bulk_created.send(sender=model, instances=batch)
+        created.extend(batch)
+    return created
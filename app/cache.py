@@ -0,0 +1,372 @@
+import asyncio
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import registry
+from .renderers import dumps
+from .routers import read_from_replica
+from .singleflight import SingleFlight
+
+QUESTION_LIST_VERSION = "questions:list:version"
+
+# cache misses being filled by this process
+flights = SingleFlight()
+
+registry.describe(
+    "response_cache_coalesced_total",
+    "counter",
+    "Cache misses answered without running the view, by the response of "
+    "another request for the same entry: the fresh one, or a stale one "
+    "while it is being rebuilt.",
+)
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_CONF["ALIAS"]]
+
+
+def question_version_key(question_id):
+    return f"question:{question_id}:version"
+
+
+def user_version_key(user_id):
+    return f"user:{user_id}:version"
+
+
+def get_version(key):
+    """
+    Current version of a group of cache entries.
+
+    Versions start from the clock rather than 1, so a version key that was
+    evicted never comes back with a number that old entries were stored under.
+    """
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_versions(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*keys):
+    """
+    Drop every cache entry stored under the given version keys.
+
+    Versions are bumped right away and once more after the surrounding
+    transaction commits, so a reader that cached pre-commit data in between
+    is never served again.
+    """
+    bump_versions(*keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_versions(*keys))
+
+
+def _query_digest(request):
+    query = request.GET.urlencode()
+    return hashlib.md5(query.encode()).hexdigest() if query else "-"
+
+
+def question_list_key(request, *args, **kwargs):
+    if request.GET.get("stream") in ("1", "true"):
+        return None
+    version = get_version(QUESTION_LIST_VERSION)
+    return f"questions:list:{_query_digest(request)}", version
+
+
+def question_detail_key(request, question_id):
+    version = get_version(question_version_key(question_id))
+    return f"question:{question_id}:{_query_digest(request)}", version
+
+
+def user_feed_key(request, *args, **kwargs):
+    """
+    Per-user entries, dropped only when that user's questions or answers change.
+    """
+    user_id = request.user.id
+    version = get_version(user_version_key(user_id))
+    return f"user:{user_id}:{request.path}:{_query_digest(request)}", version
+
+
+def make_etag(data):
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+
+
+def version_etag(*parts):
+    """ETag of the version of a resource identified by `parts`."""
+    return '"%s"' % hashlib.sha1(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def request_etag(request, *parts):
+    """`version_etag` of what the request's path and query params select."""
+    return version_etag(request.path, _query_digest(request), *parts)
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return headers
+
+
+def precondition(request, headers):
+    """
+    Evaluate the request's conditional headers against `validator_headers`
+
+    Returns:
+        status (int): 304 when the client's copy is current, 412 when a
+            precondition of a write fails, None to go on with the request.
+    """
+    response = get_conditional_response(
+        request,
+        etag=headers["ETag"],
+        last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+    )
+    return None if response is None else response.status_code
+
+
+def wait_for_entry(cache, key, lock_key):
+    """
+    Wait for the request holding `lock_key` to store `key`
+
+    Returns:
+        entry: the entry, or None when the lock went away without one or
+            RESPONSE_CACHE_CONF["WAIT_SECONDS"] passed.
+    """
+    conf = settings.RESPONSE_CACHE_CONF
+    deadline = time.monotonic() + conf["WAIT_SECONDS"]
+    while time.monotonic() < deadline:
+        time.sleep(conf["POLL_INTERVAL"])
+        entry = cache.get(key)
+        if entry is not None or cache.get(lock_key) is None:
+            return entry
+    return None
+
+
+def stale_entry(cache, stale_key):
+    """
+    The last entry stored under an unversioned key, when it is at most
+    RESPONSE_CACHE_CONF["STALE_SECONDS"] old.
+    """
+    max_age = settings.RESPONSE_CACHE_CONF["STALE_SECONDS"]
+    stale = cache.get(stale_key) if max_age else None
+    if stale is None or time.time() - stale[2] > max_age:
+        return None
+    return stale[:2]
+
+
+def fill(cache, name, key, flight, leader):
+    """
+    Get the entry another request is building, or let the caller build it.
+
+    Returns:
+        (entry, locked) (tuple): the entry, stale or fresh, or None when the
+            caller should run the view, and whether the caller took the
+            entry's lock, to release once it stored the entry.
+    """
+    lock_key = f"{key}:lock"
+    lock_seconds = settings.RESPONSE_CACHE_CONF["LOCK_SECONDS"]
+    if leader and cache.add(lock_key, True, lock_seconds):
+        # stored by a process that released the lock since we looked
+        entry = cache.get(key)
+        if entry is None:
+            return None, True
+        cache.delete(lock_key)
+        return entry, False
+
+    entry = stale_entry(cache, f"{name}:stale")
+    if entry is None:
+        if leader:
+            entry = wait_for_entry(cache, key, lock_key)
+        else:
+            entry = flight.wait(settings.RESPONSE_CACHE_CONF["WAIT_SECONDS"])
+        outcome = "fresh"
+    else:
+        outcome = "stale"
+    if entry is not None:
+        registry.inc("response_cache_coalesced_total", {"outcome": outcome})
+    return entry, False
+
+
+def store(cache, name, key, response, headers):
+    """
+    Cache a successful response of the view, and keep it as the key's stale
+    entry for the requests that come while its next version is built.
+
+    Responses are cached from their `data`, which DRF responses and the
+    async views' `json_response`s keep.
+
+    Returns:
+        entry: the stored entry, None when the response is not cacheable.
+    """
+    if response.status_code != status.HTTP_200_OK or not hasattr(response, "data"):
+        return None
+    if response.has_header("ETag"):
+        headers = {
+            header: response[header]
+            for header in ("ETag", "Last-Modified")
+            if response.has_header(header)
+        }
+    elif not headers:
+        headers = {"ETag": make_etag(response.data)}
+    entry = (headers, response.data)
+    timeout = settings.RESPONSE_CACHE_CONF["TIMEOUT"]
+    if read_from_replica():
+        # may predate the invalidation that made us rebuild it
+        timeout = min(timeout, settings.REPLICA_CONF["PIN_SECONDS"])
+    cache.set(key, entry, timeout)
+    if settings.RESPONSE_CACHE_CONF["STALE_SECONDS"]:
+        cache.set(f"{name}:stale", (*entry, time.time()), timeout)
+    return entry
+
+
+def cache_response(key_func, validators=None):
+    """
+    Read-through cache for successful GET responses of a view
+
+    Entries are stored with an ETag, so a client sending a matching
+    `If-None-Match` header gets a 304 without a body. The ETag and
+    Last-Modified set by the view are kept, otherwise the ETag is a hash of
+    the body.
+
+    With `validators`, a conditional request the cache cannot answer is
+    checked against them before the view runs.
+
+    A missing entry is built once however many requests want it at the same
+    time: one thread per process runs the view, and across the processes
+    sharing the cache only the one holding the entry's lock does. The
+    others wait for its entry, or are answered right away with the previous
+    entry of the key when it is at most RESPONSE_CACHE_CONF["STALE_SECONDS"]
+    old, stale-while-revalidate.
+
+    Async views are cached the same way and answered with plain JSON
+    `HttpResponse`s; their requests wait for another's entry in a worker
+    thread, off the event loop.
+
+    Args:
+        key_func (callable): returns the (key, version) of the entry from the
+            view arguments, or None to bypass the cache. Entries of older
+            versions are never served fresh.
+        validators (callable): returns `validator_headers` from the view
+            arguments, or None when there is no such resource.
+    """
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view(request, *args, **kwargs)
+
+                located = await sync_to_async(key_func)(request, *args, **kwargs)
+                if located is None:
+                    return await view(request, *args, **kwargs)
+
+                name, version = located
+                key = f"{name}:v{version}"
+                cache = get_cache()
+                entry = await cache.aget(key)
+                if entry is None:
+                    headers = validators and await sync_to_async(validators)(
+                        request, *args, **kwargs
+                    )
+                    if headers:
+                        code = precondition(request, headers)
+                        if code is not None:
+                            return HttpResponse(status=code, headers=headers)
+
+                    with flights.flight(key) as (flight, leader):
+                        entry, locked = await sync_to_async(
+                            fill, thread_sensitive=False
+                        )(cache, name, key, flight, leader)
+                        if entry is None:
+                            try:
+                                response = await view(request, *args, **kwargs)
+                                entry = await sync_to_async(store)(
+                                    cache, name, key, response, headers
+                                )
+                            finally:
+                                if locked:
+                                    await cache.adelete(f"{key}:lock")
+                            if entry is None:
+                                return response
+                            if leader:
+                                flight.result = entry
+
+                headers, data = entry
+                code = precondition(request, headers)
+                if code is not None:
+                    return HttpResponse(status=code, headers=headers)
+                return HttpResponse(
+                    dumps(data), headers=headers, content_type="application/json"
+                )
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            located = key_func(request, *args, **kwargs)
+            if located is None:
+                return view(request, *args, **kwargs)
+
+            name, version = located
+            key = f"{name}:v{version}"
+            cache = get_cache()
+            entry = cache.get(key)
+            if entry is None:
+                headers = validators and validators(request, *args, **kwargs)
+                if headers:
+                    code = precondition(request, headers)
+                    if code is not None:
+                        return Response(status=code, headers=headers)
+
+                with flights.flight(key) as (flight, leader):
+                    entry, locked = fill(cache, name, key, flight, leader)
+                    if entry is None:
+                        try:
+                            response = view(request, *args, **kwargs)
+                            entry = store(cache, name, key, response, headers)
+                        finally:
+                            if locked:
+                                cache.delete(f"{key}:lock")
+                        if entry is None:
+                            return response
+                        if leader:
+                            flight.result = entry
+
+            headers, data = entry
+            code = precondition(request, headers)
+            if code is not None:
+                return Response(status=code, headers=headers)
+            return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+    check_password,
+    make_password,
+)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with its cost read from PASSWORD_CONF."""
+
+    work_factor = property(lambda self: settings.PASSWORD_CONF["SCRYPT_WORK_FACTOR"])
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with its cost read from PASSWORD_CONF, needs argon2-cffi."""
+
+    time_cost = property(lambda self: settings.PASSWORD_CONF["ARGON2_TIME_COST"])
+    memory_cost = property(lambda self: settings.PASSWORD_CONF["ARGON2_MEMORY_COST"])
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with its iteration count read from PASSWORD_CONF."""
+
+    iterations = property(lambda self: settings.PASSWORD_CONF["PBKDF2_ITERATIONS"])
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has as much work as it may queue."""
+
+
+# hashlib's scrypt/pbkdf2 and argon2-cffi release the GIL while hashing, so
+# threads hash in parallel and no per process Django setup is needed.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_CONF["WORKERS"], thread_name_prefix="hasher"
+)
+_slots = threading.BoundedSemaphore(
+    settings.PASSWORD_CONF["WORKERS"] + settings.PASSWORD_CONF["MAX_PENDING"]
+)
+
+
+def _submit(func, *args):
+    if not _slots.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _check(raw_password, encoded):
+    stale = []
+    correct = check_password(raw_password, encoded, setter=stale.append)
+    return correct, bool(stale)
+
+
+def hash_password(raw_password):
+    """
+    Hash a password on the hashing pool
+
+    Args:
+        raw_password (str): password as sent by the user.
+
+    Returns:
+        encoded (str): hash made with the preferred hasher.
+
+    Raises:
+        HasherBusy: the pool is saturated, the caller should answer 429.
+    """
+    return _submit(make_password, raw_password).result()
+
+
+def verify_password(raw_password, encoded):
+    """
+    Check a password against its hash on the hashing pool
+
+    Args:
+        raw_password (str): password as sent by the user.
+        encoded (str): hash stored for the user.
+
+    Returns:
+        (correct, stale) (tuple): whether the password matches, and whether
+        the hash was made with an outdated algorithm or cost.
+
+    Raises:
+        HasherBusy: the pool is saturated, the caller should answer 429.
+    """
+    return _submit(_check, raw_password, encoded).result()
+
+
+async def ahash_password(raw_password):
+    """Async variant of `hash_password`, awaits without holding a thread."""
+    return await asyncio.wrap_future(_submit(make_password, raw_password))
+
+
+async def averify_password(raw_password, encoded):
+    """Async variant of `verify_password`, awaits without holding a thread."""
+    return await asyncio.wrap_future(_submit(_check, raw_password, encoded))
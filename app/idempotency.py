@@ -0,0 +1,218 @@
+"""
+Idempotency keys for POST endpoints, applied with `@idempotent`.
+
+A client that sends an `Idempotency-Key` header with a POST can retry it
+safely: the first request with a key runs the view and its response is kept
+for IDEMPOTENCY_CONF["TTL"] seconds, later ones with the same key get that
+response back without running the view again. Keys are scoped to the
+request's credentials, or its client IP when it has none, and path, and a
+key reused with another body is refused with a 422.
+
+While a key's request is running, a duplicate waits for its response rather
+than running the view alongside it. The lock and the responses live in the
+idempotency cache, so only processes sharing that cache coalesce duplicates.
+"""
+
+import asyncio
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework import status
+
+from .metrics import registry
+from .renderers import dumps
+from .throttling import client_ip
+
+HEADER = "Idempotency-Key"
+
+# responses that say nothing about the request, a retry should run it again
+RETRYABLE = {
+    status.HTTP_401_UNAUTHORIZED,
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+registry.describe(
+    "idempotency_requests_total",
+    "counter",
+    "POST requests sent with an Idempotency-Key, by outcome.",
+)
+
+
+def get_cache():
+    return caches[settings.IDEMPOTENCY_CONF["ALIAS"]]
+
+
+def error(message, code, headers=None):
+    return HttpResponse(
+        dumps({"message": message}),
+        status=code,
+        headers=headers,
+        content_type="application/json",
+    )
+
+
+class Idempotency:
+    """
+    The cache keys and body fingerprint of one request with a key.
+    """
+
+    def __init__(self, request, key):
+        # anonymous clients (registering) would otherwise share every key
+        credentials = request.META.get("HTTP_AUTHORIZATION") or client_ip(request)
+        scope = hashlib.sha256(f"{credentials}\n{request.path}\n{key}".encode())
+        self.key = f"idempotency:{scope.hexdigest()}"
+        self.lock_key = f"{self.key}:lock"
+        self.fingerprint = hashlib.sha256(request.body).hexdigest()
+
+    def replay(self, entry):
+        fingerprint, code, content_type, content = entry
+        if fingerprint != self.fingerprint:
+            registry.inc("idempotency_requests_total", {"outcome": "mismatch"})
+            return error(
+                f"{HEADER} was already used with a different request",
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        registry.inc("idempotency_requests_total", {"outcome": "replayed"})
+        response = HttpResponse(content, status=code, content_type=content_type)
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    def entry(self, response):
+        """What to keep of `response`, or None when a retry should run again."""
+        if response.status_code >= 500 or response.status_code in RETRYABLE:
+            return None
+        if getattr(response, "streaming", False):
+            return None
+        if hasattr(response, "render"):
+            response.render()
+        return (
+            self.fingerprint,
+            response.status_code,
+            response.get("Content-Type"),
+            response.content,
+        )
+
+    def in_flight(self):
+        registry.inc("idempotency_requests_total", {"outcome": "in_flight"})
+        return error(
+            f"A request with this {HEADER} is still in progress",
+            status.HTTP_409_CONFLICT,
+            headers={"Retry-After": "1"},
+        )
+
+
+def parse_key(request):
+    """
+    Returns:
+        key (str): the request's idempotency key, None without one.
+
+    Raises:
+        ValueError: the key is empty or too long.
+    """
+    if request.method != "POST" or HEADER not in request.headers:
+        return None
+    key = request.headers[HEADER].strip()
+    if not key or len(key) > settings.IDEMPOTENCY_CONF["MAX_KEY_LENGTH"]:
+        raise ValueError(key)
+    return key
+
+
+def invalid_key():
+    length = settings.IDEMPOTENCY_CONF["MAX_KEY_LENGTH"]
+    return error(
+        f"{HEADER} must be 1 to {length} characters",
+        status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def idempotent(view):
+    """
+    Answer POST requests with an `Idempotency-Key` once per key, see the
+    module docstring. Wraps plain Django views, sync or async, DRF's
+    `api_view` included: put it above the `api_view` decorator.
+    """
+    if asyncio.iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            try:
+                key = parse_key(request)
+            except ValueError:
+                return invalid_key()
+            if key is None:
+                return await view(request, *args, **kwargs)
+
+            conf = settings.IDEMPOTENCY_CONF
+            cache = get_cache()
+            idempotency = Idempotency(request, key)
+            deadline = time.monotonic() + conf["WAIT_SECONDS"]
+            while True:
+                entry = await cache.aget(idempotency.key)
+                if entry is not None:
+                    return idempotency.replay(entry)
+                if await cache.aadd(idempotency.lock_key, True, conf["LOCK_SECONDS"]):
+                    break
+                if time.monotonic() >= deadline:
+                    return idempotency.in_flight()
+                await asyncio.sleep(conf["POLL_INTERVAL"])
+
+            try:
+                entry = await cache.aget(idempotency.key)
+                if entry is not None:
+                    return idempotency.replay(entry)
+                response = await view(request, *args, **kwargs)
+                entry = idempotency.entry(response)
+                if entry is not None:
+                    await cache.aset(idempotency.key, entry, conf["TTL"])
+                    registry.inc("idempotency_requests_total", {"outcome": "stored"})
+                return response
+            finally:
+                await cache.adelete(idempotency.lock_key)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            key = parse_key(request)
+        except ValueError:
+            return invalid_key()
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        conf = settings.IDEMPOTENCY_CONF
+        cache = get_cache()
+        idempotency = Idempotency(request, key)
+        deadline = time.monotonic() + conf["WAIT_SECONDS"]
+        # the first request with the key runs, duplicates wait for its response
+        while True:
+            entry = cache.get(idempotency.key)
+            if entry is not None:
+                return idempotency.replay(entry)
+            if cache.add(idempotency.lock_key, True, conf["LOCK_SECONDS"]):
+                break
+            if time.monotonic() >= deadline:
+                return idempotency.in_flight()
+            time.sleep(conf["POLL_INTERVAL"])
+
+        try:
+            # stored by a request that released the lock since we looked
+            entry = cache.get(idempotency.key)
+            if entry is not None:
+                return idempotency.replay(entry)
+            response = view(request, *args, **kwargs)
+            entry = idempotency.entry(response)
+            if entry is not None:
+                cache.set(idempotency.key, entry, conf["TTL"])
+                registry.inc("idempotency_requests_total", {"outcome": "stored"})
+            return response
+        finally:
+            cache.delete(idempotency.lock_key)
+
+    return wrapper
@@ -0,0 +1,245 @@
+"""
+Background jobs.
+
+Work that need not be done before the response goes out, like deleting a
+large thread or notifying the people taking part in it, is stored as a `Job`
+row by `enqueue`, in the transaction of the write that calls for it, and run
+by `python manage.py run_jobs`.
+
+Delivery is at least once: a job is deleted only once its handler returned,
+and the job of a worker that died comes due again when its lease runs out,
+so handlers must be idempotent. A handler gets the payloads of all the jobs
+of its name claimed together, and they succeed or fail as one.
+"""
+
+import contextvars
+import os
+import random
+import socket
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .cache import invalidate, user_version_key
+from .models import Answer, Job, Notification, Question
+
+HANDLERS = {}
+
+
+def handler(name):
+    """Register `func(payloads)` as the handler of the jobs called `name`."""
+
+    def register(func):
+        HANDLERS[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, payload, delay=0):
+    """
+    Queue a job, run once the current transaction commits and `delay`
+    seconds have passed.
+    """
+    return Job.objects.create(
+        name=name, payload=payload, run_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that failed `attempts` times."""
+    conf = settings.JOBS_CONF
+    delay = min(conf["BACKOFF_MAX"], conf["BACKOFF_BASE"] * 2**attempts)
+    # jitter, so jobs failing together do not all come back together
+    return delay * random.uniform(0.5, 1)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(batch_size, names=None, worker=""):
+    """
+    Lease up to `batch_size` due jobs, oldest first.
+
+    Workers on PostgreSQL skip the rows another worker is claiming. SQLite
+    takes the write lock when the transaction starts, so claims simply queue.
+
+    Returns:
+        jobs (list): the claimed jobs, `attempts` counting this one.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.PENDING, run_at__lte=now
+        )
+        if names:
+            due = due.filter(name__in=names)
+        ids = list(due.order_by("run_at").values_list("pk", flat=True)[:batch_size])
+        Job.objects.filter(pk__in=ids).update(
+            run_at=now + timedelta(seconds=settings.JOBS_CONF["LEASE_SECONDS"]),
+            attempts=F("attempts") + 1,
+            locked_by=worker,
+        )
+        return list(Job.objects.filter(pk__in=ids).order_by("run_at", "pk"))
+
+
+def fail(jobs, error):
+    """Retry `jobs` after a backoff, or give up on those out of attempts."""
+    now = timezone.now()
+    for job in jobs:
+        job.last_error = error
+        if job.attempts >= settings.JOBS_CONF["MAX_ATTEMPTS"]:
+            job.status = Job.FAILED
+        else:
+            job.run_at = now + timedelta(seconds=backoff(job.attempts))
+        job.save(update_fields=["last_error", "status", "run_at"])
+
+
+def run_batch(batch_size=None, names=None, worker=None):
+    """
+    Claim one batch of due jobs and run them, a handler call per job name.
+
+    Returns:
+        (done, failed) (tuple): how many of the claimed jobs succeeded and failed.
+    """
+    batch_size = batch_size or settings.JOBS_CONF["BATCH_SIZE"]
+    jobs = claim(batch_size, names, worker or worker_name())
+    groups = defaultdict(list)
+    for job in jobs:
+        groups[job.name].append(job)
+
+    done = failed = 0
+    for name, group in groups.items():
+        try:
+            if name not in HANDLERS:
+                raise LookupError(f"No handler for job {name!r}")
+            HANDLERS[name]([job.payload for job in group])
+        except Exception:
+            fail(group, traceback.format_exc())
+            failed += len(group)
+        else:
+            Job.objects.filter(pk__in=[job.pk for job in group]).delete()
+            done += len(group)
+    return done, failed
+
+
+_purging = contextvars.ContextVar("purging_questions", default=frozenset())
+
+
+@contextmanager
+def purging(question_id):
+    """
+    Mark the answers of `question_id` as deleted along with the question.
+
+    `delete_questions` removes them in batches, before the question itself,
+    so the answer signal handlers cannot tell from `origin` that the
+    question's counters and cache entries need no upkeep.
+    """
+    token = _purging.set(_purging.get() | {question_id})
+    try:
+        yield
+    finally:
+        _purging.reset(token)
+
+
+def is_purging(question_id):
+    return question_id in _purging.get()
+
+
+_seeding = contextvars.ContextVar("seeding", default=False)
+
+
+@contextmanager
+def seeding():
+    """
+    Mark the answers created as seed data, `seed_data` benchmarks the
+    database, so they neither notify authors nor publish stream events.
+    """
+    token = _seeding.set(True)
+    try:
+        yield
+    finally:
+        _seeding.reset(token)
+
+
+def is_seeding():
+    return _seeding.get()
+
+
+@handler("delete_question")
+def delete_questions(payloads):
+    """
+    Delete questions marked with `deleted_at` and their answers, a batch of
+    JOBS_CONF["DELETE_BATCH_SIZE"] answers per transaction, so the database
+    is never locked for the whole thread.
+    """
+    batch_size = settings.JOBS_CONF["DELETE_BATCH_SIZE"]
+    for question_id in {payload["question_id"] for payload in payloads}:
+        with purging(question_id):
+            while True:
+                with transaction.atomic():
+                    batch = list(
+                        Answer.objects.filter(question_id=question_id).values_list(
+                            "pk", "author_id"
+                        )[:batch_size]
+                    )
+                    if not batch:
+                        break
+                    Answer.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+                    invalidate(*{user_version_key(author) for _, author in batch})
+
+        with transaction.atomic():
+            question = Question.all_objects.filter(
+                pk=question_id, deleted_at__isnull=False
+            ).first()
+            if question is not None:
+                question.delete()
+
+
+@handler("notify_answers")
+def notify_answers(payloads):
+    """
+    Notify the author of an answered question and everyone who answered it
+    before of a new answer, except the answer's own author.
+    """
+    answer_ids = {pk for payload in payloads for pk in payload["answer_ids"]}
+    answers = list(
+        Answer.objects.filter(pk__in=answer_ids, question__deleted_at__isnull=True)
+        .select_related("question")
+        .only("author_id", "question_id", "question__author_id")
+    )
+    # the first answer of every author in the threads
+    first_answers = defaultdict(dict)
+    for question_id, author_id, first in (
+        Answer.objects.filter(question_id__in={a.question_id for a in answers})
+        .values_list("question_id", "author_id")
+        .annotate(first=Min("id"))
+        .order_by()
+    ):
+        first_answers[question_id][author_id] = first
+
+    notifications = []
+    for answer in answers:
+        earlier = first_answers[answer.question_id]
+        users = {user_id for user_id, first in earlier.items() if first < answer.pk}
+        users.add(answer.question.author_id)
+        users.discard(answer.author_id)
+        notifications.extend(
+            Notification(user_id=user_id, question_id=answer.question_id, answer=answer)
+            for user_id in users
+        )
+    with transaction.atomic():
+        # a job retried after a crash may have notified some users already
+        Notification.objects.bulk_create(
+            notifications,
+            batch_size=settings.BULK_CONF["BATCH_SIZE"],
+            ignore_conflicts=True,
+        )
+        invalidate(*{user_version_key(n.user_id) for n in notifications})
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.ranking import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending scores of questions from their answers"
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Ranked {count} questions"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of questions and answers"
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.jobs import run_batch, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run background jobs as they come due, see app.jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="run the jobs due now and exit instead of waiting for more",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="jobs claimed at a time, JOBS_CONF['BATCH_SIZE'] by default",
+        )
+        parser.add_argument(
+            "--name", action="append", help="only run jobs of this name, repeatable"
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        while True:
+            close_old_connections()
+            done, failed = run_batch(options["batch_size"], options["name"], worker)
+            if done or failed:
+                style = self.style.WARNING if failed else self.style.SUCCESS
+                self.stdout.write(style(f"Ran {done} jobs, {failed} failed"))
+                continue
+            if options["once"]:
+                return
+            time.sleep(settings.JOBS_CONF["POLL_INTERVAL"])
@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from app.bulk import bulk_insert
+from app.jobs import seeding
+from app.models import Answer, Question, User
+
+WORDS = (
+    "how what why when where which who can should does rice bread python django "
+    "cook bake travel learn code test deploy cache query index server client "
+    "fast slow best way start stop build run read write"
+).split()
+
+
+def sentence(rng, words, suffix):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + suffix
+
+
+class Command(BaseCommand):
+    help = "Seed the database with users, questions and answers for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--questions", type=int, default=10000)
+        parser.add_argument("--answers", type=int, default=30000)
+        parser.add_argument(
+            "--password",
+            default="bench-password",
+            help="password of every seeded user",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    def handle(self, *args, **options):
+        with seeding():
+            self.seed(options)
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        batch_size = settings.BULK_CONF["BATCH_SIZE"]
+        started = time.perf_counter()
+
+        # one hash for everyone, hashing a million passwords would dominate seeding
+        password = make_password(options["password"])
+        run = time.time_ns()
+        users = []
+        for start in range(0, options["users"], batch_size):
+            stop = min(start + batch_size, options["users"])
+            users += bulk_insert(
+                User,
+                [
+                    User(email=f"seed-{run}-{i}@example.com", password=password)
+                    for i in range(start, stop)
+                ],
+            )
+        if not users:
+            self.stdout.write("Nothing to seed without users")
+            return
+
+        question_ids = []
+        for start in range(0, options["questions"], batch_size):
+            stop = min(start + batch_size, options["questions"])
+            batch = []
+            for _ in range(start, stop):
+                author = rng.choice(users)
+                batch.append(
+                    Question(
+                        question_text=sentence(rng, 8, "?"),
+                        author_id=author.pk,
+                        author_email=author.email,
+                    )
+                )
+            question_ids += [question.pk for question in bulk_insert(Question, batch)]
+
+        answers = 0
+        if question_ids:
+            for start in range(0, options["answers"], batch_size):
+                stop = min(start + batch_size, options["answers"])
+                batch = []
+                for _ in range(start, stop):
+                    author = rng.choice(users)
+                    batch.append(
+                        Answer(
+                            answer_text=sentence(rng, 20, "."),
+                            question_id=rng.choice(question_ids),
+                            author_id=author.pk,
+                            author_email=author.email,
+                        )
+                    )
+                answers += len(bulk_insert(Answer, batch))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(users)} users, {len(question_ids)} questions and "
+                f"{answers} answers in {time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto every replica file, "
+        "a stand-in for real replication"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="keep copying every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY]
+        if primary.vendor != "sqlite":
+            raise CommandError(
+                "Only SQLite replicas can be synced, use the database's own replication"
+            )
+        aliases = settings.REPLICA_CONF["ALIASES"]
+        if not aliases:
+            raise CommandError("No replicas configured, set DATABASE_REPLICAS")
+
+        while True:
+            started = time.perf_counter()
+            self.sync(primary, aliases)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Synced {len(aliases)} replicas in "
+                    f"{time.perf_counter() - started:.2f}s"
+                )
+            )
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
+
+    def sync(self, primary, aliases):
+        primary.ensure_connection()
+        for alias in aliases:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                # the backup API copies a consistent snapshot even while the
+                # primary is being written to
+                primary.connection.backup(target)
+            finally:
+                target.close()
@@ -0,0 +1,321 @@
+import math
+import random
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS
+
+from . import routers, throttling
+from .auth import JWTAuthentication
+from .metrics import COUNT_BUCKETS, SIZE_BUCKETS, end_request, registry, start_request
+
+registry.describe(
+    "http_requests_total", "counter", "Requests served, by view, method and status."
+)
+registry.describe(
+    "http_request_duration_seconds", "histogram", "Wall time per request, by view."
+)
+registry.describe(
+    "http_request_db_queries", "histogram", "Database queries per request, by view."
+)
+registry.describe(
+    "http_request_db_duration_seconds",
+    "histogram",
+    "Time spent in the database per request, by view.",
+)
+registry.describe(
+    "http_request_serialize_duration_seconds",
+    "histogram",
+    "Time spent serializing per request, by view.",
+)
+registry.describe(
+    "http_response_size_bytes", "histogram", "Response body size, by view."
+)
+
+
+class ProfilingMiddleware:
+    """
+    Records wall time, database queries and time, serializer time and
+    response size of every request.
+
+    Each request gets a `Server-Timing` header, and the numbers are added to
+    per view histograms served by /metrics. With PROFILING_CONF["ON_DEMAND"]
+    a request sent with `X-Profile: 1` is run under cProfile, and a share
+    SAMPLE_RATE of all requests is profiled anyway. Profiles are dumped to
+    PROFILING_CONF["DIR"], which keeps the MAX_DUMPS newest, and the file is
+    named in `X-Profile-Dump`.
+
+    cProfile only follows the thread it runs in, so requests served through
+    ASGI (`__acall__`) are never profiled and their `X-Profile` is ignored.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profiler = self.profiler(request)
+        stats, token = start_request()
+        try:
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        finally:
+            end_request(token)
+
+        if profiler is not None:
+            self.dump(profiler, request, response)
+        self.record(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+
+        self.record(request, response, stats)
+        return response
+
+    def profiler(self, request):
+        conf = settings.PROFILING_CONF
+        wanted = conf["ON_DEMAND"] and request.headers.get("X-Profile") == "1"
+        if not wanted and random.random() >= conf["SAMPLE_RATE"]:
+            return None
+
+        import cProfile
+
+        return cProfile.Profile()
+
+    def dump(self, profiler, request, response):
+        directory = Path(settings.PROFILING_CONF["DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{view_name(request)}-{time.time_ns()}.prof"
+        profiler.dump_stats(path)
+        response["X-Profile-Dump"] = path.name
+
+        # named <view>-<time_ns>.prof, oldest first
+        dumps = sorted(
+            directory.glob("*-*.prof"), key=lambda dump: dump.stem.rpartition("-")[2]
+        )
+        for old in dumps[: -settings.PROFILING_CONF["MAX_DUMPS"]]:
+            old.unlink(missing_ok=True)
+
+    def record(self, request, response, stats):
+        elapsed = time.perf_counter() - stats.started
+        view = {"view": view_name(request)}
+
+        registry.inc(
+            "http_requests_total",
+            {**view, "method": request.method, "status": response.status_code},
+        )
+        registry.observe("http_request_duration_seconds", elapsed, view)
+        registry.observe(
+            "http_request_db_queries", stats.queries, view, buckets=COUNT_BUCKETS
+        )
+        registry.observe("http_request_db_duration_seconds", stats.db_time, view)
+        registry.observe(
+            "http_request_serialize_duration_seconds", stats.serialize_time, view
+        )
+        if not response.streaming:
+            registry.observe(
+                "http_response_size_bytes",
+                len(response.content),
+                view,
+                buckets=SIZE_BUCKETS,
+            )
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+                f"ser;dur={stats.serialize_time * 1000:.2f}",
+                f"total;dur={elapsed * 1000:.2f}",
+            ]
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tells `app.routers.ReplicaRouter` who the request is from and whether it
+    may read from a replica, and pins the user to the primary after a write.
+
+    The user comes from the JWT `user_id`, decoded through the token cache
+    DRF authentication uses as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        self.finish(state)
+        return response
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        self.finish(state)
+        return response
+
+    def start(self, request):
+        user_id = token_user_id(request) if settings.REPLICA_CONF["ALIASES"] else None
+        return routers.start_request(user_id, request.method not in SAFE_METHODS)
+
+    def finish(self, state):
+        if state.wrote and state.user_id is not None:
+            routers.pin(state.user_id)
+
+
+class ThrottleMiddleware:
+    """
+    Applies the rate limits and concurrency caps of `app.throttling`.
+
+    A request over its IP or user rate gets a 429, one past its endpoint
+    class's concurrency cap a 503, both with a `Retry-After` header. Every
+    decision is counted in `throttle_decisions_total`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        limit, refused = self.admit(request)
+        if refused is not None:
+            return refused
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            limit.release()
+            raise
+        return self.hold(limit, response)
+
+    async def __acall__(self, request):
+        limit, refused = self.admit(request)
+        if refused is not None:
+            return refused
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            limit.release()
+            raise
+        return self.hold(limit, response)
+
+    def hold(self, limit, response):
+        """
+        Release `limit` once `response` is sent. A streamed body, like an
+        event stream, keeps its request in flight until the response closes.
+        """
+        if response.streaming:
+            response._resource_closers.append(limit.release)
+        else:
+            limit.release()
+        return response
+
+    def admit(self, request):
+        """
+        Check the request against the limits of its endpoint class
+
+        Returns:
+            (limit, refused) (tuple): the acquired concurrency limit, to be
+                released after the response, or the response refusing the request.
+        """
+        urlconf = getattr(request, "urlconf", None) or settings.ROOT_URLCONF
+        name = throttling.endpoint_class(
+            url_name(urlconf, request.path_info), request.method
+        )
+
+        decision, wait = throttling.check_rates(
+            name, throttling.client_ip(request), token_user_id(request)
+        )
+        if decision != "allowed":
+            throttling.record(name, decision)
+            return None, refuse(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many requests, slow down",
+                math.ceil(wait),
+            )
+
+        limit = throttling.get_limit(name)
+        if not limit.acquire():
+            throttling.record(name, "shed")
+            return None, refuse(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Too busy, retry shortly",
+                settings.THROTTLE_CONF["RETRY_AFTER"],
+            )
+        throttling.record(name, "allowed")
+        return limit, None
+
+
+@lru_cache(maxsize=4096)
+def url_name(urlconf, path):
+    """
+    The name of the URL pattern `path` resolves to, resolved once per path
+    rather than on every request, before Django resolves it for the view.
+    """
+    try:
+        return resolve(path, urlconf).url_name
+    except Resolver404:
+        return None
+
+
+def refuse(status_code, message, retry_after):
+    return JsonResponse(
+        {"message": message},
+        status=status_code,
+        headers={"Retry-After": str(max(1, retry_after))},
+    )
+
+
+def token_user_id(request):
+    """
+    The JWT `user_id` of the request, None when it has no valid token.
+    """
+    try:
+        payload = JWTAuthentication().get_payload(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    return payload["user_id"] if payload is not None else None
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match is not None and match.url_name else "unmatched"
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# FTS5 tables use the question/answer tables as external content, so they
+# only store the index. Triggers keep them in sync with every write,
+# including bulk_create and cascading deletes.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE app_{model}_fts USING fts5(
+        {field}, content='app_{model}', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER app_{model}_fts_insert AFTER INSERT ON app_{model} BEGIN
+        INSERT INTO app_{model}_fts(rowid, {field}) VALUES (new.id, new.{field});
+    END
+    """,
+    """
+    CREATE TRIGGER app_{model}_fts_delete AFTER DELETE ON app_{model} BEGIN
+        INSERT INTO app_{model}_fts(app_{model}_fts, rowid, {field})
+        VALUES ('delete', old.id, old.{field});
+    END
+    """,
+    """
+    CREATE TRIGGER app_{model}_fts_update AFTER UPDATE OF {field} ON app_{model} BEGIN
+        INSERT INTO app_{model}_fts(app_{model}_fts, rowid, {field})
+        VALUES ('delete', old.id, old.{field});
+        INSERT INTO app_{model}_fts(rowid, {field}) VALUES (new.id, new.{field});
+    END
+    """,
+    "INSERT INTO app_{model}_fts(app_{model}_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS app_{model}_fts_insert",
+    "DROP TRIGGER IF EXISTS app_{model}_fts_delete",
+    "DROP TRIGGER IF EXISTS app_{model}_fts_update",
+    "DROP TABLE IF EXISTS app_{model}_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX app_{model}_search_idx ON app_{model} "
+    "USING GIN (to_tsvector('english'::regconfig, {field}))",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS app_{model}_search_idx",
+]
+
+INDEXED = [("question", "question_text"), ("answer", "answer_text")]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in statements:
+            return
+        for model, field in INDEXED:
+            for statement in statements[vendor]:
+                schema_editor.execute(statement.format(model=model, field=field))
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_question_counters_and_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
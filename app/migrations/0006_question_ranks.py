@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from app.ranking import fold_scores
+
+
+def backfill_ranks(apps, schema_editor):
+    Answer = apps.get_model("app", "Answer")
+    QuestionRank = apps.get_model("app", "QuestionRank")
+    scores = fold_scores(
+        Answer.objects.order_by().values_list("question_id", "created_at").iterator()
+    )
+    QuestionRank.objects.bulk_create(
+        [QuestionRank(question_id=pk, score=score) for pk, score in scores.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_question_updated_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionRank",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rank",
+                        serialize=False,
+                        to="app.question",
+                    ),
+                ),
+                ("score", models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                condition=models.Q(("answer_count", 0)),
+                fields=["-created_at", "-id"],
+                name="question_unanswered_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="questionrank",
+            index=models.Index(
+                fields=["-score", "-question"], name="question_rank_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from app.search import SEARCH_INDEXES, search_index
+
+# 0003 indexed to_tsvector('english', field), while SearchVector queries
+# to_tsvector('english', COALESCE(field, '')), so PostgreSQL never used the
+# indexes. They are rebuilt on the expression the queries use.
+OLD_INDEX = (
+    "CREATE INDEX app_{table}_search_idx ON app_{table} "
+    "USING GIN (to_tsvector('english'::regconfig, {field}))"
+)
+
+
+def rebuild_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, field in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS app_{table}_search_idx")
+        schema_editor.add_index(
+            apps.get_model("app", table), search_index(table, field)
+        )
+
+
+def restore_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, field in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS app_{table}_search_idx")
+        schema_editor.execute(OLD_INDEX.format(table=table, field=field))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_question_ranks"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_indexes, restore_indexes),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class User(models.Model):
@@ -8,12 +9,45 @@ class User(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class LiveQuestionManager(models.Manager):
+    """Questions that are not waiting for a background delete."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Question(models.Model):
     question_text = models.CharField(max_length=250)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     author_email = models.EmailField(max_length=225, null=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # denormalized from Answer, kept up to date by app.signals
+    answer_count = models.PositiveIntegerField(default=0)
+    last_answered_at = models.DateTimeField(null=True, blank=True)
+    # set when the question and its answers are left to the delete_question job
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveQuestionManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="question_created_idx"),
+            models.Index(
+                fields=["author", "created_at"], name="question_author_created_idx"
+            ),
+            models.Index(fields=["answer_count"], name="question_answer_count_idx"),
+            models.Index(fields=["last_answered_at"], name="question_answered_idx"),
+            # the unanswered feed, newest first
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(answer_count=0),
+                name="question_unanswered_idx",
+            ),
+            # max(updated_at) and count(*) for the list's ETag, see app.views
+            models.Index(fields=["updated_at"], name="question_updated_idx"),
+        ]
 
 
 class Answer(models.Model):
@@ -25,3 +59,76 @@ class Answer(models.Model):
     author_email = models.EmailField(max_length=225, null=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["question", "created_at"], name="answer_question_created_idx"
+            ),
+            models.Index(
+                fields=["author", "created_at"], name="answer_author_created_idx"
+            ),
+        ]
+
+
+class QuestionRank(models.Model):
+    """
+    Trending score of an answered question, see app.ranking.
+    """
+
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True, related_name="rank"
+    )
+    # log of the sum of its answers' weights, which decay with their age
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score", "-question"], name="question_rank_idx"),
+        ]
+
+
+class Notification(models.Model):
+    """A new answer in a thread the user takes part in."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"], name="notification_user_created_idx"
+            ),
+        ]
+        constraints = [
+            # a job may run twice, see app.jobs
+            models.UniqueConstraint(
+                fields=["user", "answer"], name="notification_user_answer_uniq"
+            ),
+        ]
+
+
+class Job(models.Model):
+    """
+    Deferred work, run by `python manage.py run_jobs`, see app.jobs.
+
+    A pending job is due at `run_at`. Claiming a job pushes `run_at` past its
+    lease, so the job comes due again if its worker dies before finishing it.
+    """
+
+    PENDING = "pending"
+    FAILED = "failed"
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"], name="job_due_idx")]
@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(values, direction):
+    """
+    Encode keyset values into an opaque, url-safe cursor
+
+    Args:
+        values (list): ordering values of the boundary row.
+        direction (str): "n" for the next page, "p" for the previous one.
+
+    Returns:
+        cursor (str): base64 encoded cursor.
+    """
+    raw = json.dumps({"v": values, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by `encode_cursor`
+
+    Args:
+        cursor (str): cursor sent by the client.
+
+    Returns:
+        (values, direction) (tuple): boundary values and page direction.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = data["v"], data["d"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+    if direction not in ("n", "p") or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+def get_page_size(request, param="page_size"):
+    """
+    Read a page size from the query string, clamped to the configured maximum.
+    """
+    conf = settings.PAGINATION_CONF
+    size = conf["PAGE_SIZE"]
+    try:
+        size = int(request.GET.get(param, size))
+    except ValueError:
+        pass
+    return max(1, min(size, conf["MAX_PAGE_SIZE"]))
+
+
+class Page:
+    def __init__(self, rows, next_cursor, previous_cursor):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+
+class KeysetPaginator:
+    """
+    Keyset (cursor) pagination over a fixed, unique ordering.
+
+    Rows are fetched with a `WHERE (a, b) < (x, y)` style predicate instead
+    of an OFFSET, so every page costs the same whatever its depth. The last
+    field of `ordering` must be unique (usually the primary key).
+
+    Args:
+        ordering (tuple): field names, prefixed with "-" for descending.
+        page_size (int): number of rows per page.
+    """
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    def paginate(self, queryset, cursor=None):
+        """
+        Fetch one page of `queryset`
+
+        Args:
+            queryset (QuerySet): unordered queryset to paginate.
+            cursor (str): opaque cursor from a previous page, if any.
+
+        Returns:
+            page (Page): rows plus next/previous cursors.
+        """
+        return self.page(list(self.window(queryset, cursor)))
+
+    def window(self, queryset, cursor=None):
+        """
+        Narrow `queryset` to the rows of one page, plus one to detect more.
+
+        The returned queryset is lazy, so it can be used as a `Prefetch`
+        queryset. Pass the fetched rows to `page` to build the result.
+        """
+        self.boundary, self.forward = None, True
+        if cursor:
+            values, direction = decode_cursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            self.boundary = self._to_python(queryset.model, values)
+            self.forward = direction == "n"
+
+        ordering = self.ordering if self.forward else self._reversed()
+        if self.boundary is not None:
+            queryset = queryset.filter(self._after(self.boundary, ordering))
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def page(self, rows):
+        """
+        Build a `Page` from the rows fetched through `window`.
+        """
+        forward = self.forward
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = encode_cursor(self._values(rows[-1]), "n")
+            if (has_more and not forward) or (forward and self.boundary is not None):
+                previous_cursor = encode_cursor(self._values(rows[0]), "p")
+        return Page(rows, next_cursor, previous_cursor)
+
+    def _reversed(self):
+        return tuple(
+            name[1:] if name.startswith("-") else "-" + name for name in self.ordering
+        )
+
+    def _after(self, values, ordering):
+        # (a, b) after (x, y)  ==  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, name in enumerate(ordering):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            clause = Q(**{f"{field}__{lookup}": values[index]})
+            for prev_index in range(index):
+                clause &= Q(**{self.fields[prev_index]: values[prev_index]})
+            condition |= clause
+        return condition
+
+    def _values(self, row):
+        values = []
+        for field in self.fields:
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            if hasattr(value, "pk"):
+                value = value.pk
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    def _to_python(self, model, values):
+        boundary = []
+        try:
+            for name, value in zip(self.fields, values):
+                # a cursor we issued only holds non-null scalars
+                if value is None or isinstance(value, (dict, list)):
+                    raise InvalidCursor(values)
+                field = model._meta.get_field(name)
+                if field.is_relation:
+                    field = field.target_field
+                value = field.to_python(value)
+                # e.g. integers past the column's range
+                field.run_validators(value)
+                boundary.append(value)
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor(values)
+        return boundary
@@ -0,0 +1,137 @@
+"""
+Publish/subscribe for the real-time event streams, see
+`async_views.question_events`.
+
+`get_broker()` returns the PUBSUB_CONF["BACKEND"] broker. The default
+`InProcessBroker` only reaches subscribers of the process that publishes, so
+with several processes every one of them needs its events published in
+process too, or the backend replaced with one built on a shared broker. A
+backend implements `publish(channel, message)`, `subscribe(channel)` and
+`has_subscribers(channel)`.
+
+Each subscription buffers at most PUBSUB_CONF["QUEUE_SIZE"] messages. A
+subscriber that falls that far behind is dropped and gets `OVERFLOW`, so a
+slow client costs bounded memory and is told to catch up by reloading.
+"""
+
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import registry
+
+# the last message of a subscription that could not keep up
+OVERFLOW = object()
+
+registry.describe(
+    "pubsub_dropped_subscribers_total",
+    "counter",
+    "Event stream subscribers dropped for falling behind.",
+)
+
+
+def question_channel(question_id):
+    return f"question:{question_id}"
+
+
+class Subscription:
+    """
+    Messages published to `channel`, read with `await get()` on the event
+    loop that subscribed. Close it when done.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def deliver(self, message):
+        """Queue `message`, from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # the subscriber's loop is gone
+            self.close()
+
+    def _put(self, message):
+        if self.closed:
+            return
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+            registry.inc("pubsub_dropped_subscribers_total")
+            self.close()
+            return
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """
+        Returns:
+            message: the next message, `OVERFLOW`, or None after `timeout`
+                seconds without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.closed = True
+        self.broker.unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBroker:
+    """Delivers messages to the subscribers of this process."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.PUBSUB_CONF["QUEUE_SIZE"]
+        self.subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Subscribe the running event loop to `channel`."""
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self.subscriptions.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(subscription.channel, None)
+
+    def has_subscribers(self, channel):
+        return channel in self.subscriptions
+
+    def publish(self, channel, message):
+        """
+        Send `message` to the current subscribers of `channel`, from any
+        thread. Never blocks: see `Subscription` for slow subscribers.
+        """
+        with self._lock:
+            subscribers = list(self.subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+@lru_cache(maxsize=None)
+def _load_broker(backend):
+    return import_string(backend)()
+
+
+def get_broker():
+    return _load_broker(settings.PUBSUB_CONF["BACKEND"])
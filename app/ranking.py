@@ -0,0 +1,138 @@
+"""
+Trending scores of questions, stored in `QuestionRank`.
+
+Every answer adds a weight to its question that halves every
+RANKING_CONF["HALF_LIFE_HOURS"], so the trending feed favours the questions
+answered most, most recently. Decaying every score by the same factor leaves
+their order unchanged, so instead of decaying stored scores as time passes,
+an answer posted at unix time t weighs e^(λt) for good, λ being the decay
+rate. Those weights overflow a float within weeks, so a score is kept as the
+log of its weights' sum, which an answer updates with `logaddexp`.
+
+Scores are kept up to date by app.signals as answers are written and
+deleted, and recomputed from the answers table by
+`python manage.py rebuild_question_ranks`, which is needed after changing
+the half-life.
+"""
+
+import math
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Answer, QuestionRank
+
+# deleting an answer worth more than 1 - e^-0.01 of its question's score
+# cancels too many digits, the score is recomputed instead
+CANCELLATION = -0.01
+
+
+def decay_rate():
+    return math.log(2) / (settings.RANKING_CONF["HALF_LIFE_HOURS"] * 3600)
+
+
+def log_weight(created_at):
+    """Log of the weight of an answer posted at `created_at`."""
+    return decay_rate() * created_at.timestamp()
+
+
+def logaddexp(a, b):
+    """log(e^a + e^b) without overflow, `a` may be None for an empty sum."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def fold_scores(answers):
+    """
+    Scores of the questions of `answers`
+
+    Args:
+        answers (iterable): (question_id, created_at) pairs.
+
+    Returns:
+        scores (dict): score by question id.
+    """
+    scores = {}
+    for question_id, created_at in answers:
+        scores[question_id] = logaddexp(scores.get(question_id), log_weight(created_at))
+    return scores
+
+
+def add_answers(answers):
+    """
+    Add new answers to their questions' scores, in the answers' transaction.
+
+    The answers' questions must be locked by the caller, see app.signals.
+    """
+    added = fold_scores((answer.question_id, answer.created_at) for answer in answers)
+    ranks = QuestionRank.objects.in_bulk(added)
+    for question_id, score in added.items():
+        rank = ranks.get(question_id)
+        if rank is None:
+            ranks[question_id] = QuestionRank(question_id=question_id, score=score)
+        else:
+            rank.score = logaddexp(rank.score, score)
+    QuestionRank.objects.bulk_create(
+        ranks.values(),
+        batch_size=settings.BULK_CONF["BATCH_SIZE"],
+        update_conflicts=True,
+        update_fields=["score"],
+        unique_fields=["question"],
+    )
+
+
+def remove_answer(answer):
+    """
+    Take a deleted answer out of its question's score.
+    """
+    rank = QuestionRank.objects.filter(pk=answer.question_id).first()
+    if rank is None:
+        return
+    # log(e^score - e^weight) = score + log(1 - e^(weight - score))
+    gap = log_weight(answer.created_at) - rank.score
+    if gap > CANCELLATION:
+        recompute([answer.question_id])
+        return
+    rank.score += math.log1p(-math.exp(gap))
+    rank.save(update_fields=["score"])
+
+
+def recompute(question_ids):
+    """
+    Recompute the scores of the given questions from the answers table.
+    """
+    scores = fold_scores(
+        Answer.objects.filter(question_id__in=question_ids)
+        .order_by()
+        .values_list("question_id", "created_at")
+    )
+    QuestionRank.objects.filter(pk__in=set(question_ids) - set(scores)).delete()
+    QuestionRank.objects.bulk_create(
+        [QuestionRank(question_id=pk, score=score) for pk, score in scores.items()],
+        update_conflicts=True,
+        update_fields=["score"],
+        unique_fields=["question"],
+    )
+
+
+def rebuild():
+    """
+    Recompute every score from the answers table, in one transaction.
+
+    Returns:
+        count (int): the number of questions ranked.
+    """
+    with transaction.atomic():
+        scores = fold_scores(
+            Answer.objects.order_by()
+            .values_list("question_id", "created_at")
+            .iterator(chunk_size=settings.PAGINATION_CONF["STREAM_CHUNK_SIZE"])
+        )
+        QuestionRank.objects.all().delete()
+        QuestionRank.objects.bulk_create(
+            [QuestionRank(question_id=pk, score=score) for pk, score in scores.items()],
+            batch_size=settings.BULK_CONF["BATCH_SIZE"],
+        )
+    return len(scores)
@@ -0,0 +1,93 @@
+"""
+Read replica routing.
+
+Reads go to a random alias of REPLICA_CONF["ALIASES"] and writes to
+`default`. Reads stay on `default` for the rest of a request once it has
+written or when it is not a safe method, and for REPLICA_CONF["PIN_SECONDS"]
+after a user's last write, so users always read their own writes.
+`ReplicaRoutingMiddleware` tells the router who the request is from. Outside
+of a request, e.g. in the `run_jobs` worker, every read goes to `default`:
+jobs read rows written just before them, which a replica may not have yet.
+
+PIN_SECONDS is also the replication lag the API tolerates: responses built
+from replica reads are cached for no longer than that.
+"""
+
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+
+PRIMARY = "default"
+
+
+class RoutingState:
+    """How the current request is routed."""
+
+    def __init__(self, user_id=None, primary=False):
+        self.user_id = user_id
+        self.primary = primary
+        self.wrote = False
+        self.replica_reads = False
+
+
+_current = contextvars.ContextVar("routing_state", default=None)
+
+
+def start_request(user_id, primary):
+    state = RoutingState(user_id, primary or is_pinned(user_id))
+    return state, _current.set(state)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def read_from_replica():
+    """Whether the current request has read from a replica so far."""
+    state = _current.get()
+    return state is not None and state.replica_reads
+
+
+def pin_key(user_id):
+    return f"replica:pin:{user_id}"
+
+
+def get_cache():
+    return caches[settings.REPLICA_CONF["CACHE_ALIAS"]]
+
+
+def pin(user_id):
+    """Keep `user_id`'s reads on the primary for PIN_SECONDS."""
+    get_cache().set(pin_key(user_id), True, settings.REPLICA_CONF["PIN_SECONDS"])
+
+
+def is_pinned(user_id):
+    if user_id is None or not settings.REPLICA_CONF["ALIASES"]:
+        return False
+    return get_cache().get(pin_key(user_id), False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_CONF["ALIASES"]
+        state = _current.get()
+        if not replicas or state is None or state.primary or state.wrote:
+            return PRIMARY
+        state.replica_reads = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas are copies of the primary, rows relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema with the data, see the sync_replicas command
+        return db not in settings.REPLICA_CONF["ALIASES"]
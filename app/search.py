@@ -0,0 +1,180 @@
+"""
+Full-text search over question and answer text.
+
+SQLite reads the FTS5 tables `app_question_fts`/`app_answer_fts`, kept in
+sync with their content tables by triggers (see migration 0003). PostgreSQL
+matches the `search_vector` expression, which GIN indexes are built on (see
+migration 0007). Both backends rank hits best first and highlight the
+matched terms with <mark> tags.
+"""
+
+import re
+
+from django.db import connection
+
+HIGHLIGHT = ("<mark>", "</mark>")
+SNIPPET_TOKENS = 12
+TSVECTOR_CONFIG = "english"
+
+SQLITE_SEARCH = """
+    SELECT * FROM (
+        SELECT 'question' AS type, q.id AS question_id, NULL AS answer_id,
+               q.question_text,
+               snippet(app_question_fts, 0, %(open)s, %(close)s, '…', %(tokens)s),
+               -bm25(app_question_fts) AS rank
+        FROM app_question_fts
+        JOIN app_question q ON q.id = app_question_fts.rowid
+        WHERE app_question_fts MATCH %(match)s AND q.deleted_at IS NULL
+        UNION ALL
+        SELECT 'answer', a.question_id, a.id,
+               q.question_text,
+               snippet(app_answer_fts, 0, %(open)s, %(close)s, '…', %(tokens)s),
+               -bm25(app_answer_fts)
+        FROM app_answer_fts
+        JOIN app_answer a ON a.id = app_answer_fts.rowid
+        JOIN app_question q ON q.id = a.question_id
+        WHERE app_answer_fts MATCH %(match)s AND q.deleted_at IS NULL
+    )
+    ORDER BY rank DESC, question_id DESC
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+HIT_FIELDS = ("type", "question_id", "answer_id", "question_text", "snippet", "rank")
+
+# (table, field) pairs of the PostgreSQL search indexes
+SEARCH_INDEXES = [("question", "question_text"), ("answer", "answer_text")]
+
+
+def to_fts5_query(text):
+    """
+    Turn free text into a safe FTS5 query
+
+    Every word is quoted, so FTS5 operators typed by users are matched as
+    text, and the last word is a prefix match for search-as-you-type.
+
+    Returns:
+        query (str): FTS5 MATCH expression, empty when there is nothing to match.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = ['"%s"' % word.replace('"', '""') for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(text, limit, offset=0):
+    """
+    Search questions and answers
+
+    Args:
+        text (str): free text typed by the user.
+        limit (int): number of hits to return.
+        offset (int): number of hits to skip.
+
+    Returns:
+        hits (list): dicts with the fields in HIT_FIELDS, best first.
+    """
+    if connection.vendor == "postgresql":
+        return _search_postgresql(text, limit, offset)
+
+    match = to_fts5_query(text)
+    if not match:
+        return []
+    params = {
+        "match": match,
+        "open": HIGHLIGHT[0],
+        "close": HIGHLIGHT[1],
+        "tokens": SNIPPET_TOKENS,
+        "limit": limit,
+        "offset": offset,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(SQLITE_SEARCH, params)
+        return [dict(zip(HIT_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def search_vector(field):
+    """
+    The `to_tsvector` expression searched on PostgreSQL.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector(field, config=TSVECTOR_CONFIG)
+
+
+def search_index(table, field):
+    """
+    GIN index on `search_vector(field)`. It is compiled by Django like the
+    search queries are, so PostgreSQL finds the same expression in both
+    and uses the index.
+    """
+    from django.contrib.postgres.indexes import GinIndex
+
+    return GinIndex(search_vector(field), name=f"app_{table}_search_idx")
+
+
+def _search_postgresql(text, limit, offset):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+    from .models import Answer, Question
+
+    query = SearchQuery(text, search_type="websearch", config=TSVECTOR_CONFIG)
+    headline = {
+        "config": TSVECTOR_CONFIG,
+        "start_sel": HIGHLIGHT[0],
+        "stop_sel": HIGHLIGHT[1],
+        "max_words": SNIPPET_TOKENS,
+    }
+    hits = []
+    for model, field, kind in (
+        (Question, "question_text", "question"),
+        (Answer, "answer_text", "answer"),
+    ):
+        vector = search_vector(field)
+        rows = (
+            model.objects.annotate(document=vector)
+            .filter(document=query)
+            .annotate(
+                rank=SearchRank(vector, query),
+                snippet=SearchHeadline(field, query, **headline),
+            )
+            .order_by("-rank")
+        )
+        if model is Question:
+            rows = rows.values("id", "question_text", "snippet", "rank")
+        else:
+            rows = rows.filter(question__deleted_at__isnull=True).values(
+                "id", "question_id", "question__question_text", "snippet", "rank"
+            )
+        for row in rows[: offset + limit]:
+            hits.append(
+                {
+                    "type": kind,
+                    "question_id": row.get("question_id", row["id"]),
+                    "answer_id": row["id"] if kind == "answer" else None,
+                    "question_text": row.get("question_text")
+                    or row.get("question__question_text"),
+                    "snippet": row["snippet"],
+                    "rank": row["rank"],
+                }
+            )
+    hits.sort(key=lambda hit: (hit["rank"], hit["question_id"]), reverse=True)
+    return hits[offset : offset + limit]
+
+
+def rebuild_index():
+    """
+    Rebuild the search index from the questions and answers tables.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for table, field in SEARCH_INDEXES:
+                cursor.execute(f"REINDEX INDEX app_{table}_search_idx")
+        else:
+            cursor.execute(
+                "INSERT INTO app_question_fts(app_question_fts) VALUES('rebuild')"
+            )
+            cursor.execute(
+                "INSERT INTO app_answer_fts(app_answer_fts) VALUES('rebuild')"
+            )
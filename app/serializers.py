@@ -1,5 +1,63 @@
-from rest_framework import serializers
-from .models import Question, User, Answer
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .models import Question, User, Answer, Notification
+
+# fields whose representation differs from the value `.values()` returns
+CONVERTED_FIELDS = (
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.DecimalField,
+    serializers.UUIDField,
+)
+
+
+class InvalidFields(Exception):
+    """Raised when `?fields=` names a field the serializer does not have."""
+
+
+class SparseFieldsMixin:
+    """
+    Lets a serializer be built with `fields`, the names of the only fields
+    to render, for `?fields=` sparse fieldsets. See `sparse_fields`.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+def sparse_fields(serializer_class, value):
+    """
+    Parse a comma separated `?fields=` value
+
+    Returns:
+        fields (tuple): the names in the serializer's own order, so every
+            spelling of a fieldset shares cache entries, or None for all.
+
+    Raises:
+        InvalidFields: a name is not a field of `serializer_class`.
+    """
+    if not value:
+        return None
+    wanted = {name.strip() for name in value.split(",")} - {""}
+    known = field_names(serializer_class)
+    unknown = wanted.difference(known)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in known if name in wanted) or None
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -8,13 +66,186 @@ class UserSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Question
-        fields = "__all__"
+        exclude = ["deleted_at"]
+        # the author comes from the request's user, see views.questions
+        read_only_fields = [
+            "author",
+            "author_email",
+            "answer_count",
+            "last_answered_at",
+        ]
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Answer
         fields = "__all__"
+        read_only_fields = ["author", "author_email"]
+
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # an answer stays on its question, the counters and caches of
+            # both would have to follow a move
+            extra_kwargs["question"] = {"read_only": True}
+        return extra_kwargs
+
+
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = "__all__"
+
+
+class QuestionWithAnswersSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    A question with one page of its answers embedded.
+
+    Expects the answers page prefetched into `page_answers`. `answer_fields`
+    narrows the answers like `fields` does the question.
+    """
+
+    answers = AnswerSerializer(source="page_answers", many=True, read_only=True)
+
+    def __init__(self, *args, answer_fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if answer_fields is not None and "answers" in self.fields:
+            self.fields["answers"] = AnswerSerializer(
+                source="page_answers", many=True, read_only=True, fields=answer_fields
+            )
+
+    class Meta:
+        model = Question
+        exclude = ["deleted_at"]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Validates every item and keeps the valid ones, instead of failing the
+    whole list on its first invalid item.
+
+    `validated_data` is a list of (index, attrs) pairs and the errors of the
+    rejected items are collected in `item_errors`, keyed by index.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {"non_field_errors": ["Expected a list of items."]}
+            )
+        if self.max_length is not None and len(data) > self.max_length:
+            raise serializers.ValidationError(
+                {"non_field_errors": [f"Send at most {self.max_length} items."]}
+            )
+
+        self.item_errors = {}
+        valid = []
+        for index, item in enumerate(data):
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as error:
+                self.item_errors[index] = error.detail
+        return valid
+
+
+class BulkQuestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Question
+        fields = ["question_text"]
+        list_serializer_class = BulkListSerializer
+
+
+class BulkAnswerSerializer(serializers.ModelSerializer):
+    # checked for all items at once by the view, instead of a query per item
+    question = serializers.IntegerField()
+
+    class Meta:
+        model = Answer
+        fields = ["question", "answer_text"]
+        list_serializer_class = BulkListSerializer
+
+    def validate_question(self, value):
+        # a value past the primary key's range would fail the view's query
+        Question._meta.pk.run_validators(value)
+        return value
+
+
+class ValuesSerializer:
+    """
+    Renders `.values(*columns)` rows the way `serializer_class` renders
+    model instances, without a serializer field call per value.
+
+    Only plain model fields are supported: relations are rendered as their
+    primary key.
+
+    Args:
+        serializer_class (ModelSerializer): serializer whose output to match.
+        fields (tuple): sparse fieldset to render and select, see
+            `sparse_fields`.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        model = serializer_class.Meta.model
+        serializer = serializer_class(fields=fields) if fields else serializer_class()
+        self.fields = []
+        for name, field in serializer.fields.items():
+            column = model._meta.get_field(field.source).attname
+            self.fields.append((name, column, field))
+        self.columns = [column for _, column, _ in self.fields]
+
+    def bind(self):
+        """
+        Row renderer for the current request.
+
+        The current timezone is looked up once here rather than for every
+        datetime, which is most of what DateTimeField.to_representation costs.
+
+        Returns:
+            to_representation (callable): renders one row into a dict.
+        """
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        converters = [
+            (name, column, self._converter(field, tz))
+            for name, column, field in self.fields
+        ]
+
+        def to_representation(row):
+            data = {}
+            for name, column, convert in converters:
+                value = row[column]
+                data[name] = (
+                    value if convert is None or value is None else convert(value)
+                )
+            return data
+
+        return to_representation
+
+    @staticmethod
+    def _converter(field, tz):
+        if not isinstance(field, CONVERTED_FIELDS):
+            return None
+        iso = getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601
+        if (
+            not isinstance(field, serializers.DateTimeField)
+            or not iso
+            or tz is None
+            or hasattr(field, "timezone")
+        ):
+            return field.to_representation
+
+        def iso_datetime(value):
+            if timezone.is_naive(value):
+                return field.to_representation(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return iso_datetime
+
+
+# a fieldset is any subset of the fields, so keep only the ones in use
+@lru_cache(maxsize=256)
+def values_serializer(serializer_class, fields=None):
+    return ValuesSerializer(serializer_class, fields)
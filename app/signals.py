@@ -0,0 +1,295 @@
+from django.conf import settings
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .auth import principal_cache
+from .cache import (
+    QUESTION_LIST_VERSION,
+    invalidate,
+    question_version_key,
+    user_version_key,
+)
+from .jobs import enqueue, is_purging, is_seeding
+from .metrics import record_query
+from .models import Answer, Question, User
+from .pubsub import get_broker, question_channel
+from .ranking import add_answers, remove_answer
+from .serializers import AnswerSerializer
+
+# Sent by app.bulk.bulk_insert for every batch written with bulk_create,
+# with the created `instances`.
+bulk_created = Signal()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Count every query against the request that runs it, see `app.metrics`.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """
+    Apply settings.SQLITE_CONF to every new SQLite connection.
+
+    The PRAGMAs go straight to the driver connection, so they are not counted
+    as queries of the request that happened to open the connection.
+    """
+    if connection.vendor != "sqlite":
+        return
+    conf = settings.SQLITE_CONF
+    pragmas = {
+        "journal_mode": conf["JOURNAL_MODE"],
+        "synchronous": conf["SYNCHRONOUS"],
+        "busy_timeout": conf["BUSY_TIMEOUT"],
+        "mmap_size": conf["MMAP_SIZE"],
+        "cache_size": conf["CACHE_SIZE"],
+    }
+    for name, value in pragmas.items():
+        if value is not None:
+            connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_principal(sender, instance, **kwargs):
+    """
+    Authenticate the user's next request against the saved row. Other
+    processes catch up within JWT_CONF["PRINCIPAL_TTL"].
+    """
+    principal_cache.discard(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    """
+    A question write changes its own detail page, the question list and its
+    author's feed.
+    """
+    invalidate(
+        question_version_key(instance.pk),
+        QUESTION_LIST_VERSION,
+        user_version_key(instance.author_id),
+    )
+
+
+def question_author_id(answer):
+    if Answer.question.is_cached(answer):
+        return answer.question.author_id
+    return (
+        Question.all_objects.filter(pk=answer.question_id)
+        .values_list("author_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_answer(sender, instance, origin=None, **kwargs):
+    """
+    An answer shows up on its question's detail page, in its author's feed,
+    and through the question's answer_count on the question list and in the
+    question author's feed.
+    """
+    if is_purging(instance.question_id):
+        # delete_questions invalidates its answers' authors per batch
+        return
+    if isinstance(origin, Question):
+        # the question's own invalidation covers everything but the answer author
+        invalidate(user_version_key(instance.author_id))
+        return
+    invalidate(
+        question_version_key(instance.question_id),
+        QUESTION_LIST_VERSION,
+        user_version_key(instance.author_id),
+        user_version_key(question_author_id(instance)),
+    )
+
+
+@receiver(post_save, sender=Answer)
+def count_new_answer(sender, instance, created, **kwargs):
+    """
+    Bump the question's answer counters in the answer's transaction.
+
+    Like every counter update, this moves the question's `updated_at`: the
+    counters are part of the question, see views.question_validators.
+    """
+    if not created:
+        return
+    Question.objects.filter(pk=instance.question_id).update(
+        answer_count=F("answer_count") + 1,
+        last_answered_at=instance.created_at,
+        updated_at=instance.created_at,
+    )
+
+
+@receiver(post_save, sender=Answer)
+def rank_new_answer(sender, instance, created, **kwargs):
+    """
+    Add a new answer to its question's trending score.
+
+    Connected after `count_new_answer`, whose UPDATE locks the question row
+    until the transaction ends, so the answers to a question update its
+    score one at a time.
+    """
+    if created:
+        add_answers([instance])
+
+
+@receiver(post_save, sender=Answer)
+def touch_question(sender, instance, created, **kwargs):
+    """
+    An edited answer changes its question's page, so its `updated_at` too.
+    """
+    if not created:
+        Question.objects.filter(pk=instance.question_id).update(
+            updated_at=instance.updated_at
+        )
+
+
+@receiver(post_save, sender=Answer)
+def notify_new_answer(sender, instance, created, **kwargs):
+    """
+    Queue the notifications of a new answer in the answer's transaction.
+    """
+    if created:
+        enqueue("notify_answers", {"answer_ids": [instance.pk]})
+
+
+@receiver(post_delete, sender=Answer)
+def count_deleted_answer(sender, instance, origin=None, **kwargs):
+    """
+    Drop a deleted answer from its question's counters.
+
+    Skipped when the question itself is being deleted along with its answers.
+    """
+    if isinstance(origin, Question) or is_purging(instance.question_id):
+        return
+    latest = (
+        Answer.objects.filter(question=OuterRef("pk"))
+        .order_by("-created_at")
+        .values("created_at")[:1]
+    )
+    Question.objects.filter(pk=instance.question_id).update(
+        answer_count=F("answer_count") - 1,
+        last_answered_at=Subquery(latest),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_delete, sender=Answer)
+def unrank_deleted_answer(sender, instance, origin=None, **kwargs):
+    """
+    Take a deleted answer out of its question's trending score, after
+    `count_deleted_answer` locked the question. A deleted question's score
+    goes with it.
+    """
+    if isinstance(origin, Question) or is_purging(instance.question_id):
+        return
+    remove_answer(instance)
+
+
+def recount_answers(question_ids):
+    """
+    Recompute the answer counters of the given questions from the answers table.
+    """
+    answers = (
+        Answer.objects.filter(question=OuterRef("pk")).order_by().values("question")
+    )
+    Question.objects.filter(pk__in=question_ids).update(
+        answer_count=Coalesce(Subquery(answers.annotate(n=Count("id")).values("n")), 0),
+        last_answered_at=Subquery(
+            answers.annotate(last=Max("created_at")).values("last")
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(bulk_created, sender=Question)
+def invalidate_bulk_questions(sender, instances, **kwargs):
+    authors = {question.author_id for question in instances}
+    invalidate(QUESTION_LIST_VERSION, *[user_version_key(a) for a in authors])
+
+
+@receiver(bulk_created, sender=Answer)
+def count_bulk_answers(sender, instances, **kwargs):
+    question_ids = {answer.question_id for answer in instances}
+    recount_answers(question_ids)
+    authors = {answer.author_id for answer in instances}
+    authors.update(
+        Question.objects.filter(pk__in=question_ids).values_list("author_id", flat=True)
+    )
+    invalidate(
+        *[question_version_key(question_id) for question_id in question_ids],
+        *[user_version_key(author_id) for author_id in authors],
+        QUESTION_LIST_VERSION,
+    )
+    if not is_seeding():
+        enqueue("notify_answers", {"answer_ids": [answer.pk for answer in instances]})
+    # after recount_answers locked their questions
+    add_answers(instances)
+
+
+def publish_event(question_id, event, data):
+    """
+    Publish an event on `question_id`'s stream once the transaction commits.
+
+    Args:
+        data (callable): builds the event data, only called when the stream
+            has subscribers.
+    """
+    channel = question_channel(question_id)
+    broker = get_broker()
+    if not broker.has_subscribers(channel):
+        return
+    message = {"event": event, "data": data()}
+    transaction.on_commit(lambda: broker.publish(channel, message))
+
+
+@receiver(post_save, sender=Answer)
+def publish_answer(sender, instance, created, **kwargs):
+    event = "answer.created" if created else "answer.updated"
+    publish_event(instance.question_id, event, lambda: AnswerSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Answer)
+def publish_deleted_answer(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Question) or is_purging(instance.question_id):
+        # the stream ends with question.deleted instead
+        return
+    publish_event(
+        instance.question_id,
+        "answer.deleted",
+        lambda: {"id": instance.pk, "question": instance.question_id},
+    )
+
+
+@receiver(bulk_created, sender=Answer)
+def publish_bulk_answers(sender, instances, **kwargs):
+    if is_seeding():
+        return
+    for answer in instances:
+        publish_event(
+            answer.question_id,
+            "answer.created",
+            lambda answer=answer: AnswerSerializer(answer).data,
+        )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def publish_deleted_question(sender, instance, signal, update_fields=None, **kwargs):
+    """
+    A question deleted, or left to the delete_question job, ends its stream.
+    """
+    if signal is post_delete or "deleted_at" in (update_fields or ()):
+        publish_event(instance.pk, "question.deleted", lambda: {"id": instance.pk})
@@ -0,0 +1,70 @@
+"""
+Request coalescing within a process.
+
+`SingleFlight` lets one thread compute a value per key while the threads
+asking for the same key meanwhile wait for it and share its result, so a
+burst of identical cache misses costs one computation. `cache.cache_response`
+adds a cache lock on top, so processes sharing the response cache do the same.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class Flight:
+    """
+    One computation of a key. The leader sets `result`, which the followers
+    get from `wait`.
+    """
+
+    def __init__(self):
+        self.result = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Returns:
+            result: the leader's result, None when it had none or did not
+                finish within `timeout` seconds.
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def finish(self):
+        self._done.set()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def flight(self, key):
+        """
+        Join the computation of `key`, starting it when there is none.
+
+        Yields:
+            (flight, leader) (tuple): the first thread in leads, and should
+                store what it computed in `flight.result`. The others should
+                `flight.wait`, which returns once the leader left the block.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            yield flight, False
+            return
+
+        try:
+            yield flight, True
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.finish()
+
+    def __len__(self):
+        return len(self._flights)
@@ -1,13 +1,47 @@
+import asyncio
+import io
 import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock, skipUnless
 
-from django.contrib.auth.hashers import make_password
+import jwt
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 
-from .auth import sign_token
-from .models import Answer, Question, User
-from .serializers import AnswerSerializer, QuestionSerializer
+from . import jobs, routers, throttling
+from .auth import get_principal, principal_cache, sign_token, token_cache
+from .bulk import bulk_insert
+from .cache import question_detail_key, question_list_key
+from .hashers import hash_password
+from .idempotency import Idempotency
+from .metrics import registry
+from .models import Answer, Job, Notification, Question, QuestionRank, User
+from .pagination import encode_cursor
+from .pubsub import OVERFLOW, InProcessBroker, get_broker, question_channel
+from .ranking import rebuild
+from .renderers import ORJSONRenderer
+from .routers import ReplicaRouter
+from .search import SEARCH_INDEXES, TSVECTOR_CONFIG, search_vector
+from .serializers import AnswerSerializer, QuestionSerializer, values_serializer
+from .singleflight import SingleFlight
+from .views import question_feed
 
 
 class UserTest(APITestCase):
@@ -47,6 +81,35 @@ class UserTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_login_upgrades_outdated_hash(self):
+        self.user.password = make_password("maya123", hasher="pbkdf2_sha256")
+        self.user.save()
+        response = self.client.post(
+            path="/auth/login/",
+            data=json.dumps(self.login_payload),
+            content_type="application/json",
+        )
+        self.user.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            self.user.password.startswith(settings.PASSWORD_CONF["ALGORITHM"])
+        )
+        self.assertTrue(check_password("maya123", self.user.password))
+
+    def test_login_rejected_when_hasher_saturated(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch("app.hashers._slots", slots):
+            response = self.client.post(
+                path="/auth/login/",
+                data=json.dumps(self.login_payload),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
     def test_login_invalid_user(self):
         response = self.client.post(
             path="/auth/login/",
@@ -56,6 +119,55 @@ class UserTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class JWTAuthenticationTest(APITestCase):
+    """Test module for the JWT authentication class"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.token = sign_token(self.user)
+        self.url = reverse("questions")
+        self.payload = {"question_text": "What is your name?"}
+        token_cache.clear()
+
+    def post_with(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + token)
+        return self.client.post(self.url, data=self.payload, format="json")
+
+    def test_valid_token_is_cached(self):
+        first = self.post_with(self.token)
+        second = self.post_with(self.token)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((token_cache.misses, token_cache.hits), (1, 1))
+
+    def test_tampered_signature_is_rejected(self):
+        forged = jwt.encode(
+            {"user_id": self.user.pk, "user_email": self.user.email, "exp": 2**31},
+            "this-is-not-the-secret-key-of-the-service",
+            algorithm="HS256",
+        )
+        response = self.post_with(forged)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_expired_token_is_rejected(self):
+        expired = jwt.encode(
+            {"user_id": self.user.pk, "user_email": self.user.email, "exp": 1},
+            settings.SECRET_KEY,
+            algorithm="HS256",
+        )
+        response = self.post_with(expired)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_missing_token_is_rejected(self):
+        response = self.client.post(self.url, data=self.payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 class QuestionTest(APITestCase):
     """Test Module for the  Question Model"""
 
@@ -101,32 +213,133 @@ class QuestionTest(APITestCase):
 
     def test_get_all_questions(self):
         response = self.client.get(path="/questions/")
-        questions = Question.objects.all()
+        questions = Question.objects.order_by("-created_at", "-id")
         serializer = QuestionSerializer(questions, many=True)
 
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertIsNone(response.data["next"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_paginate_questions_with_cursor(self):
+        for i in range(3):
+            Question.objects.create(
+                question_text=f"Question {i}?",
+                author=self.user,
+                author_email=self.user.email,
+            )
+        expected = list(
+            Question.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        first = self.client.get("/questions/", {"page_size": 2})
+        second = self.client.get(
+            "/questions/", {"page_size": 2, "cursor": first.data["next"]}
+        )
+        third = self.client.get(
+            "/questions/", {"page_size": 2, "cursor": second.data["next"]}
+        )
+        back = self.client.get(
+            "/questions/", {"page_size": 2, "cursor": third.data["previous"]}
+        )
+
+        pages = [first, second, third]
+        ids = [q["id"] for page in pages for q in page.data["results"]]
+        self.assertEqual(ids, expected)
+        self.assertIsNone(first.data["previous"])
+        self.assertIsNone(third.data["next"])
+        self.assertEqual(back.data["results"], second.data["results"])
+
+    def test_order_questions_by_activity(self):
+        Answer.objects.create(answer_text="Maya", author=self.user, question=self.quiz)
+
+        most_answered = self.client.get("/questions/", {"ordering": "most_answered"})
+        recent = self.client.get("/questions/", {"ordering": "recently_answered"})
+        unknown = self.client.get("/questions/", {"ordering": "oldest"})
+
+        self.assertEqual(
+            [q["id"] for q in most_answered.data["results"]],
+            [self.quiz.pk, self.quiz_two.pk],
+        )
+        self.assertEqual([q["id"] for q in recent.data["results"]], [self.quiz.pk])
+        self.assertEqual(unknown.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_questions_invalid_cursor(self):
+        response = self.client.get("/questions/", {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tampered_cursors(self):
+        detail = f"/questions/{self.quiz.pk}/"
+        for values in (
+            [None, None],
+            [{"a": 1}, 1],
+            [[1], 1],
+            ["2020-01-01T00:00:00", 99999999999999999999999],
+            ["not a date", 1],
+        ):
+            cursor = encode_cursor(values, "n")
+            for path, params in (
+                ("/questions/", {"cursor": cursor}),
+                ("/questions/", {"cursor": cursor, "ordering": "trending"}),
+                (detail, {"answers_cursor": cursor}),
+            ):
+                with self.subTest(values=values, path=path, params=params):
+                    response = self.client.get(path, params)
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_questions(self):
+        response = self.client.get("/questions/", {"stream": "true"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        questions = Question.objects.order_by("-created_at", "-id")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines], [q.id for q in questions]
+        )
+
     def test_get_valid_single_question(self):
+        Answer.objects.create(answer_text="Maya", author=self.user, question=self.quiz)
         url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
         response = self.client.get(url)
         question = Question.objects.get(pk=self.quiz.pk)
-        answers = question.answers.all()
+        answers = question.answers.order_by("created_at", "id")
         serializer = QuestionSerializer(question)
         answer_serializer = AnswerSerializer(answers, many=True)
 
+        expected = dict(serializer.data, answer_count=1)
         self.assertEqual(
-            {
-                "question": response.data["question"],
-                "answers": response.data["answers"],
-            },
-            {
-                "question": serializer.data,
-                "answers": answer_serializer.data,
-            },
+            {k: v for k, v in response.data.items() if k in expected}, expected
         )
+        self.assertEqual(response.data["answers"], answer_serializer.data)
+        self.assertIsNone(response.data["answers_next"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_single_question_query_count(self):
+        for i in range(30):
+            Answer.objects.create(
+                answer_text=f"Answer {i}", author=self.user, question=self.quiz
+            )
+        url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        get_principal(self.user.pk)  # authenticated once already
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"answers_page_size": 10})
+
+        self.assertEqual(response.data["answer_count"], 30)
+        self.assertEqual(len(response.data["answers"]), 10)
+
+        next_page = self.client.get(
+            url,
+            {"answers_page_size": 10, "answers_cursor": response.data["answers_next"]},
+        )
+        self.assertEqual(next_page.data["answers"][0]["answer_text"], "Answer 10")
+
+    def test_get_missing_single_question(self):
+        url = reverse("question_detail", kwargs={"question_id": 9999})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_delete_valid_question(self):
         url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
         response = self.client.delete(url)
@@ -181,7 +394,1779 @@ class AnswerTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_update_does_not_move_answer(self):
+        other = Question.objects.create(
+            question_text="What is your age?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        url = reverse("answer_detail", args=[self.quiz.pk, self.answer.pk])
+        response = self.client.put(
+            path=url,
+            data={"answer_text": "Googlo", "question": other.pk},
+            format="json",
+        )
+        self.answer.refresh_from_db()
+        other.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.answer.question_id, self.quiz.pk)
+        self.assertEqual(self.answer.answer_text, "Googlo")
+        self.assertEqual(other.answer_count, 0)
+
+    def test_answer_of_another_question(self):
+        other = Question.objects.create(
+            question_text="What is your age?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        url = reverse("answer_detail", args=[other.pk, self.answer.pk])
+
+        for method in ("get", "put", "delete"):
+            response = getattr(self.client, method)(
+                url, {"answer_text": "Googlo"}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Answer.objects.filter(pk=self.answer.pk).exists())
+
     def test_delete_valid_answer(self):
         url = reverse("answer_detail", args=[self.quiz.pk, self.answer.pk])
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_answer_counters(self):
+        url = reverse("answers", kwargs={"question_id": self.quiz.pk})
+        self.client.post(path=url, data=self.valid_payload, format="json")
+        self.quiz.refresh_from_db()
+        latest = self.quiz.answers.latest("created_at")
+
+        self.assertEqual(self.quiz.answer_count, 2)
+        self.assertEqual(self.quiz.last_answered_at, latest.created_at)
+
+        latest.delete()
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.answer_count, 1)
+        self.assertEqual(self.quiz.last_answered_at, self.answer.created_at)
+
+
+class ResponseCacheTest(APITestCase):
+    """Test Module for the question response cache"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.token = sign_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        self.url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+
+    def test_cached_detail_skips_database(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_not_modified_with_matching_etag(self):
+        first = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_answer_invalidates_only_its_question(self):
+        other = Question.objects.create(
+            question_text="What is your age?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        other_url = reverse("question_detail", kwargs={"question_id": other.pk})
+        self.client.get(self.url)
+        self.client.get(other_url)
+        self.client.get("/questions/")
+
+        self.client.post(
+            reverse("answers", kwargs={"question_id": self.quiz.pk}),
+            data={"answer_text": "Googlo"},
+            format="json",
+        )
+
+        response = self.client.get(self.url)
+        listing = self.client.get("/questions/", {"ordering": "most_answered"})
+        self.assertEqual(response.data["answer_count"], 1)
+        self.assertEqual(listing.data["results"][0]["id"], self.quiz.pk)
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+
+    def test_new_question_invalidates_list(self):
+        self.client.get("/questions/")
+        self.client.post(
+            "/questions/", data={"question_text": "Who are you?"}, format="json"
+        )
+        response = self.client.get("/questions/")
+
+        self.assertEqual(response.data["results"][0]["question_text"], "Who are you?")
+
+
+@override_settings(ROOT_URLCONF="app.async_urls")
+class AsyncViewsTest(APITestCase):
+    """Test Module for the async variants of the API views"""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email="johndol@gmail.com", password=make_password("123456")
+        )
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        Answer.objects.create(
+            answer_text="Googlo", author=self.user, question=self.quiz
+        )
+        self.headers = {"Authorization": "Bearer " + sign_token(self.user)}
+
+    async def test_login(self):
+        response = await self.async_client.post(
+            "/auth/login/",
+            data={"email": "johndol@gmail.com", "password": "123456"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("token", response.json())
+
+    async def test_list_matches_sync_view(self):
+        response = await self.async_client.get("/questions/")
+        questions = await sync_to_async(list)(
+            Question.objects.order_by("-created_at", "-id")
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["results"],
+            json.loads(json.dumps(QuestionSerializer(questions, many=True).data)),
+        )
+
+    async def test_detail_embeds_answers(self):
+        response = await self.async_client.get(f"/questions/{self.quiz.pk}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["answer_count"], 1)
+        self.assertEqual(response.json()["answers"][0]["answer_text"], "Googlo")
+
+    async def test_register_requires_password(self):
+        for payload in ({}, {"password": ""}, {"password": ["123456"]}):
+            payload = {"email": "nopw@gmail.com", **payload}
+            registered = await self.async_client.post(
+                "/auth/register/", data=payload, content_type="application/json"
+            )
+            login = await self.async_client.post(
+                "/auth/login/", data=payload, content_type="application/json"
+            )
+
+            self.assertEqual(registered.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(login.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(await User.objects.filter(email="nopw@gmail.com").aexists())
+
+    async def test_post_question_requires_token(self):
+        payload = {"question_text": "What is your age?"}
+        anonymous = await self.async_client.post(
+            "/questions/", data=payload, content_type="application/json"
+        )
+        response = await self.async_client.post(
+            "/questions/",
+            data=payload,
+            content_type="application/json",
+            headers=self.headers,
+        )
+
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(await Question.objects.acount(), 2)
+
+    async def test_post_answer(self):
+        response = await self.async_client.post(
+            f"/questions/{self.quiz.pk}/answers/",
+            data={"answer_text": "Maya"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(await self.quiz.answers.acount(), 2)
+
+    def test_reads_are_cached(self):
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+        get = async_to_sync(self.async_client.get)
+        urls = ["/questions/", f"/questions/{self.quiz.pk}/"]
+        first = [get(url) for url in urls]
+
+        with self.assertNumQueries(0):
+            second = [get(url) for url in urls]
+            not_modified = get(urls[0], headers={"If-None-Match": first[0]["ETag"]})
+            forged = get(urls[0], headers={"Authorization": "Bearer forged"})
+
+        for before, after in zip(first, second):
+            self.assertEqual(after.status_code, status.HTTP_200_OK)
+            self.assertEqual(after.json(), before.json())
+            self.assertEqual(after["ETag"], before["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(forged.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        async_to_sync(self.async_client.post)(
+            f"/questions/{self.quiz.pk}/answers/",
+            data={"answer_text": "Maya"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(get(urls[1]).json()["answer_count"], 2)
+
+    async def test_concurrent_misses_run_view_once(self):
+        await caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].aclear()
+        calls = []
+
+        def feed(request):
+            calls.append(1)
+            return question_feed(request)
+
+        with mock.patch("app.async_views.question_feed", feed):
+            responses = await asyncio.gather(
+                *[self.async_client.get("/questions/") for _ in range(8)]
+            )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            {response.content for response in responses}, {responses[0].content}
+        )
+
+
+class BulkCreateTest(APITestCase):
+    """Test Module for the bulk create endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+
+    def test_bulk_questions_from_json_array(self):
+        payload = [
+            {"question_text": "What is your age?"},
+            {"question_text": " "},
+            {"question_text": "Where do you live?"},
+        ]
+        response = self.client.post(
+            reverse("questions_bulk"), data=payload, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item["index"] for item in response.data["created"]], [0, 2])
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertIn("question_text", response.data["errors"][0]["errors"])
+        self.assertEqual(
+            Question.objects.filter(author=self.user, author_email=self.user.email)
+            .exclude(pk=self.quiz.pk)
+            .count(),
+            2,
+        )
+
+    def test_bulk_answers_from_ndjson(self):
+        lines = [
+            {"question": self.quiz.pk, "answer_text": "Maya"},
+            {"question": 9999, "answer_text": "Nobody"},
+            {"question": self.quiz.pk, "answer_text": "Googlo"},
+        ]
+        response = self.client.post(
+            reverse("answers_bulk"),
+            data="\n".join(json.dumps(line) for line in lines),
+            content_type="application/x-ndjson",
+        )
+        self.quiz.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertEqual(self.quiz.answer_count, 2)
+        self.assertIsNotNone(self.quiz.last_answered_at)
+
+    def test_bulk_answers_to_oversized_question(self):
+        lines = [
+            {"question": 2**64 - 1, "answer_text": "Nobody"},
+            {"question": self.quiz.pk, "answer_text": "Maya"},
+        ]
+        response = self.client.post(reverse("answers_bulk"), data=lines, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 1)
+        self.assertEqual(response.data["errors"][0]["index"], 0)
+        self.assertIn("question", response.data["errors"][0]["errors"])
+
+    def test_bulk_all_invalid(self):
+        response = self.client.post(
+            reverse("questions_bulk"), data=[{"question_text": ""}], format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_requires_list(self):
+        response = self.client.post(
+            reverse("questions_bulk"), data={"question_text": "Hi?"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_requires_token(self):
+        self.client.credentials()
+        response = self.client.post(
+            reverse("questions_bulk"), data=[{"question_text": "Hi?"}], format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SearchTest(APITestCase):
+    """Test Module for the full-text search endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="How do I cook rice?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.other = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.answer = Answer.objects.create(
+            answer_text="Boil the rice in salted water",
+            author=self.user,
+            question=self.other,
+        )
+        self.url = reverse("search_questions")
+
+    def test_search_questions_and_answers(self):
+        response = self.client.get(self.url, {"q": "rice"})
+        hits = {(hit["type"], hit["question_id"]) for hit in response.data["results"]}
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(hits, {("question", self.quiz.pk), ("answer", self.other.pk)})
+        self.assertIn("<mark>rice</mark>", response.data["results"][0]["snippet"])
+
+    def test_search_prefix_and_stemming(self):
+        response = self.client.get(self.url, {"q": "cooking ri"})
+
+        self.assertEqual(
+            [hit["question_id"] for hit in response.data["results"]], [self.quiz.pk]
+        )
+
+    def test_search_index_follows_writes(self):
+        self.quiz.question_text = "How do I bake bread?"
+        self.quiz.save()
+        self.answer.delete()
+        Question.objects.bulk_create(
+            [
+                Question(
+                    question_text="Is rice a grain?",
+                    author=self.user,
+                    author_email=self.user.email,
+                )
+            ]
+        )
+
+        response = self.client.get(self.url, {"q": "rice"})
+
+        self.assertEqual(
+            [hit["question_text"] for hit in response.data["results"]],
+            ["Is rice a grain?"],
+        )
+
+    def test_search_ignores_query_syntax(self):
+        response = self.client.get(self.url, {"q": 'rice" OR NEAR(('})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_page_is_bounded(self):
+        last = settings.PAGINATION_CONF["MAX_SEARCH_PAGE"]
+        response = self.client.get(self.url, {"q": "rice", "page": last})
+        too_deep = self.client.get(
+            self.url, {"q": "rice", "page": "99999999999999999999"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(too_deep.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_requires_query(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == "postgresql", "GIN indexes are PostgreSQL only")
+    def test_search_uses_index(self):
+        from django.contrib.postgres.search import SearchQuery
+
+        query = SearchQuery("rice", search_type="websearch", config=TSVECTOR_CONFIG)
+        with connection.cursor() as cursor:
+            # the tables are small enough for a sequential scan to win
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for table, field in SEARCH_INDEXES:
+            model = Question if table == "question" else Answer
+            plan = (
+                model.objects.annotate(document=search_vector(field))
+                .filter(document=query)
+                .explain()
+            )
+            self.assertIn(f"app_{table}_search_idx", plan)
+
+    def test_rebuild_search_index_command(self):
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        response = self.client.get(self.url, {"q": "rice"})
+
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+class MyFeedTest(APITestCase):
+    """Test Module for the /me/ feeds"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.other = User.objects.create(email="mayangelou@mail.com", password="maya")
+        self.mine = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.theirs = Question.objects.create(
+            question_text="What is your age?",
+            author=self.other,
+            author_email=self.other.email,
+        )
+        self.answer = Answer.objects.create(
+            answer_text="Forty", author=self.user, question=self.theirs
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+
+    def test_my_questions(self):
+        response = self.client.get(reverse("my_questions"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([q["id"] for q in response.data["results"]], [self.mine.pk])
+
+    def test_my_answers(self):
+        response = self.client.get(reverse("my_answers"))
+
+        self.assertEqual([a["id"] for a in response.data["results"]], [self.answer.pk])
+
+    def test_my_answers_hide_deleted_questions(self):
+        Question.objects.filter(pk=self.theirs.pk).update(deleted_at=timezone.now())
+
+        response = self.client.get(reverse("my_answers"))
+
+        self.assertEqual(response.data["results"], [])
+
+    def test_my_feed_requires_token(self):
+        self.client.credentials()
+        response = self.client.get(reverse("my_questions"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_my_feed_cached_until_my_data_changes(self):
+        self.client.get(reverse("my_questions"))
+        Question.objects.create(
+            question_text="Where do you live?",
+            author=self.other,
+            author_email=self.other.email,
+        )
+        with self.assertNumQueries(0):
+            self.client.get(reverse("my_questions"))
+
+        Answer.objects.create(
+            answer_text="Kevin", author=self.other, question=self.mine
+        )
+        response = self.client.get(reverse("my_questions"))
+
+        self.assertEqual(response.data["results"][0]["answer_count"], 1)
+
+
+class ProfilingTest(APITestCase):
+    """Test Module for the profiling middleware and /metrics"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        registry.clear()
+
+    def test_server_timing_header(self):
+        url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        response = self.client.get(url, {"answers_page_size": 5})
+
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+        self.assertIn("ser;dur=", response["Server-Timing"])
+
+    def test_metrics_endpoint(self):
+        self.client.get("/questions/", {"page_size": 7})
+        response = self.client.get(reverse("metrics"))
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('http_request_db_queries_count{view="questions"} 1', body)
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",view="questions"} 1', body
+        )
+        self.assertIn("jwt_token_cache_hits_total", body)
+
+    def test_profile_on_demand(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conf = dict(settings.PROFILING_CONF, ON_DEMAND=True, DIR=directory)
+            with override_settings(PROFILING_CONF=conf):
+                response = self.client.get("/questions/", HTTP_X_PROFILE="1")
+
+            dump = os.path.join(directory, response["X-Profile-Dump"])
+            self.assertTrue(os.path.exists(dump))
+            pstats.Stats(dump)
+
+    def test_no_profile_unless_asked(self):
+        response = self.client.get("/questions/")
+
+        self.assertNotIn("X-Profile-Dump", response)
+
+    def test_profile_on_demand_is_opt_in(self):
+        response = self.client.get("/questions/", HTTP_X_PROFILE="1")
+
+        self.assertFalse(settings.PROFILING_CONF["ON_DEMAND"])
+        self.assertNotIn("X-Profile-Dump", response)
+
+    def test_old_profiles_are_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conf = dict(
+                settings.PROFILING_CONF, ON_DEMAND=True, DIR=directory, MAX_DUMPS=2
+            )
+            with override_settings(PROFILING_CONF=conf):
+                dumps = [
+                    self.client.get("/questions/", HTTP_X_PROFILE="1")["X-Profile-Dump"]
+                    for _ in range(3)
+                ]
+
+            self.assertEqual(sorted(os.listdir(directory)), sorted(dumps[1:]))
+
+
+class SeedDataTest(APITestCase):
+    """Test Module for the seed_data command"""
+
+    def test_seed_data(self):
+        call_command(
+            "seed_data",
+            users=3,
+            questions=20,
+            answers=50,
+            password="seed-password",
+            stdout=io.StringIO(),
+        )
+
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(Answer.objects.count(), 50)
+        self.assertEqual(
+            sum(Question.objects.values_list("answer_count", flat=True)), 50
+        )
+
+        user = User.objects.first()
+        response = self.client.post(
+            reverse("login_user"),
+            {"email": user.email, "password": "seed-password"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_seeding_neither_notifies_nor_publishes(self):
+        with mock.patch("app.signals.publish_event") as publish:
+            call_command(
+                "seed_data", users=2, questions=5, answers=10, stdout=io.StringIO()
+            )
+
+        self.assertEqual(Answer.objects.count(), 10)
+        self.assertFalse(Job.objects.exists())
+        publish.assert_not_called()
+
+
+class DatabaseTest(APITestCase):
+    """Test Module for the SQLite connection settings"""
+
+    def test_sqlite_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute("PRAGMA synchronous")
+            synchronous = cursor.fetchone()[0]
+
+        self.assertEqual(busy_timeout, settings.SQLITE_CONF["BUSY_TIMEOUT"])
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+
+REPLICAS = {**settings.REPLICA_CONF, "ALIASES": ["replica1"]}
+
+
+@override_settings(REPLICA_CONF=REPLICAS)
+class ReplicaRoutingTest(APITestCase):
+    """Test Module for read replica routing"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+
+    def tearDown(self):
+        caches[settings.REPLICA_CONF["CACHE_ALIAS"]].clear()
+
+    def route(self, user_id=None, primary=False):
+        state, token = routers.start_request(user_id, primary)
+        try:
+            return self.router.db_for_read(Question)
+        finally:
+            routers.end_request(token)
+
+    def test_reads_go_to_replicas(self):
+        self.assertEqual(self.route(), "replica1")
+        self.assertEqual(self.route(self.user.id), "replica1")
+        self.assertEqual(self.router.db_for_write(Question), "default")
+
+    def test_reads_outside_requests_go_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Question), "default")
+
+    def test_jobs_read_from_primary(self):
+        other = User.objects.create(email="janedol@gmail.com", password="123456")
+        Answer.objects.create(answer_text="Googlo", author=other, question=self.quiz)
+
+        with mock.patch.object(
+            routers.random, "choice", side_effect=AssertionError("read a replica")
+        ):
+            jobs.run_batch()
+
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_unsafe_methods_read_from_primary(self):
+        self.assertEqual(self.route(primary=True), "default")
+
+    def test_reads_after_write_stay_on_primary(self):
+        state, token = routers.start_request(None, False)
+        try:
+            self.router.db_for_write(Answer)
+            self.assertEqual(self.router.db_for_read(Answer), "default")
+        finally:
+            routers.end_request(token)
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.client.post(
+            f"/questions/{self.quiz.id}/answers/",
+            {"answer_text": "Googlo"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.route(self.user.id), "default")
+        self.assertEqual(self.route(self.user.id + 1), "replica1")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "app"))
+        self.assertTrue(self.router.allow_migrate("default", "app"))
+
+
+class SerializationTest(APITestCase):
+    """Test Module for the fast rendering and values mode"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="Qu'est-ce que c'est?   é",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        Answer.objects.create(
+            answer_text="A good answer", author=self.user, question=self.quiz
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+
+    def test_values_mode_matches_serializers(self):
+        for path in ("/questions/", "/me/questions/", "/me/answers/"):
+            with override_settings(SERIALIZATION_CONF={"VALUES_MODE": True}):
+                fast = self.client.get(path, {"page_size": 5}).content
+            with override_settings(SERIALIZATION_CONF={"VALUES_MODE": False}):
+                slow = self.client.get(path, {"page_size": 6}).content
+            self.assertEqual(json.loads(fast)["results"], json.loads(slow)["results"])
+
+    def test_values_mode_uses_current_timezone(self):
+        self.quiz.refresh_from_db()
+        serializer = QuestionSerializer(self.quiz)
+        with timezone.override("Africa/Nairobi"):
+            expected = serializer.data
+            row = Question.objects.values(
+                *values_serializer(QuestionSerializer).columns
+            )
+            data = values_serializer(QuestionSerializer).bind()(row.get())
+
+        self.assertEqual(data, expected)
+        self.assertTrue(data["created_at"].endswith("+03:00"))
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {
+            "question": QuestionSerializer(self.quiz).data,
+            "answers": AnswerSerializer(self.quiz.answers.all(), many=True).data,
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_malformed_json_body(self):
+        response = self.client.post(
+            "/questions/", b'{"question_text": ', content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+THROTTLED = {
+    **settings.THROTTLE_CONF,
+    "RATES": {"auth_ip": "2/min", "write_user": "1/min"},
+}
+
+
+@override_settings(THROTTLE_CONF=THROTTLED)
+class ThrottleTest(APITestCase):
+    """Test Module for rate limits and concurrency caps"""
+
+    def setUp(self):
+        caches[settings.THROTTLE_CONF["CACHE_ALIAS"]].clear()
+        registry.clear()
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.other = User.objects.create(email="janedol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.url = f"/questions/{self.quiz.id}/answers/"
+
+    def tearDown(self):
+        caches[settings.THROTTLE_CONF["CACHE_ALIAS"]].clear()
+
+    def answer_as(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(user))
+        return self.client.post(self.url, {"answer_text": "Googlo"}, format="json")
+
+    def test_login_is_throttled_per_ip(self):
+        payload = {"email": "nobody@gmail.com", "password": "123456"}
+        for _ in range(2):
+            response = self.client.post(reverse("login_user"), payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse("login_user"), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(
+            registry.value(
+                "throttle_decisions_total",
+                {"class": "auth", "decision": "throttled_ip"},
+            ),
+            1,
+        )
+
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        payload = {"email": "nobody@gmail.com", "password": "123456"}
+        codes = [
+            self.client.post(
+                reverse("login_user"),
+                payload,
+                format="json",
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{attempt}",
+            ).status_code
+            for attempt in range(3)
+        ]
+
+        self.assertEqual(codes[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_behind_trusted_proxy(self):
+        request = RequestFactory().get(
+            "/", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2, 3.3.3.3"
+        )
+
+        self.assertEqual(throttling.client_ip(request), "127.0.0.1")
+        with override_settings(THROTTLE_CONF={**THROTTLED, "NUM_PROXIES": 1}):
+            self.assertEqual(throttling.client_ip(request), "3.3.3.3")
+        with override_settings(THROTTLE_CONF={**THROTTLED, "NUM_PROXIES": 2}):
+            self.assertEqual(throttling.client_ip(request), "2.2.2.2")
+
+    def test_writes_are_throttled_per_user(self):
+        self.assertEqual(self.answer_as(self.user).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.answer_as(self.user).status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.answer_as(self.other).status_code, status.HTTP_201_CREATED
+        )
+        # reads are in another class
+        self.assertEqual(self.client.get("/questions/").status_code, status.HTTP_200_OK)
+
+    def test_concurrency_cap_sheds_load(self):
+        conf = {**THROTTLED, "CONCURRENCY": {**THROTTLED["CONCURRENCY"], "write": 0}}
+        with override_settings(THROTTLE_CONF=conf):
+            response = self.answer_as(self.user)
+            read = self.client.get("/questions/")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(read.status_code, status.HTTP_200_OK)
+        self.assertEqual(throttling.get_limit("write").active, 0)
+
+    def test_open_streams_count_towards_concurrency(self):
+        conf = {**THROTTLED, "CONCURRENCY": {**THROTTLED["CONCURRENCY"], "read": 1}}
+        with override_settings(THROTTLE_CONF=conf):
+            stream = self.client.get("/questions/", {"stream": "true"})
+            self.assertEqual(throttling.get_limit("read").active, 1)
+            shed = self.client.get("/questions/")
+            stream.close()
+            after = self.client.get("/questions/")
+
+        self.assertEqual(shed.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertEqual(throttling.get_limit("read").active, 0)
+
+    def test_token_bucket_refills(self):
+        bucket = throttling.TokenBucket("2/min")
+
+        self.assertEqual(bucket.take("bucket", now=0), 0)
+        self.assertEqual(bucket.take("bucket", now=0), 0)
+        self.assertAlmostEqual(bucket.take("bucket", now=0), 30)
+        self.assertEqual(bucket.take("bucket", now=30), 0)
+
+
+class PrincipalCacheTest(APITestCase):
+    """Test Module for the principal cache and token revocation"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.token = sign_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        self.payload = {"question_text": "What is your name?"}
+
+    def test_writes_do_not_load_the_user(self):
+        self.client.post("/questions/", self.payload, format="json")
+
+        # just the insert, no user lookup
+        with self.assertNumQueries(1):
+            response = self.client.post("/questions/", self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_user_save_invalidates_principal(self):
+        self.client.post("/questions/", self.payload, format="json")
+        self.user.email = "johnnew@gmail.com"
+        self.user.save()
+
+        self.client.post("/questions/", self.payload, format="json")
+
+        self.assertEqual(
+            Question.objects.order_by("-id").first().author_email, "johnnew@gmail.com"
+        )
+
+    def test_deleted_user_is_refused(self):
+        self.client.post("/questions/", self.payload, format="json")
+        self.user.delete()
+
+        response = self.client.post("/questions/", self.payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_token(self):
+        response = self.client.post(reverse("logout_user"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post("/questions/", self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+        response = self.client.post("/questions/", self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_workers_need_a_shared_revocation_cache(self):
+        def load_settings(**env):
+            return subprocess.run(
+                [sys.executable, "-c", "import core.settings"],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, "WEB_CONCURRENCY": "4", **env},
+                capture_output=True,
+                text=True,
+            )
+
+        refused = load_settings(TOKEN_CACHE_BACKEND="locmem")
+        shared = load_settings(TOKEN_CACHE_BACKEND="file")
+
+        self.assertIn("ImproperlyConfigured", refused.stderr)
+        self.assertEqual(shared.returncode, 0, shared.stderr)
+
+    def test_login_caches_principal(self):
+        self.user.password = make_password("123456")
+        self.user.save()
+        self.client.credentials()
+        self.client.post(
+            reverse("login_user"),
+            {"email": self.user.email, "password": "123456"},
+            format="json",
+        )
+
+        self.assertEqual(principal_cache.get(self.user.pk).email, self.user.email)
+
+
+class JobQueueTest(APITestCase):
+    """Test Module for the background jobs"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.other = User.objects.create(email="janedol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+        Job.objects.all().delete()
+
+    def answer(self, user, text="John"):
+        return Answer.objects.create(
+            answer_text=text, question=self.quiz, author=user, author_email=user.email
+        )
+
+    @override_settings(
+        JOBS_CONF={
+            **settings.JOBS_CONF,
+            "SYNC_DELETE_MAX_ANSWERS": 1,
+            "DELETE_BATCH_SIZE": 2,
+        }
+    )
+    def test_large_question_is_deleted_by_a_job(self):
+        for _ in range(3):
+            self.answer(self.other)
+
+        response = self.client.delete(f"/questions/{self.quiz.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.get(f"/questions/{self.quiz.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/questions/").data["results"], [])
+        self.assertTrue(Question.all_objects.filter(pk=self.quiz.id).exists())
+
+        self.assertEqual(jobs.run_batch(names=["delete_question"]), (1, 0))
+        self.assertFalse(Question.all_objects.filter(pk=self.quiz.id).exists())
+        self.assertFalse(Answer.objects.filter(question_id=self.quiz.id).exists())
+
+    @override_settings(JOBS_CONF={**settings.JOBS_CONF, "SYNC_DELETE_MAX_ANSWERS": 1})
+    def test_purge_queries_do_not_grow_with_answers(self):
+        bulk_insert(
+            Answer,
+            [
+                Answer(answer_text="John", question=self.quiz, author=self.other)
+                for _ in range(30)
+            ],
+        )
+        self.client.delete(f"/questions/{self.quiz.id}/")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(jobs.run_batch(names=["delete_question"]), (1, 0))
+
+        self.assertLess(len(queries), 30)
+        self.assertFalse(Answer.objects.filter(question_id=self.quiz.id).exists())
+
+    def test_new_answer_notifies_the_thread(self):
+        third = User.objects.create(email="jimdol@gmail.com", password="123456")
+        self.answer(self.other)
+        self.answer(third)
+
+        self.assertEqual(jobs.run_batch(), (2, 0))
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", "answer__author_id")),
+            sorted(
+                [
+                    (self.user.id, self.other.id),
+                    (self.user.id, third.id),
+                    (self.other.id, third.id),
+                ]
+            ),
+        )
+        response = self.client.get("/me/notifications/")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_rerun_job_does_not_notify_twice(self):
+        answer = self.answer(self.other)
+
+        jobs.notify_answers([{"answer_ids": [answer.pk]}])
+        jobs.notify_answers([{"answer_ids": [answer.pk]}])
+
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        calls = []
+
+        def broken(payloads):
+            calls.append(payloads)
+            raise ValueError("boom")
+
+        with mock.patch.dict(jobs.HANDLERS, {"broken": broken}):
+            jobs.enqueue("broken", {"n": 1})
+            jobs.enqueue("broken", {"n": 2})
+
+            self.assertEqual(jobs.run_batch(), (0, 2))
+            self.assertEqual(calls, [[{"n": 1}, {"n": 2}]])
+            job = Job.objects.first()
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertIn("boom", job.last_error)
+
+            # not due until the backoff is over
+            self.assertEqual(jobs.run_batch(), (0, 0))
+
+            Job.objects.update(run_at=timezone.now(), attempts=4)
+            with override_settings(JOBS_CONF={**settings.JOBS_CONF, "MAX_ATTEMPTS": 5}):
+                jobs.run_batch()
+        self.assertEqual(
+            set(Job.objects.values_list("status", flat=True)), {Job.FAILED}
+        )
+
+    def test_expired_lease_is_claimed_again(self):
+        jobs.enqueue("notify_answers", {"answer_ids": []})
+
+        self.assertEqual(len(jobs.claim(10, worker="crashed")), 1)
+        self.assertEqual(jobs.claim(10), [])
+
+        Job.objects.update(run_at=timezone.now())
+        (job,) = jobs.claim(10, worker="next")
+        self.assertEqual((job.attempts, job.locked_by), (2, "next"))
+
+
+class ConditionalRequestTest(APITestCase):
+    """Test Module for ETag and Last-Modified validators"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.ans = Answer.objects.create(
+            answer_text="John",
+            question=self.quiz,
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+        get_principal(self.user.pk)
+        self.url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        self.answer_url = reverse(
+            "answer_detail",
+            kwargs={"question_id": self.quiz.pk, "answer_id": self.ans.pk},
+        )
+
+    def clear_response_cache(self):
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+
+    def test_list_not_modified_without_reading_questions(self):
+        first = self.client.get("/questions/")
+        self.assertNotIn("Last-Modified", first)
+        # drop the page, but not the list's version
+        name, version = question_list_key(RequestFactory().get("/questions/"))
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].delete_many(
+            [f"{name}:v{version}", f"{name}:stale"]
+        )
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/questions/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], first["ETag"])
+
+    def test_list_etag_changes_with_answer_count(self):
+        first = self.client.get("/questions/")
+        self.ans.delete()
+
+        response = self.client.get("/questions/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    def test_list_modified_by_hard_delete(self):
+        other = Question.objects.create(
+            question_text="What is your age?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        first = self.client.get("/questions/")
+        self.client.delete(reverse("question_detail", kwargs={"question_id": other.pk}))
+
+        response = self.client.get(
+            "/questions/",
+            HTTP_IF_NONE_MATCH=first["ETag"],
+            HTTP_IF_MODIFIED_SINCE=http_date(),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [self.quiz.pk]
+        )
+        response = self.client.get("/questions/", HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified_since(self):
+        first = self.client.get(self.url)
+        self.clear_response_cache()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_answer_edit_changes_detail_etag(self):
+        first = self.client.get(self.url)
+        self.client.put(
+            self.answer_url, {"answer_text": "Jane", "question": self.quiz.pk}
+        )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["answers"][0]["answer_text"], "Jane")
+
+    def test_if_match_prevents_lost_update(self):
+        etag = self.client.get(self.answer_url)["ETag"]
+        data = {"answer_text": "Jane", "question": self.quiz.pk}
+
+        first = self.client.put(self.answer_url, data, HTTP_IF_MATCH=etag)
+        second = self.client.put(self.answer_url, data, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(first.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotEqual(first["ETag"], etag)
+        self.assertEqual(second.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        response = self.client.delete(self.answer_url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(self.answer_url, HTTP_IF_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@override_settings(ROOT_URLCONF="app.async_urls")
+class EventStreamTest(APITestCase):
+    """Test Module for the question event streams"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.url = f"/questions/{self.quiz.pk}/events/"
+
+    def write(self, func):
+        def committed():
+            with self.captureOnCommitCallbacks(execute=True):
+                return func()
+
+        return sync_to_async(committed)()
+
+    async def next_chunk(self, stream):
+        return await asyncio.wait_for(anext(stream), 1)
+
+    async def test_answers_are_pushed(self):
+        response = await self.async_client.get(self.url)
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(await self.next_chunk(stream), b"retry: 3000\n\n")
+
+        answer = await self.write(
+            lambda: Answer.objects.create(
+                answer_text="John", question=self.quiz, author=self.user
+            )
+        )
+        chunk = await self.next_chunk(stream)
+        self.assertTrue(chunk.startswith(b"event: answer.created\ndata: {"))
+        self.assertIn(b'"answer_text":"John"', chunk)
+
+        await self.write(answer.delete)
+        chunk = await self.next_chunk(stream)
+        self.assertTrue(chunk.startswith(b"event: answer.deleted\n"))
+
+        await self.write(self.quiz.delete)
+        chunk = await self.next_chunk(stream)
+        self.assertTrue(chunk.startswith(b"event: question.deleted\n"))
+        with self.assertRaises(StopAsyncIteration):
+            await self.next_chunk(stream)
+        self.assertFalse(get_broker().has_subscribers(question_channel(self.quiz.pk)))
+
+    async def test_heartbeat_while_idle(self):
+        conf = {**settings.PUBSUB_CONF, "HEARTBEAT_SECONDS": 0.01}
+        with override_settings(PUBSUB_CONF=conf):
+            response = await self.async_client.get(self.url)
+            stream = aiter(response.streaming_content)
+            await self.next_chunk(stream)
+
+            self.assertEqual(await self.next_chunk(stream), b": heartbeat\n\n")
+            await self.write(self.quiz.delete)
+
+    async def test_unknown_question(self):
+        response = await self.async_client.get("/questions/0/events/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_slow_subscriber_is_dropped(self):
+        broker = InProcessBroker(queue_size=2)
+        subscription = broker.subscribe("channel")
+        for n in range(3):
+            broker.publish("channel", n)
+
+        self.assertIs(await subscription.get(1), OVERFLOW)
+        self.assertFalse(broker.has_subscribers("channel"))
+        self.assertIsNone(await subscription.get(0.01))
+
+
+@override_settings(
+    INSTALLED_APPS=[
+        app for app in settings.INSTALLED_APPS if app not in settings.FULL_STACK_APPS
+    ],
+    MIDDLEWARE=[
+        name
+        for name in settings.MIDDLEWARE
+        if name not in settings.FULL_STACK_MIDDLEWARE
+    ],
+    TEMPLATES=[],
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_RENDERER_CLASSES": ["app.renderers.ORJSONRenderer"],
+    },
+)
+class ApiProfileTest(APITestCase):
+    """Test Module for the "api" settings profile"""
+
+    def test_api_works_without_the_full_stack(self):
+        credentials = {"email": "johndol@gmail.com", "password": "123456"}
+        response = self.client.post(reverse("register_user"), credentials)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        token = self.client.post(reverse("login_user"), credentials).data["token"]
+
+        anonymous = self.client.get(reverse("my_questions"))
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + token)
+        created = self.client.post("/questions/", {"question_text": "Who?"})
+        listing = self.client.get("/questions/")
+
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(listing["Content-Type"], "application/json")
+        self.assertEqual(listing.json()["results"][0]["question_text"], "Who?")
+
+
+class SparseFieldsTest(APITestCase):
+    """Test Module for ?fields= projections and the ?ids= multi-get"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.quiz_two = Question.objects.create(
+            question_text="What is your age?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        for i in range(3):
+            Answer.objects.create(
+                answer_text=f"Answer {i}", author=self.user, question=self.quiz
+            )
+
+    def test_list_fields_are_projected_in_sql(self):
+        for values_mode in (True, False):
+            caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+            with override_settings(SERIALIZATION_CONF={"VALUES_MODE": values_mode}):
+                with CaptureQueriesContext(connection) as queries:
+                    first = self.client.get(
+                        "/questions/", {"fields": "question_text,id", "page_size": 1}
+                    )
+                # the next request resets the query log
+                sql = queries[-1]["sql"]
+                second = self.client.get(
+                    "/questions/",
+                    {"fields": "id,question_text", "cursor": first.data["next"]},
+                )
+
+            self.assertEqual(
+                first.data["results"],
+                [{"id": self.quiz_two.pk, "question_text": "What is your age?"}],
+            )
+            self.assertEqual(second.data["results"][0]["id"], self.quiz.pk)
+            self.assertIn("question_text", sql)
+            self.assertNotIn("author_email", sql)
+
+    def test_unknown_field(self):
+        response = self.client.get("/questions/", {"fields": "id,password"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["message"], "Unknown fields: password")
+
+    def test_detail_without_answers_skips_their_query(self):
+        url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"fields": "question_text"})
+
+        self.assertEqual(response.data, {"question_text": "What is your name?"})
+
+    def test_detail_answer_fields(self):
+        url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        response = self.client.get(
+            url, {"fields": "id,answers", "answer_fields": "answer_text"}
+        )
+
+        self.assertEqual(response.data["id"], self.quiz.pk)
+        self.assertEqual(
+            response.data["answers"],
+            [{"answer_text": f"Answer {i}"} for i in range(3)],
+        )
+        self.assertIsNone(response.data["answers_next"])
+
+    def test_multi_get(self):
+        ids = f"{self.quiz_two.pk},9999,{self.quiz.pk}"
+        with self.assertNumQueries(2):  # questions, answers
+            response = self.client.get(
+                "/questions/", {"ids": ids, "answers_page_size": 2}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([q["id"] for q in results], [self.quiz_two.pk, self.quiz.pk])
+        self.assertEqual(response.data["missing"], [9999])
+        self.assertEqual(results[0]["answers"], [])
+        self.assertEqual(len(results[1]["answers"]), 2)
+
+        detail = self.client.get(
+            reverse("question_detail", kwargs={"question_id": self.quiz.pk}),
+            {"answers_page_size": 2},
+        )
+        self.assertEqual(results[1], detail.data)
+
+    @override_settings(ROOT_URLCONF="app.async_urls")
+    def test_async_multi_get_matches(self):
+        params = {"ids": f"{self.quiz.pk},{self.quiz_two.pk}", "fields": "id,answers"}
+        response = async_to_sync(self.async_client.get)("/questions/", params)
+
+        self.assertEqual(response.json(), self.client.get("/questions/", params).json())
+
+    def test_invalid_ids(self):
+        too_many = ",".join(map(str, range(1, settings.PAGINATION_CONF["MAX_IDS"] + 2)))
+        for ids in ("1,two", "", too_many, "1,99999999999999999999999"):
+            response = self.client.get("/questions/", {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IdempotencyTest(APITestCase):
+    """Test Module for Idempotency-Key on POST endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.token = sign_token(self.user)
+        self.body = json.dumps({"question_text": "What is your age?"})
+        caches[settings.IDEMPOTENCY_CONF["ALIAS"]].clear()
+
+    def post(self, key, body=None, token=None):
+        return self.client.post(
+            "/questions/",
+            body or self.body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer " + (token or self.token),
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def idempotency(self, key):
+        request = RequestFactory().post(
+            "/questions/",
+            self.body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer " + self.token,
+        )
+        return Idempotency(request, key)
+
+    def test_retry_is_replayed(self):
+        first = self.post("retry-1")
+        with self.assertNumQueries(0):
+            retry = self.post("retry-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            Question.objects.filter(question_text__contains="age").count(), 1
+        )
+
+    def test_key_reused_with_another_body(self):
+        self.post("retry-1")
+        response = self.post("retry-1", json.dumps({"question_text": "Who?"}))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(Question.objects.filter(question_text="Who?").exists())
+
+    def test_keys_are_scoped_to_credentials(self):
+        other = User.objects.create(email="other@gmail.com", password="123456")
+        self.post("retry-1")
+        response = self.post("retry-1", token=sign_token(other))
+
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(
+            Question.objects.filter(question_text__contains="age").count(), 2
+        )
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        self.post("retry-1")
+        idempotency = self.idempotency("retry-1")
+        cache = caches[settings.IDEMPOTENCY_CONF["ALIAS"]]
+        entry = cache.get(idempotency.key)
+        # as if the first request were still running
+        cache.delete(idempotency.key)
+        cache.set(idempotency.lock_key, True)
+        finish = threading.Timer(0.1, cache.set, (idempotency.key, entry))
+        finish.start()
+
+        response = self.post("retry-1")
+        finish.join()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            Question.objects.filter(question_text__contains="age").count(), 1
+        )
+
+    @override_settings(
+        IDEMPOTENCY_CONF={**settings.IDEMPOTENCY_CONF, "WAIT_SECONDS": 0}
+    )
+    def test_duplicate_gives_up_waiting(self):
+        cache = caches[settings.IDEMPOTENCY_CONF["ALIAS"]]
+        cache.set(self.idempotency("retry-1").lock_key, True)
+
+        response = self.post("retry-1")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(
+            Question.objects.filter(question_text__contains="age").exists()
+        )
+
+    def test_register_retry_hashes_once(self):
+        body = json.dumps({"email": "new@gmail.com", "password": "123456"})
+        with mock.patch("app.views.hash_password", wraps=hash_password) as hasher:
+            for _ in range(2):
+                response = self.client.post(
+                    reverse("register_user"),
+                    body,
+                    content_type="application/json",
+                    HTTP_IDEMPOTENCY_KEY="signup-1",
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(hasher.call_count, 1)
+        self.assertEqual(User.objects.filter(email="new@gmail.com").count(), 1)
+
+    def test_anonymous_keys_are_scoped_to_the_client(self):
+        def register(email, address):
+            return self.client.post(
+                reverse("register_user"),
+                {"email": email, "password": "123456"},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="signup-1",
+                REMOTE_ADDR=address,
+            )
+
+        register("new@gmail.com", "10.0.0.1")
+        response = register("new@gmail.com", "10.0.0.2")
+        mismatch = register("other@gmail.com", "10.0.0.3")
+
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(mismatch.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(ROOT_URLCONF="app.async_urls")
+    def test_async_answer_retry(self):
+        url = f"/questions/{self.quiz.pk}/answers/"
+        headers = {
+            "Authorization": "Bearer " + self.token,
+            "Idempotency-Key": "answer-1",
+        }
+        post = async_to_sync(self.async_client.post)
+        responses = [
+            post(url, {"answer_text": "Googlo"}, "application/json", headers=headers)
+            for _ in range(2)
+        ]
+
+        self.assertEqual([r.status_code for r in responses], [201, 201])
+        self.assertEqual(responses[1]["Idempotent-Replayed"], "true")
+        self.assertEqual(self.quiz.answers.count(), 1)
+
+    def test_invalid_key(self):
+        response = self.post("k" * (settings.IDEMPOTENCY_CONF["MAX_KEY_LENGTH"] + 1))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SingleFlightTest(APITestCase):
+    """Test Module for coalescing concurrent response cache misses"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.quiz = Question.objects.create(
+            question_text="What is your name?",
+            author=self.user,
+            author_email=self.user.email,
+        )
+        self.url = reverse("question_detail", kwargs={"question_id": self.quiz.pk})
+        self.cache = caches[settings.RESPONSE_CACHE_CONF["ALIAS"]]
+        self.cache.clear()
+
+    def entry_key(self):
+        name, version = question_detail_key(
+            RequestFactory().get(self.url), self.quiz.pk
+        )
+        return f"{name}:v{version}"
+
+    def test_threads_share_one_computation(self):
+        flights = SingleFlight()
+        calls, results = [], []
+        joined = threading.Barrier(8)
+
+        def request():
+            with flights.flight("key") as (flight, leader):
+                joined.wait()
+                if leader:
+                    calls.append(1)
+                    flight.result = "entry"
+                    results.append(flight.result)
+            if not leader:
+                results.append(flight.wait(5))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["entry"] * 8)
+        self.assertEqual(len(flights), 0)
+
+    def test_waits_for_the_process_holding_the_lock(self):
+        fresh = self.client.get(self.url).data
+        key = self.entry_key()
+        entry = self.cache.get(key)
+        # as if another process were building the entry
+        self.cache.delete(key)
+        self.cache.set(f"{key}:lock", True)
+        finish = threading.Timer(0.1, self.cache.set, (key, entry))
+        finish.start()
+
+        with override_settings(
+            RESPONSE_CACHE_CONF={**settings.RESPONSE_CACHE_CONF, "STALE_SECONDS": 0}
+        ), self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        finish.join()
+
+        self.assertEqual(response.data, fresh)
+
+    def test_serves_stale_entry_while_rebuilding(self):
+        before = self.client.get(self.url)
+        Answer.objects.create(
+            answer_text="Googlo", author=self.user, question=self.quiz
+        )
+        self.cache.set(f"{self.entry_key()}:lock", True)
+
+        with self.assertNumQueries(0):
+            stale = self.client.get(self.url)
+
+        self.assertEqual(stale.data, before.data)
+        self.assertEqual(stale["ETag"], before["ETag"])
+
+        self.cache.delete(f"{self.entry_key()}:lock")
+        self.assertEqual(self.client.get(self.url).data["answer_count"], 1)
+
+    def test_lock_released(self):
+        missing = reverse("question_detail", kwargs={"question_id": 9999})
+        self.client.get(missing)
+        self.client.get(self.url)
+        name, version = question_detail_key(RequestFactory().get(missing), 9999)
+
+        self.assertIsNone(self.cache.get(f"{name}:v{version}:lock"))
+        self.assertIsNone(self.cache.get(f"{self.entry_key()}:lock"))
+
+
+class TrendingTest(APITestCase):
+    """Test Module for the trending and unanswered question feeds"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="johndol@gmail.com", password="123456")
+        self.old, self.new, self.unanswered = Question.objects.bulk_create(
+            [
+                Question(
+                    question_text=text, author=self.user, author_email=self.user.email
+                )
+                for text in ("What is your name?", "What is your age?", "Why?")
+            ]
+        )
+        for _ in range(3):
+            self.answer(self.old)
+        # three answers from two days ago weigh less than one from now
+        Answer.objects.filter(question=self.old).update(
+            created_at=timezone.now() - timezone.timedelta(days=2)
+        )
+        rebuild()
+        self.answer(self.new)
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+
+    def answer(self, question):
+        return Answer.objects.create(
+            answer_text="Googlo", author=self.user, question=question
+        )
+
+    def scores(self):
+        return dict(QuestionRank.objects.values_list("question_id", "score"))
+
+    def test_trending_order(self):
+        response = self.client.get("/questions/", {"ordering": "trending"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [self.new.pk, self.old.pk],
+        )
+
+    def test_trending_pages(self):
+        first = self.client.get("/questions/", {"ordering": "trending", "page_size": 1})
+        second = self.client.get(
+            "/questions/",
+            {"ordering": "trending", "page_size": 1, "cursor": first.data["next"]},
+        )
+        invalid = self.client.get(
+            "/questions/", {"ordering": "trending", "cursor": "x"}
+        )
+
+        self.assertEqual([row["id"] for row in first.data["results"]], [self.new.pk])
+        self.assertEqual([row["id"] for row in second.data["results"]], [self.old.pk])
+        self.assertIsNone(second.data["next"])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trending_sparse_fields(self):
+        response = self.client.get(
+            "/questions/", {"ordering": "trending", "fields": "id,answer_count"}
+        )
+
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": self.new.pk, "answer_count": 1},
+                {"id": self.old.pk, "answer_count": 3},
+            ],
+        )
+
+    def test_trending_queries_per_page(self):
+        for _ in range(10):
+            question = Question.objects.create(
+                question_text="How?", author=self.user, author_email=self.user.email
+            )
+            self.answer(question)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/questions/", {"ordering": "trending", "page_size": 5})
+        page = len(queries)
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/questions/", {"ordering": "trending", "page_size": 10})
+
+        self.assertEqual(len(queries), page)
+
+    def test_incremental_scores_match_rebuild(self):
+        answer = self.answer(self.old)
+        self.answer(self.unanswered).delete()
+        answer.delete()
+        bulk_insert(
+            Answer,
+            [
+                Answer(answer_text="Googlo", author=self.user, question=question)
+                for question in (self.old, self.unanswered, self.unanswered)
+            ],
+        )
+        Answer.objects.filter(question=self.new).delete()
+        incremental = self.scores()
+        rebuild()
+        rebuilt = self.scores()
+
+        self.assertEqual(set(incremental), {self.old.pk, self.unanswered.pk})
+        self.assertEqual(set(incremental), set(rebuilt))
+        for pk, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[pk], score, places=6)
+
+    def test_deleted_questions_leave_the_feed(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + sign_token(self.user))
+        self.client.delete(f"/questions/{self.new.pk}/")
+
+        response = self.client.get("/questions/", {"ordering": "trending"})
+
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.old.pk])
+
+    def test_unanswered_feed(self):
+        newer = Question.objects.create(
+            question_text="Who?", author=self.user, author_email=self.user.email
+        )
+
+        response = self.client.get("/questions/", {"ordering": "unanswered"})
+
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [newer.pk, self.unanswered.pk],
+        )
+
+    @override_settings(ROOT_URLCONF="app.async_urls")
+    def test_async_trending_matches(self):
+        params = {"ordering": "trending", "fields": "id,question_text"}
+        response = async_to_sync(self.async_client.get)("/questions/", params)
+        caches[settings.RESPONSE_CACHE_CONF["ALIAS"]].clear()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get("/questions/", params).json())
+
+    def test_rebuild_question_ranks_command(self):
+        QuestionRank.objects.all().delete()
+        out = io.StringIO()
+        call_command("rebuild_question_ranks", stdout=out)
+
+        self.assertEqual(set(self.scores()), {self.old.pk, self.new.pk})
+        self.assertIn("Ranked 2 questions", out.getvalue())
@@ -0,0 +1,179 @@
+"""
+Rate limits and concurrency caps, applied by `ThrottleMiddleware`.
+
+Requests fall into an endpoint class: "auth" (login and register), "write"
+(any other unsafe method) or "read". Each class has token buckets per
+client IP and per JWT user, kept in a shared cache, and a cap on how many
+of its requests a process serves at once.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import registry
+
+AUTH_VIEWS = {"login_user", "register_user"}
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+registry.describe(
+    "throttle_decisions_total",
+    "counter",
+    "Requests let through or refused by rate limits and concurrency caps, "
+    "by endpoint class and decision.",
+)
+
+
+def endpoint_class(url_name, method):
+    if url_name in AUTH_VIEWS:
+        return "auth"
+    return "read" if method in SAFE_METHODS else "write"
+
+
+def client_ip(request):
+    """
+    The IP the per-IP buckets of a request are keyed by.
+
+    X-Forwarded-For is only trusted as far as THROTTLE_CONF["NUM_PROXIES"]
+    proxies appended to it, so a client cannot pick its own bucket.
+    """
+    num_proxies = settings.THROTTLE_CONF["NUM_PROXIES"]
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",")]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get("REMOTE_ADDR")
+
+
+def parse_rate(rate):
+    """
+    Parse a "N/period" rate, period being second, minute, hour or day.
+
+    Returns:
+        (capacity, per_second) (tuple): bucket size and refill rate, or
+            None when `rate` is None.
+    """
+    if rate is None:
+        return None
+    count, period = rate.split("/")
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    Token bucket whose state lives in the throttle cache.
+
+    A bucket holds up to `capacity` tokens and refills `per_second` tokens
+    a second; every request takes one. The read-modify-write is not atomic
+    across processes, so concurrent requests may occasionally both get the
+    last token, like DRF's own throttles.
+
+    Args:
+        rate (str): "N/period", see `parse_rate`.
+    """
+
+    def __init__(self, rate):
+        self.capacity, self.per_second = parse_rate(rate)
+        # after this long untouched a bucket is full again, same as missing
+        self.timeout = math.ceil(self.capacity / self.per_second)
+
+    def take(self, key, now=None):
+        """
+        Take a token from the bucket stored under `key`
+
+        Returns:
+            wait (float): 0 when a token was taken, otherwise the seconds
+                until the next token.
+        """
+        cache = get_cache()
+        now = time.time() if now is None else now
+        tokens, updated = cache.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.per_second)
+        if tokens < 1:
+            return (1 - tokens) / self.per_second
+        cache.set(key, (tokens - 1, now), self.timeout)
+        return 0
+
+
+class ConcurrencyLimit:
+    """
+    Counts the requests of an endpoint class in flight in this process.
+
+    Args:
+        limit (int): requests served at once, None for no limit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.limit is not None and self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+def get_cache():
+    return caches[settings.THROTTLE_CONF["CACHE_ALIAS"]]
+
+
+_buckets = {}
+_limits = {}
+_setup_lock = threading.Lock()
+
+
+def get_bucket(name):
+    """The bucket configured as THROTTLE_CONF["RATES"][name], if any."""
+    rate = settings.THROTTLE_CONF["RATES"].get(name)
+    if rate is None:
+        return None
+    with _setup_lock:
+        bucket = _buckets.get((name, rate))
+        if bucket is None:
+            bucket = _buckets[name, rate] = TokenBucket(rate)
+    return bucket
+
+
+def get_limit(name):
+    limit = settings.THROTTLE_CONF["CONCURRENCY"].get(name)
+    with _setup_lock:
+        concurrency = _limits.get(name)
+        if concurrency is None:
+            concurrency = _limits[name] = ConcurrencyLimit(limit)
+        concurrency.limit = limit
+    return concurrency
+
+
+def check_rates(name, ip, user_id):
+    """
+    Take a token from the IP and the user bucket of endpoint class `name`
+
+    Returns:
+        (decision, wait) (tuple): "allowed" and 0, or "throttled_ip" /
+            "throttled_user" and the seconds until the request would pass.
+    """
+    for scope, ident in (("ip", ip), ("user", user_id)):
+        bucket = get_bucket(f"{name}_{scope}")
+        if bucket is None or ident is None:
+            continue
+        wait = bucket.take(f"throttle:{name}:{scope}:{ident}")
+        if wait:
+            return f"throttled_{scope}", wait
+    return "allowed", 0
+
+
+def record(name, decision):
+    registry.inc("throttle_decisions_total", {"class": name, "decision": decision})
@@ -3,9 +3,17 @@ from . import views
 
 urlpatterns = [
     path("", views.api),
+    path("metrics/", views.metrics, name="metrics"),
     path("auth/register/", views.register_user, name="register_user"),
     path("auth/login/", views.login_user, name="login_user"),
+    path("auth/logout/", views.logout_user, name="logout_user"),
     path("questions/", views.questions, name="questions"),
+    path("questions/bulk/", views.questions_bulk, name="questions_bulk"),
+    path("me/questions/", views.my_questions, name="my_questions"),
+    path("me/answers/", views.my_answers, name="my_answers"),
+    path("me/notifications/", views.my_notifications, name="my_notifications"),
+    path("questions/search/", views.search_questions, name="search_questions"),
+    path("answers/bulk/", views.answers_bulk, name="answers_bulk"),
     path("questions/<int:question_id>/", views.question_detail, name="question_detail"),
     path("questions/<int:question_id>/answers/", views.answers, name="answers"),
     path(
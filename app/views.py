@@ -1,21 +1,386 @@
-from rest_framework.decorators import api_view
-from .serializers import QuestionSerializer, UserSerializer, AnswerSerializer
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from .serializers import (
+    AnswerSerializer,
+    BulkAnswerSerializer,
+    BulkQuestionSerializer,
+    InvalidFields,
+    NotificationSerializer,
+    QuestionSerializer,
+    QuestionWithAnswersSerializer,
+    UserSerializer,
+    sparse_fields,
+    values_serializer,
+)
 from rest_framework.response import Response
 from rest_framework import status
-from .auth import verify_user, sign_token
-from .models import User, Answer, Question
-from django.contrib.auth.hashers import make_password, check_password
+from .auth import cache_principal, revoke_token, sign_token
+from .bulk import bulk_insert
+from .cache import (
+    QUESTION_LIST_VERSION,
+    cache_response,
+    get_version,
+    precondition,
+    question_detail_key,
+    question_list_key,
+    request_etag,
+    user_feed_key,
+    validator_headers,
+    version_etag,
+)
+from .hashers import HasherBusy, hash_password, verify_password
+from .idempotency import idempotent
+from .jobs import enqueue
+from .metrics import registry, timed_serialization
+from .models import User, Answer, Notification, Question, QuestionRank
+from .pagination import InvalidCursor, KeysetPaginator, get_page_size
+from .parsers import NDJSONParser, ORJSONParser
+from .renderers import dumps
+from .search import search
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+QUESTION_ORDERING = ("-created_at", "-id")
+# ?ordering= values of the question list, each backed by an index
+QUESTION_ORDERINGS = {
+    "newest": QUESTION_ORDERING,
+    "most_answered": ("-answer_count", "-id"),
+    "recently_answered": ("-last_answered_at", "-id"),
+    "unanswered": QUESTION_ORDERING,
+}
+# ?ordering=trending pages through QuestionRank instead, see `trending_page`
+TRENDING_ORDERING = ("-score", "-question_id")
+ANSWER_ORDERING = ("created_at", "id")
+QUESTION_COLUMNS = (
+    "id",
+    "question_text",
+    "author_id",
+    "author_email",
+    "created_at",
+    "updated_at",
+    "answer_count",
+    "last_answered_at",
+)
+
+
+def question_feed(request):
+    """
+    Pick the question list queryset and ordering from `?ordering=`
+
+    Returns:
+        (queryset, ordering) (tuple): or None for an unknown ordering.
+    """
+    name = request.GET.get("ordering", "newest")
+    if name not in QUESTION_ORDERINGS:
+        return None
+    queryset = Question.objects.all()
+    if name == "recently_answered":
+        queryset = queryset.filter(last_answered_at__isnull=False)
+    elif name == "unanswered":
+        queryset = queryset.filter(answer_count=0)
+    return queryset, QUESTION_ORDERINGS[name]
+
+
+def trending_page(request, fields=None):
+    """
+    One page of the questions with the highest trending score, see
+    app.ranking. The page is read off the score index, then its questions
+    by id, so it costs the same however many questions are ranked.
+
+    Returns:
+        body (dict): the page, like `paginated_response`'s.
+
+    Raises:
+        InvalidCursor: the cursor is not one of ours.
+    """
+    paginator = KeysetPaginator(TRENDING_ORDERING, get_page_size(request))
+    page = paginator.paginate(
+        QuestionRank.objects.filter(question__deleted_at__isnull=True).values(
+            "question_id", "score"
+        ),
+        request.GET.get("cursor"),
+    )
+    ids = [row["question_id"] for row in page.rows]
+    rows = list_queryset(
+        Question.objects.filter(pk__in=ids), QuestionSerializer, fields, ("id",)
+    )
+    if settings.SERIALIZATION_CONF["VALUES_MODE"]:
+        found = {row["id"]: row for row in rows}
+    else:
+        found = {row.pk: row for row in rows}
+    serialize = row_serializer(QuestionSerializer, fields)
+    with timed_serialization():
+        results = [serialize(found[pk]) for pk in ids if pk in found]
+    return {
+        "results": results,
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    }
+
+
+def question_list_validators(request):
+    """
+    ETag of the question lists, from the version of their cache entries,
+    without touching the database.
+
+    Every write a list page may show bumps QUESTION_LIST_VERSION, see
+    app.signals. There is no Last-Modified: a hard delete leaves no date.
+    """
+    return validator_headers(request_etag(request, get_version(QUESTION_LIST_VERSION)))
+
+
+def question_validators(request, question):
+    """
+    ETag and Last-Modified of a question page. Writes to its answers move
+    the question's `updated_at` too, see app.signals.
+    """
+    return validator_headers(
+        request_etag(request, question.updated_at, question.answer_count),
+        question.updated_at,
+    )
+
+
+def answer_validators(answer):
+    return validator_headers(
+        version_etag("answer", answer.pk, answer.updated_at), answer.updated_at
+    )
+
+
+def list_queryset(queryset, serializer_class, fields=None, ordering=()):
+    """
+    Select what `row_serializer` renders: the serializer's columns as
+    `.values()` dicts in values mode, model instances otherwise.
+
+    With a sparse fieldset only its columns are read, plus the `ordering`
+    ones that cursors are made of.
+    """
+    columns = values_serializer(serializer_class, fields).columns
+    columns = list(dict.fromkeys([*columns, *(n.lstrip("-") for n in ordering)]))
+    if settings.SERIALIZATION_CONF["VALUES_MODE"]:
+        return queryset.values(*columns)
+    if fields:
+        return queryset.only(*columns)
+    return queryset
+
+
+def row_serializer(serializer_class, fields=None):
+    """
+    Callable rendering one row of `list_queryset(queryset, serializer_class)`.
+    """
+    if settings.SERIALIZATION_CONF["VALUES_MODE"]:
+        return values_serializer(serializer_class, fields).bind()
+    return serializer_class(fields=fields).to_representation
+
+
+def invalid_fields(error):
+    return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def paginated_response(request, queryset, ordering, serializer_class):
+    """
+    Respond with one cursor page of `queryset`, with the `?fields=` of each row
+
+    Args:
+        ordering (tuple): keyset ordering, see `KeysetPaginator`.
+        serializer_class (Serializer): serializer of a single row.
+    """
+    try:
+        fields = sparse_fields(serializer_class, request.query_params.get("fields"))
+    except InvalidFields as error:
+        return invalid_fields(error)
+
+    paginator = KeysetPaginator(ordering, get_page_size(request))
+    try:
+        page = paginator.paginate(
+            list_queryset(queryset, serializer_class, fields, ordering),
+            request.query_params.get("cursor"),
+        )
+    except InvalidCursor:
+        return Response(
+            {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serialize = row_serializer(serializer_class, fields)
+    with timed_serialization():
+        results = [serialize(row) for row in page.rows]
+    return Response(
+        {
+            "results": results,
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def detail_fields(request):
+    """
+    Sparse fieldsets of a question page: `?fields=` of the question, where
+    "answers" selects the answers page, and `?answer_fields=` of its answers.
+
+    Raises:
+        InvalidFields: either names an unknown field.
+    """
+    return (
+        sparse_fields(QuestionWithAnswersSerializer, request.GET.get("fields")),
+        sparse_fields(AnswerSerializer, request.GET.get("answer_fields")),
+    )
 
 
+def wants_answers(fields):
+    return fields is None or "answers" in fields
+
+
+def question_columns(fields):
+    """
+    Question columns to read for `fields`, and those the validators need.
+    """
+    if fields is None:
+        return QUESTION_COLUMNS
+    columns = ["id", "updated_at", "answer_count"]
+    model_fields = tuple(name for name in fields if name != "answers")
+    if model_fields:
+        columns += values_serializer(QuestionSerializer, model_fields).columns
+    return tuple(dict.fromkeys(columns))
+
+
+def answer_queryset(answer_fields):
+    """
+    Answers to prefetch for `answer_fields`, with their question and the
+    ordering columns, which the prefetch and cursors are made of.
+    """
+    if answer_fields is None:
+        return Answer.objects.all()
+    columns = values_serializer(AnswerSerializer, answer_fields).columns
+    return Answer.objects.only("question_id", *ANSWER_ORDERING, *columns)
+
+
+def question_page(question, paginator, fields=None, answer_fields=None):
+    """
+    Render a question and, when `fields` has them, its answers prefetched
+    from `paginator.window` into `page_answers`.
+    """
+    page = None
+    if wants_answers(fields):
+        page = paginator.page(question.page_answers)
+        question.page_answers = page.rows
+    data = QuestionWithAnswersSerializer(
+        question, fields=fields, answer_fields=answer_fields
+    ).data
+    if page is not None:
+        data["answers_next"] = page.next_cursor
+        data["answers_previous"] = page.previous_cursor
+    return data
+
+
+def question_batch(request):
+    """
+    Look up the questions of a `?ids=1,2,3` multi-get, each with the first
+    page of its answers as on its own page. All of them are read with one
+    query, and their answers with another.
+
+    Returns:
+        (ids, queryset, render) (tuple): the ids in the order asked, the
+            queryset of those questions and a callable rendering one.
+
+    Raises:
+        ValueError: the ids or a fieldset are invalid, the message says which.
+    """
+    try:
+        ids = [int(pk) for pk in request.GET["ids"].split(",") if pk.strip()]
+        # ids past the column's range would fail the query
+        for pk in ids:
+            Question._meta.pk.run_validators(pk)
+    except (ValueError, ValidationError):
+        raise ValueError("ids must be a comma separated list of question ids")
+    ids = list(dict.fromkeys(ids))
+    limit = settings.PAGINATION_CONF["MAX_IDS"]
+    if not ids or len(ids) > limit:
+        raise ValueError(f"Ask for 1 to {limit} ids")
+    try:
+        fields, answer_fields = detail_fields(request)
+    except InvalidFields as error:
+        raise ValueError(str(error))
+
+    paginator = KeysetPaginator(
+        ANSWER_ORDERING, get_page_size(request, "answers_page_size")
+    )
+    queryset = Question.objects.only(*question_columns(fields)).filter(pk__in=ids)
+    if wants_answers(fields):
+        answers = paginator.window(answer_queryset(answer_fields))
+        queryset = queryset.prefetch_related(
+            Prefetch("answers", answers, to_attr="page_answers")
+        )
+
+    def render(question):
+        return question_page(question, paginator, fields, answer_fields)
+
+    return ids, queryset, render
+
+
+def batch_results(ids, questions, render):
+    """
+    Body of a multi-get, the questions in the order asked and the ids of
+    those that do not exist under "missing".
+    """
+    found = {question.pk: question for question in questions}
+    with timed_serialization():
+        results = [render(found[pk]) for pk in ids if pk in found]
+    return {"results": results, "missing": [pk for pk in ids if pk not in found]}
+
+
+def save_atomic(serializer, **kwargs):
+    """
+    Save a serializer so its signal handlers write in the same transaction.
+    """
+    with transaction.atomic():
+        return serializer.save(**kwargs)
+
+
+def delete_question(question):
+    """
+    Delete a question and its answers, or leave a question with more than
+    JOBS_CONF["SYNC_DELETE_MAX_ANSWERS"] answers to the delete_question job,
+    hiding it right away.
+
+    Returns:
+        status (int): 204 when deleted, 202 when left to the job.
+    """
+    if question.answer_count <= settings.JOBS_CONF["SYNC_DELETE_MAX_ANSWERS"]:
+        question.delete()
+        return status.HTTP_204_NO_CONTENT
+    with transaction.atomic():
+        question.deleted_at = timezone.now()
+        # updated_at too, it is what the question list's ETag is made of
+        question.save(update_fields=["deleted_at", "updated_at"])
+        enqueue("delete_question", {"question_id": question.pk})
+    return status.HTTP_202_ACCEPTED
+
+
+def hasher_busy():
+    return Response(
+        {"message": "Too many login attempts in flight, retry shortly"},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(settings.PASSWORD_CONF["RETRY_AFTER"])},
+    )
+
+
+@idempotent
 @api_view(["POST"])
 def register_user(request):
     """
     Grabs user registration info and stores it
     """
-    data = {
-        "email": request.data["email"],
-        "password": make_password(request.data["password"]),
-    }
+    try:
+        password = hash_password(request.data["password"])
+    except HasherBusy:
+        return hasher_busy()
+
+    data = {"email": request.data["email"], "password": password}
 
     serializer = UserSerializer(data=data)
     if serializer.is_valid():
@@ -29,6 +394,9 @@ def register_user(request):
 def login_user(request):
     """
     Grabs user login info and authenticate them.
+
+    A password hashed with an outdated algorithm or cost is rehashed with
+    the current one once it has been verified.
     """
     email = request.data["email"]
     password = request.data["password"]
@@ -38,41 +406,108 @@ def login_user(request):
             {"message": "This User Does Not Exist"}, status=status.HTTP_401_UNAUTHORIZED
         )
 
-    if check_password(password, user.password):
+    try:
+        correct, stale = verify_password(password, user.password)
+        if correct and stale:
+            user.password = hash_password(password)
+            user.save(update_fields=["password", "updated_at"])
+    except HasherBusy:
+        return hasher_busy()
+
+    if correct:
+        # the user's next requests authenticate without loading it again
+        cache_principal(user)
         return Response({"token": sign_token(user)}, status=status.HTTP_200_OK)
     return Response(
         {"message": "Incorrect Password"}, status=status.HTTP_401_UNAUTHORIZED
     )
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout_user(request):
+    """
+    Revoke the token the request was made with.
+    """
+    revoke_token(request.auth)
+    return Response({"message": "logged out"}, status=status.HTTP_200_OK)
+
+
+@idempotent
 @api_view(["GET", "POST"])
+@cache_response(question_list_key, question_list_validators)
 def questions(request):
     """
     GET:
-        Fetches all questions.
+        Fetches a page of questions, newest first.
+
+        Query params:
+            cursor (str): opaque cursor from a previous page's next/previous.
+            page_size (int): questions per page.
+            ordering (str): "newest" (default), "most_answered",
+                "recently_answered" (answered questions only), "unanswered"
+                (newest first) or "trending" (by answers, recent ones
+                weighing more, see app.ranking).
+            stream (bool): stream every question as NDJSON instead of paging.
+            fields (str): comma separated fields to return of each question.
+            ids (str): comma separated ids of the questions to fetch at once
+                instead, each with its first page of answers, see
+                `question_batch`. Takes `answers_page_size` and the fields
+                params of `question_detail`.
 
     POST:
         Posts a question.
     """
     if request.method == "GET":
-        questions = Question.objects.all()
-        serializer = QuestionSerializer(questions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if request.query_params.get("stream") in ("1", "true"):
+            try:
+                fields = sparse_fields(
+                    QuestionSerializer, request.query_params.get("fields")
+                )
+            except InvalidFields as error:
+                return invalid_fields(error)
+            return stream_questions(fields)
+
+        if "ids" in request.query_params:
+            try:
+                ids, queryset, render = question_batch(request)
+            except ValueError as error:
+                return Response(
+                    {"message": str(error)}, status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(batch_results(ids, queryset, render))
+
+        if request.query_params.get("ordering") == "trending":
+            try:
+                fields = sparse_fields(
+                    QuestionSerializer, request.query_params.get("fields")
+                )
+                return Response(trending_page(request, fields))
+            except InvalidFields as error:
+                return invalid_fields(error)
+            except InvalidCursor:
+                return Response(
+                    {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        feed = question_feed(request)
+        if feed is None:
+            return Response(
+                {"message": "Unknown ordering"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset, ordering = feed
+        return paginated_response(request, queryset, ordering, QuestionSerializer)
 
     if request.method == "POST":
-        auth = verify_user(authorization=request.META.get("HTTP_AUTHORIZATION"))
-        if auth is None:
+        if not request.user.is_authenticated:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        data = {
-            "question_text": request.data.get("question_text"),
-            "author": auth.get("user_id"),
-            "author_email": auth.get("user_email"),
-        }
+        data = {"question_text": request.data.get("question_text")}
         serializer = QuestionSerializer(data=data)
 
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(author_id=request.user.id, author_email=request.user.email)
             return Response(
                 {"message": "Question Posted"}, status=status.HTTP_201_CREATED
             )
@@ -80,48 +515,200 @@ def questions(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cache_response(user_feed_key)
+def my_questions(request):
+    """
+    Fetches a page of the questions the user has asked, newest first.
+
+    Query params:
+        cursor (str): opaque cursor from a previous page's next/previous.
+        page_size (int): questions per page.
+    """
+    return paginated_response(
+        request,
+        Question.objects.filter(author_id=request.user.id),
+        QUESTION_ORDERING,
+        QuestionSerializer,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cache_response(user_feed_key)
+def my_answers(request):
+    """
+    Fetches a page of the answers the user has posted, newest first, but
+    for those to deleted questions.
+
+    Query params:
+        cursor (str): opaque cursor from a previous page's next/previous.
+        page_size (int): answers per page.
+    """
+    return paginated_response(
+        request,
+        Answer.objects.filter(
+            author_id=request.user.id, question__deleted_at__isnull=True
+        ),
+        ("-created_at", "-id"),
+        AnswerSerializer,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cache_response(user_feed_key)
+def my_notifications(request):
+    """
+    Fetches a page of the user's notifications of new answers, newest first.
+
+    Query params:
+        cursor (str): opaque cursor from a previous page's next/previous.
+        page_size (int): notifications per page.
+    """
+    return paginated_response(
+        request,
+        Notification.objects.filter(user_id=request.user.id),
+        ("-created_at", "-id"),
+        NotificationSerializer,
+    )
+
+
+@api_view(["GET"])
+def search_questions(request):
+    """
+    Full-text search over questions and answers, best match first
+
+    Query params:
+        q (str): words to look for, the last one may be a prefix.
+        page_size (int): hits per page.
+        page (int): 1 based page number, up to
+            PAGINATION_CONF["MAX_SEARCH_PAGE"].
+    """
+    text = request.query_params.get("q", "").strip()
+    if not text:
+        return Response(
+            {"message": "Provide a search query with ?q="},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    page_size = get_page_size(request)
+    try:
+        page = max(1, int(request.query_params.get("page", 1)))
+    except ValueError:
+        page = 1
+    max_page = settings.PAGINATION_CONF["MAX_SEARCH_PAGE"]
+    if page > max_page:
+        return Response(
+            {"message": f"page must be 1 to {max_page}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    hits = search(text, limit=page_size, offset=(page - 1) * page_size)
+    return Response({"results": hits, "page": page}, status=status.HTTP_200_OK)
+
+
+def stream_questions(fields=None):
+    """
+    Stream every question as newline delimited JSON.
+
+    Rows are read with a server side iterator, so memory use stays flat
+    however large the table is.
+    """
+    queryset = list_queryset(
+        Question.objects.order_by(*QUESTION_ORDERING), QuestionSerializer, fields
+    ).iterator(chunk_size=settings.PAGINATION_CONF["STREAM_CHUNK_SIZE"])
+    serialize = row_serializer(QuestionSerializer, fields)
+    lines = (dumps(serialize(row)) + b"\n" for row in queryset)
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+
 @api_view(["GET", "DELETE"])
+@cache_response(question_detail_key)
 def question_detail(request, question_id):
     """
     GET:
-        Fetch a specific question and its answers
+        Fetch a specific question and a page of its answers, oldest first.
+        Runs two queries whatever the number of answers, and answers a
+        conditional request from the question alone.
+
+        Query params:
+            answers_cursor (str): cursor from a previous `answers_next`.
+            answers_page_size (int): answers per page.
+            fields (str): comma separated fields of the question to return,
+                "answers" among them for the answers page.
+            answer_fields (str): comma separated fields of each answer.
 
     DELETE:
-        Delete a question, only one who created the question can perform this operation
+        Delete a question, only one who created the question can perform this operation.
+        Answers 202 when the question has too many answers to delete them in the
+        request, see `delete_question`.
 
     Args:
        question_id (int): question unique id
     """
 
-    try:
-        question = Question.objects.get(pk=question_id)
-        answers = question.answers.all()
-    except Question.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
-
     if request.method == "GET":
-        serializer = QuestionSerializer(question)
-        answer_serializer = AnswerSerializer(answers, many=True)
-        return Response(
-            {"question": serializer.data, "answers": answer_serializer.data},
-            status=status.HTTP_200_OK,
+        try:
+            fields, answer_fields = detail_fields(request)
+        except InvalidFields as error:
+            return invalid_fields(error)
+
+        paginator = KeysetPaginator(
+            ANSWER_ORDERING, get_page_size(request, "answers_page_size")
         )
+        try:
+            answers = paginator.window(
+                answer_queryset(answer_fields),
+                request.query_params.get("answers_cursor"),
+            )
+        except InvalidCursor:
+            return Response(
+                {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        question = (
+            Question.objects.only(*question_columns(fields))
+            .filter(pk=question_id)
+            .first()
+        )
+        if question is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        headers = question_validators(request, question)
+        code = precondition(request, headers)
+        if code is not None:
+            return Response(status=code, headers=headers)
+
+        if wants_answers(fields):
+            prefetch_related_objects(
+                [question], Prefetch("answers", answers, to_attr="page_answers")
+            )
+        with timed_serialization():
+            data = question_page(question, paginator, fields, answer_fields)
+        return Response(data, status=status.HTTP_200_OK, headers=headers)
 
     if request.method == "DELETE":
-        serializer = QuestionSerializer(question)
-        auth = verify_user(authorization=request.META.get("HTTP_AUTHORIZATION"))
-        if auth is None:
+        question = (
+            Question.objects.filter(pk=question_id)
+            .only("author_id", "answer_count")
+            .first()
+        )
+        if question is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        if not request.user.is_authenticated:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        if serializer.data["author"] != auth["user_id"]:
+        if question.author_id != request.user.id:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        # delete the question
-        question.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=delete_question(question))
 
 
+@idempotent
 @api_view(["POST"])
+@permission_classes([IsAuthenticated])
 def answers(request, question_id):
     """
     Post an answer to a question
@@ -129,63 +716,183 @@ def answers(request, question_id):
     Args:
         question_id (int): question unique id
     """
-    auth = verify_user(authorization=request.META.get("HTTP_AUTHORIZATION"))
-    if auth is None:
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
-
-    data = {
-        "answer_text": request.data.get("answer_text"),
-        "question": question_id,
-        "author": auth.get("user_id"),
-        "author_email": auth.get("user_email"),
-    }
+    data = {"answer_text": request.data.get("answer_text"), "question": question_id}
     serializer = AnswerSerializer(data=data)
     if serializer.is_valid():
-        serializer.save()
+        save_atomic(
+            serializer, author_id=request.user.id, author_email=request.user.email
+        )
         return Response({"message": "Answer Posted"}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(["PUT", "DELETE"])
+def bulk_response(created, item_errors):
+    """
+    Report which items of a bulk request were created and why the others were not.
+
+    Args:
+        created (list): (index, instance) pairs of the created items.
+        item_errors (dict): validation errors keyed by item index.
+    """
+    body = {
+        "created": [{"index": index, "id": obj.pk} for index, obj in created],
+        "errors": [
+            {"index": index, "errors": errors}
+            for index, errors in sorted(item_errors.items())
+        ],
+    }
+    if created or not item_errors:
+        return Response(body, status=status.HTTP_201_CREATED)
+    return Response(body, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes([ORJSONParser, NDJSONParser])
+def questions_bulk(request):
+    """
+    Post many questions at once
+
+    Takes a JSON array or NDJSON of `{"question_text": ...}` objects. Valid
+    items are written with `bulk_create` in batched transactions, invalid
+    ones are reported by index.
+    """
+    serializer = BulkQuestionSerializer(
+        data=request.data, many=True, max_length=settings.BULK_CONF["MAX_ITEMS"]
+    )
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = serializer.validated_data
+    created = bulk_insert(
+        Question,
+        [
+            Question(
+                author_id=request.user.id, author_email=request.user.email, **attrs
+            )
+            for _, attrs in items
+        ],
+    )
+    return bulk_response(
+        list(zip([i for i, _ in items], created)), serializer.item_errors
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes([ORJSONParser, NDJSONParser])
+def answers_bulk(request):
+    """
+    Post many answers at once, to any number of questions
+
+    Takes a JSON array or NDJSON of `{"question": ..., "answer_text": ...}`
+    objects, see `questions_bulk`.
+    """
+    serializer = BulkAnswerSerializer(
+        data=request.data, many=True, max_length=settings.BULK_CONF["MAX_ITEMS"]
+    )
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    item_errors = serializer.item_errors
+    items = serializer.validated_data
+    existing = set(
+        Question.objects.filter(
+            pk__in={attrs["question"] for _, attrs in items}
+        ).values_list("pk", flat=True)
+    )
+    for index, attrs in items:
+        if attrs["question"] not in existing:
+            message = f"Invalid pk \"{attrs['question']}\" - object does not exist."
+            item_errors[index] = {"question": [message]}
+    items = [(index, attrs) for index, attrs in items if index not in item_errors]
+
+    created = bulk_insert(
+        Answer,
+        [
+            Answer(
+                question_id=attrs["question"],
+                answer_text=attrs["answer_text"],
+                author_id=request.user.id,
+                author_email=request.user.email,
+            )
+            for _, attrs in items
+        ],
+    )
+    return bulk_response(list(zip([i for i, _ in items], created)), item_errors)
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
 def answer_detail(request, question_id, answer_id):
     """
+    GET:
+        Fetch an answer, with its ETag and Last-Modified
+
     PUT:
         Update an answer, only the answer author can
 
     DELETE:
         Delete an answer, only the answer author can
 
+    PUT and DELETE answer 412 when an `If-Match` or `If-Unmodified-Since`
+    header does not match the current version of the answer, so a client
+    does not overwrite a change it has not seen.
+
     Args:
         question_id (int): question unique id
         answer_id (int): answer unique id
     """
-    auth = verify_user(authorization=request.META.get("HTTP_AUTHORIZATION", None))
-
-    if auth is None:
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
+    if request.method == "GET":
+        ans = Answer.objects.filter(pk=answer_id, question_id=question_id).first()
+        if ans is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        headers = answer_validators(ans)
+        code = precondition(request, headers)
+        if code is not None:
+            return Response(status=code, headers=headers)
+        return Response(AnswerSerializer(ans).data, headers=headers)
+
+    # the answer stays locked from the version check to the write
+    with transaction.atomic():
+        ans = (
+            Answer.objects.select_for_update()
+            .filter(pk=answer_id, question_id=question_id)
+            .first()
+        )
+        if ans is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
 
-    try:
-        ans = Answer.objects.get(pk=answer_id)
-    except:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        if ans.author_id != request.user.id:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-    serializer = AnswerSerializer(ans)
-    if serializer.data["author"] != auth.get("user_id"):
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
+        code = precondition(request, answer_validators(ans))
+        if code is not None:
+            return Response(status=code)
 
-    if request.method == "PUT":
-        serializer = AnswerSerializer(ans, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        if request.method == "PUT":
+            serializer = AnswerSerializer(ans, data=request.data)
+            if serializer.is_valid():
+                ans = serializer.save()
+                return Response(
+                    status=status.HTTP_204_NO_CONTENT, headers=answer_validators(ans)
+                )
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    if request.method == "DELETE":
         ans.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def metrics(request):
+    """
+    Serve the in-process metrics in the Prometheus text format.
+    """
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @api_view(["GET"])
 def api(request):
     return Response({"message": "API is running...."}, status=status.HTTP_200_OK)
@@ -0,0 +1,47 @@
+"""
+Benchmarks for Kevin's Service.
+
+Run a benchmark from the project root with `python -m bench.<module>`.
+"""
+
+import os
+from contextlib import contextmanager
+
+
+def setup():
+    """Configure Django the same way manage.py does."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    django.setup()
+
+
+@contextmanager
+def scratch_database(name=None):
+    """
+    Run against a freshly migrated throwaway database, like the test runner.
+
+    Args:
+        name (str): database to create, the test database name by default.
+            SQLite test databases live in memory unless a file is named.
+    """
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    if name is not None:
+        connection.settings_dict["TEST"]["NAME"] = name
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def without_rate_limits():
+    """
+    Turn the rate limits off, a benchmark is one client hammering from one IP.
+    """
+    from django.conf import settings
+    from django.test import override_settings
+
+    return override_settings(THROTTLE_CONF={**settings.THROTTLE_CONF, "RATES": {}})
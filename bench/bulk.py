@@ -0,0 +1,78 @@
+"""
+Single-item vs bulk write throughput.
+
+Creates `--items` questions and as many answers through the single-item
+endpoints, one request each, then again through the bulk endpoints, and
+reports items/sec for both paths. Runs in process on a scratch database.
+
+    python -m bench.bulk --items 2000
+"""
+
+import argparse
+import json
+import time
+
+from . import scratch_database, setup, without_rate_limits
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(items):
+    from django.test import Client
+
+    from app.auth import sign_token
+    from app.models import Question, User
+
+    user = User.objects.create(email="bench@example.com", password="-")
+    client = Client(HTTP_AUTHORIZATION="Bearer " + sign_token(user))
+    target = Question.objects.create(
+        question_text="Bench?", author=user, author_email=user.email
+    )
+
+    def post(path, data):
+        response = client.post(path, data, content_type="application/json")
+        assert response.status_code == 201, response.content
+
+    questions = [{"question_text": f"Question {i}?"} for i in range(items)]
+    answers = [
+        {"question": target.pk, "answer_text": f"Answer {i}"} for i in range(items)
+    ]
+
+    results = {}
+    single = timed(lambda: [post("/questions/", item) for item in questions])
+    bulk = timed(lambda: post("/questions/bulk/", questions))
+    results["questions"] = {"single": single, "bulk": bulk}
+
+    path = f"/questions/{target.pk}/answers/"
+    single = timed(
+        lambda: [post(path, {"answer_text": a["answer_text"]}) for a in answers]
+    )
+    bulk = timed(lambda: post("/answers/bulk/", answers))
+    results["answers"] = {"single": single, "bulk": bulk}
+
+    return {
+        kind: {
+            f"{path}_items_per_sec": round(items / seconds, 1)
+            for path, seconds in timings.items()
+        }
+        | {"speedup": round(timings["single"] / timings["bulk"], 1)}
+        for kind, timings in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    with scratch_database(), without_rate_limits():
+        print(json.dumps({"items": args.items, **run(args.items)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare two `bench.run` result files endpoint by endpoint.
+
+    python -m bench.compare before.json after.json
+
+Prints the change in req/s, p50/p95/p99 and queries per request; a negative
+latency change or a positive throughput change is an improvement.
+"""
+
+import argparse
+import json
+
+COLUMNS = ("requests_per_sec", "p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+def change(before, after):
+    if before is None or after is None:
+        return "n/a"
+    if not before:
+        return f"{after}"
+    return f"{after} ({(after - before) / before:+.1%})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as handle:
+        before = json.load(handle)
+    with open(args.after) as handle:
+        after = json.load(handle)
+
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    for name, result in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if old is None:
+            print(f"{name:>18}: new")
+            continue
+        cells = ", ".join(
+            f"{column}={change(old.get(column), result.get(column))}"
+            for column in COLUMNS
+        )
+        print(f"{name:>18}: {cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Password hashing throughput.
+
+Verifies a password from many client threads through the hashing pool, the
+way concurrent logins do, and reports logins/sec and logins/sec per core for
+each hasher.
+
+    python -m bench.hashing --seconds 5 --clients 64
+"""
+
+import argparse
+import json
+import threading
+import time
+
+from . import setup
+
+
+def run(algorithm, seconds, clients):
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+
+    from app.hashers import HasherBusy, verify_password
+
+    encoded = make_password("correct horse battery staple", hasher=algorithm)
+    done = []
+    rejected = []
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            try:
+                verify_password("correct horse battery staple", encoded)
+                done.append(1)
+            except HasherBusy:
+                rejected.append(1)
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    workers = settings.PASSWORD_CONF["WORKERS"]
+    return {
+        "algorithm": algorithm,
+        "workers": workers,
+        "clients": clients,
+        "logins": len(done),
+        "rejected": len(rejected),
+        "logins_per_sec": round(len(done) / elapsed, 1),
+        "logins_per_sec_per_core": round(len(done) / elapsed / workers, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument(
+        "--algorithm",
+        action="append",
+        help="hasher algorithm name, repeatable (default: every configured hasher)",
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.hashers import get_hashers
+
+    algorithms = args.algorithm or [hasher.algorithm for hasher in get_hashers()]
+    results = []
+    for algorithm in algorithms:
+        try:
+            results.append(run(algorithm, args.seconds, args.clients))
+        except ValueError as error:
+            # e.g. argon2 without argon2-cffi installed
+            results.append({"algorithm": algorithm, "error": str(error)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
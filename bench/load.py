@@ -0,0 +1,125 @@
+"""
+Closed-loop HTTP load test comparing the WSGI and ASGI deployments.
+
+Start both deployments against the same database, for example:
+
+    export WEB_CONCURRENCY=4 TOKEN_CACHE_BACKEND=file
+    gunicorn core.wsgi:application --workers 4 --threads 8 --bind 127.0.0.1:8001
+    uvicorn core.asgi:application --workers 4 --port 8002
+
+then point the load test at them:
+
+    python -m bench.load --target wsgi=http://127.0.0.1:8001 \
+        --target asgi=http://127.0.0.1:8002 --question-id 1
+
+Each target gets the same request mix from `--concurrency` keep-alive
+clients for `--seconds`; requests/sec and p50/p99 latency are printed per
+target and endpoint as JSON.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def load(base_url, paths, seconds, concurrency, headers):
+    """
+    Hit `paths` round robin from `concurrency` clients for `seconds`
+
+    Returns:
+        results (dict): summary per path.
+    """
+    url = urlsplit(base_url)
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+        index = offset
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection.request("GET", url.path.rstrip("/") + path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+                ok = False
+            took = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies[path].append(took)
+                else:
+                    errors[path] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {
+        path: summarize(latencies[path], errors[path], elapsed) for path in paths
+    }
+    everything = [took for samples in latencies.values() for took in samples]
+    results["all"] = summarize(everything, sum(errors.values()), elapsed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="name=base_url of a running deployment, repeatable",
+    )
+    parser.add_argument("--question-id", type=int, default=1)
+    parser.add_argument("--token", help="JWT sent as a Bearer token")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    paths = ["/questions/", f"/questions/{args.question_id}/"]
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    report = {}
+    for target in args.target:
+        name, _, base_url = target.partition("=")
+        report[name] = load(base_url, paths, args.seconds, args.concurrency, headers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
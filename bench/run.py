@@ -0,0 +1,319 @@
+"""
+Throughput and latency of every endpoint in app/urls.py.
+
+Runs each endpoint `--requests` times, either in process through Django's
+test client or over HTTP against a running server (`--url`), and reports
+req/s, p50/p95/p99 latency and queries per request. Queries are read from
+the `Server-Timing` header, so they are counted in both modes.
+
+Seed a database first (`python manage.py seed_data --questions 100000`),
+or let the benchmark seed a throwaway one:
+
+    python -m bench.run --scratch --users 100 --questions 10000 --answers 30000 \
+        --out results.json
+
+Compare two result files with `python -m bench.compare old.json new.json`.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import platform
+import random
+import re
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from . import scratch_database, setup, without_rate_limits
+from .load import percentile
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+PASSWORD = "bench-password"
+
+
+class InProcessTransport:
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = getattr(self.client, method.lower())(
+            path,
+            data=json.dumps(body) if body is not None else None,
+            content_type="application/json",
+            headers=headers or {},
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response.status_code, response.get("Server-Timing", "")
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.url = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(
+            self.url.hostname, self.url.port or 80
+        )
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        self.connection.request(
+            method, self.url.path.rstrip("/") + path, body=payload, headers=headers
+        )
+        response = self.connection.getresponse()
+        response.read()
+        return response.status, response.getheader("Server-Timing", "")
+
+
+class Context:
+    """IDs and credentials the request builders pick from."""
+
+    def __init__(self, rng):
+        from app.auth import sign_token
+        from app.models import Answer, Question, User
+
+        self.rng = rng
+        self.user = User.objects.order_by("pk").first()
+        self.token = sign_token(self.user)
+        self.auth = {"Authorization": f"Bearer {self.token}"}
+        self.question_ids = list(
+            Question.objects.order_by("-pk").values_list("pk", flat=True)[:10000]
+        )
+        self.own_answer = Answer.objects.filter(author=self.user).first()
+        if self.own_answer is None:
+            self.own_answer = Answer.objects.create(
+                answer_text="Bench answer",
+                question_id=self.question_ids[0],
+                author=self.user,
+                author_email=self.user.email,
+            )
+        self.counter = itertools.count()
+        self.run = time.time_ns()
+
+    def question_id(self):
+        return self.rng.choice(self.question_ids)
+
+
+def endpoints(ctx):
+    """
+    Request builders per URL name, each returning (method, path, body, headers).
+    """
+    words = ["rice", "python", "cache", "how", "best", "server"]
+    return {
+        "api": lambda: ("GET", "/", None, {}),
+        "register_user": lambda: (
+            "POST",
+            "/auth/register/",
+            {
+                "email": f"bench-{ctx.run}-{next(ctx.counter)}@example.com",
+                "password": PASSWORD,
+            },
+            {},
+        ),
+        "login_user": lambda: (
+            "POST",
+            "/auth/login/",
+            {"email": ctx.user.email, "password": PASSWORD},
+            {},
+        ),
+        "questions": lambda: ("GET", "/questions/", None, {}),
+        "question_detail": lambda: (
+            "GET",
+            f"/questions/{ctx.question_id()}/",
+            None,
+            {},
+        ),
+        "answers": lambda: (
+            "POST",
+            f"/questions/{ctx.question_id()}/answers/",
+            {"answer_text": "A benchmark answer"},
+            ctx.auth,
+        ),
+        "answer_detail": lambda: (
+            "PUT",
+            f"/questions/{ctx.own_answer.question_id}/answers/{ctx.own_answer.pk}/",
+            {
+                "answer_text": f"Edited {next(ctx.counter)}",
+                "question": ctx.own_answer.question_id,
+                "author": ctx.user.pk,
+                "author_email": ctx.user.email,
+            },
+            ctx.auth,
+        ),
+        "questions_bulk": lambda: (
+            "POST",
+            "/questions/bulk/",
+            [{"question_text": f"Bulk question {i}?"} for i in range(100)],
+            ctx.auth,
+        ),
+        "answers_bulk": lambda: (
+            "POST",
+            "/answers/bulk/",
+            [
+                {"question": ctx.question_id(), "answer_text": f"Bulk answer {i}"}
+                for i in range(100)
+            ],
+            ctx.auth,
+        ),
+        "search_questions": lambda: (
+            "GET",
+            "/questions/search/?" + urlencode({"q": ctx.rng.choice(words)}),
+            None,
+            {},
+        ),
+        "my_questions": lambda: ("GET", "/me/questions/", None, ctx.auth),
+        "my_answers": lambda: ("GET", "/me/answers/", None, ctx.auth),
+        "metrics": lambda: ("GET", "/metrics/", None, {}),
+    }
+
+
+# password hashing makes these orders of magnitude slower than the rest
+SLOW = {"register_user": 0.1, "login_user": 0.1}
+
+
+def bench(transport, build, requests):
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        method, path, body, headers = build()
+        began = time.perf_counter()
+        status, timing = transport.request(method, path, body, headers)
+        latencies.append(time.perf_counter() - began)
+        if status >= 400:
+            errors += 1
+        match = QUERIES.search(timing)
+        if match:
+            queries.append(int(match.group(1)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "queries_per_request": (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+    }
+
+
+def without_response_cache():
+    from django.conf import settings
+    from django.test import override_settings
+
+    alias = settings.RESPONSE_CACHE_CONF["ALIAS"]
+    dummy = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    return override_settings(CACHES={**settings.CACHES, alias: dummy})
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    import django
+    from django.core.management import call_command
+
+    from app.models import Answer, Question, User
+
+    if args.scratch:
+        call_command(
+            "seed_data",
+            users=args.users,
+            questions=args.questions,
+            answers=args.answers,
+            password=PASSWORD,
+            seed=args.seed,
+        )
+    if not Question.objects.exists():
+        raise SystemExit("No questions to benchmark, run seed_data or pass --scratch")
+
+    rng = random.Random(args.seed)
+    transport = HTTPTransport(args.url) if args.url else InProcessTransport()
+    ctx = Context(rng)
+    builders = endpoints(ctx)
+    selected = args.endpoint or list(builders)
+
+    results = {}
+    for name in selected:
+        requests = max(1, int(args.requests * SLOW.get(name, 1)))
+        bench(transport, builders[name], min(requests, 10))  # warm up
+        results[name] = bench(transport, builders[name], requests)
+        print(f"{name:>18}: {json.dumps(results[name])}")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "mode": args.url or "in-process",
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "rows": {
+                "users": User.objects.count(),
+                "questions": Question.objects.count(),
+                "answers": Answer.objects.count(),
+            },
+            "requests": args.requests,
+            "response_cache": not args.no_cache,
+        },
+        "endpoints": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument(
+        "--scratch",
+        action="store_true",
+        help="seed and benchmark a throwaway database",
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--answers", type=int, default=30000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoint", action="append", help="URL name, repeatable")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="measure reads without the response cache (in-process only)",
+    )
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup()
+    with ExitStack() as stack:
+        stack.enter_context(without_rate_limits())
+        if args.no_cache:
+            stack.enter_context(without_response_cache())
+        if args.scratch:
+            stack.enter_context(scratch_database())
+        report = run(args)
+
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
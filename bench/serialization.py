@@ -0,0 +1,76 @@
+"""
+Serialization time per 1k rows of the question list.
+
+Renders `--rows` questions with the ModelSerializer and with values mode,
+each encoded by DRF's stdlib `JSONRenderer` and by `ORJSONRenderer`, and
+reports milliseconds per 1k rows for fetching, serializing and encoding.
+Runs in process on a scratch database.
+
+    python -m bench.serialization --rows 10000
+"""
+
+import argparse
+import json
+import time
+
+from . import scratch_database, setup
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(rows, repeat):
+    from django.core.management import call_command
+    from django.test import override_settings
+    from rest_framework.renderers import JSONRenderer
+
+    from app.models import Question
+    from app.renderers import ORJSONRenderer
+    from app.serializers import QuestionSerializer
+    from app.views import list_queryset, row_serializer
+
+    call_command("seed_data", users=10, questions=rows, answers=0, verbosity=0)
+
+    results = {}
+    for mode in ("serializer", "values"):
+        with override_settings(SERIALIZATION_CONF={"VALUES_MODE": mode == "values"}):
+            queryset = list_queryset(Question.objects.all(), QuestionSerializer)
+            fetched = list(queryset)
+            serialize = row_serializer(QuestionSerializer)
+            data = [serialize(row) for row in fetched]
+
+            timings = {
+                "fetch": best_of(lambda: list(queryset.all()), repeat),
+                "serialize": best_of(
+                    lambda: [serialize(row) for row in fetched], repeat
+                ),
+            }
+        for name, renderer in (("json", JSONRenderer()), ("orjson", ORJSONRenderer())):
+            timings[f"encode_{name}"] = best_of(lambda: renderer.render(data), repeat)
+
+        results[mode] = {
+            f"{step}_ms_per_1k": round(seconds * 1000 * 1000 / rows, 2)
+            for step, seconds in timings.items()
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    with scratch_database():
+        print(json.dumps({"rows": args.rows, **run(args.rows, args.repeat)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
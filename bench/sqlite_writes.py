@@ -0,0 +1,138 @@
+"""
+Concurrent write throughput on SQLite, with and without SQLITE_CONF.
+
+`--threads` clients post answers through the API at the same time for
+`--seconds`, first against a database with SQLite's defaults (rollback
+journal, synchronous=FULL, deferred transactions), then against one tuned
+as in settings (WAL, synchronous=NORMAL, immediate transactions, busy
+timeout). Each run uses a fresh database file, and answers/sec, p50/p99
+latency and "database is locked" errors are printed as JSON.
+
+    python -m bench.sqlite_writes --threads 8 --seconds 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from . import scratch_database, setup, without_rate_limits
+from .load import summarize
+
+DEFAULTS = {
+    "JOURNAL_MODE": None,
+    "SYNCHRONOUS": None,
+    "BUSY_TIMEOUT": None,
+    "MMAP_SIZE": None,
+    "CACHE_SIZE": None,
+}
+
+
+def hammer(threads, seconds):
+    from django.db import OperationalError, connections
+    from django.test import Client
+
+    from app.auth import sign_token
+    from app.models import Question, User
+
+    user = User.objects.create(email="bench@example.com", password="-")
+    token = sign_token(user)
+    question_ids = [
+        Question.objects.create(
+            question_text=f"Bench {i}?", author=user, author_email=user.email
+        ).pk
+        for i in range(threads)
+    ]
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(question_id):
+        client = Client(
+            HTTP_AUTHORIZATION="Bearer " + token, raise_request_exception=False
+        )
+        path = f"/questions/{question_id}/answers/"
+        mine, failed = [], 0
+        try:
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    response = client.post(
+                        path,
+                        {"answer_text": "Bench answer"},
+                        content_type="application/json",
+                    )
+                    ok = response.status_code == 201
+                except OperationalError:
+                    ok = False
+                if ok:
+                    mine.append(time.perf_counter() - began)
+                else:
+                    failed += 1
+        finally:
+            connections.close_all()
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    workers = [threading.Thread(target=writer, args=(pk,)) for pk in question_ids]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return summarize(latencies, sum(errors), time.perf_counter() - started)
+
+
+def run(profile, threads, seconds):
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+
+    options = connection.settings_dict.setdefault("OPTIONS", {})
+    tuned = dict(options)
+    conf = settings.SQLITE_CONF if profile == "tuned" else DEFAULTS
+    if profile != "tuned":
+        # only set on Django 5.1+, see core.settings
+        options.pop("transaction_mode", None)
+
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(SQLITE_CONF=conf), without_rate_limits():
+            with scratch_database(os.path.join(directory, "bench.sqlite3")):
+                return hammer(threads, seconds)
+    finally:
+        options.clear()
+        options.update(tuned)
+        os.rmdir(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    setup()
+    # every "database is locked" would otherwise print a traceback
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    from django.db import connection
+
+    if connection.vendor != "sqlite":
+        raise SystemExit("This benchmark needs DATABASE_ENGINE=sqlite")
+
+    results = {
+        profile: run(profile, args.threads, args.seconds)
+        for profile in ("default", "tuned")
+    }
+    print(json.dumps({"threads": args.threads, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
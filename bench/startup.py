@@ -0,0 +1,112 @@
+"""
+Cold start and per-request overhead of the "full" and "api" settings profiles.
+
+Every run of a profile is a fresh interpreter that sets Django up, loads the
+URLconf and serves one request, timed from the parent. Per-request overhead is
+then measured in one more process per profile, with `--requests` in-process
+requests to views that do not touch the database, so the difference is what
+the middleware and the request/response stack cost, best of 5 rounds.
+
+    python -m bench.startup --runs 10 --requests 2000
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROFILES = ("full", "api")
+
+# per-request timings are the best of this many rounds, the least disturbed
+ROUNDS = 5
+
+# path: view that does no database work
+PATHS = {"api": "/", "unauthorized": "/me/questions/"}
+
+
+def child(requests):
+    """Runs in the measured process, prints its timings as JSON."""
+    started = time.perf_counter()
+    from . import setup
+
+    setup()
+    from django.test import Client
+
+    from . import without_rate_limits
+
+    # 4xx responses are logged, which would be most of what is measured
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    client = Client()
+    with without_rate_limits():
+        client.get("/")
+        ready = time.perf_counter() - started
+
+        per_request = {}
+        for name, path in PATHS.items():
+            rounds = []
+            for _ in range(ROUNDS):
+                began = time.perf_counter()
+                for _ in range(requests):
+                    client.get(path)
+                rounds.append((time.perf_counter() - began) / max(requests, 1))
+            per_request[name] = min(rounds)
+    print(json.dumps({"ready": ready, "per_request": per_request}))
+
+
+def spawn(profile, requests):
+    env = {**os.environ, "SETTINGS_PROFILE": profile}
+    command = [sys.executable, "-m", "bench.startup", "--child", str(requests)]
+    started = time.perf_counter()
+    output = subprocess.check_output(command, env=env, text=True)
+    elapsed = time.perf_counter() - started
+    return elapsed, json.loads(output.splitlines()[-1])
+
+
+def run(runs, requests):
+    # alternate the profiles, so a noisy moment does not favour one of them
+    cold = {profile: [] for profile in PROFILES}
+    for _ in range(runs):
+        for profile in PROFILES:
+            cold[profile].append(spawn(profile, 0)[0])
+
+    results = {}
+    for profile in PROFILES:
+        _, report = spawn(profile, requests)
+        results[profile] = {
+            "cold_start_ms": round(statistics.median(cold[profile]) * 1000, 1),
+            "cold_start_min_ms": round(min(cold[profile]) * 1000, 1),
+            "per_request_us": {
+                name: round(seconds * 1e6, 1)
+                for name, seconds in report["per_request"].items()
+            },
+        }
+        print(f"{profile:>5}: {json.dumps(results[profile])}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10, help="cold starts per profile")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return
+
+    results = run(args.runs, args.requests)
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
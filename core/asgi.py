@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Serve the async variants of the API views
+os.environ.setdefault('API_URLCONF', 'app.async_urls')
 
 application = get_asgi_application()
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.middleware.ProfilingMiddleware",
+    "app.middleware.ThrottleMiddleware",
+    "app.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +63,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "core.urls"
 
+# API routes, core/asgi.py switches this to the async views in app.async_urls
+API_URLCONF = os.environ.get("API_URLCONF", "app.urls")
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -73,15 +84,202 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "core.wsgi.application"
 
+# Settings profile
+#  SETTINGS_PROFILE is "full" (default), the stock Django stack, or "api", which keeps
+#  only what the JSON API uses. Authentication is the JWT in app.auth, so the api
+#  profile leaves out the admin, auth, sessions and messages apps, their middleware,
+#  CSRF, the templates and the browsable API. admin/ is only mounted when the admin
+#  is installed.
+
+SETTINGS_PROFILE = os.environ.get("SETTINGS_PROFILE", "full")
+
+# what the api profile leaves out
+FULL_STACK_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+FULL_STACK_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+if SETTINGS_PROFILE == "api":
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in FULL_STACK_APPS]
+    MIDDLEWARE = [name for name in MIDDLEWARE if name not in FULL_STACK_MIDDLEWARE]
+    TEMPLATES = []
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+#  DATABASE_ENGINE is "sqlite" (default) or "postgresql", which is configured with
+#  DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and DATABASE_PORT.
+#  Connections are kept open for DATABASE_CONN_MAX_AGE seconds and health checked
+#  before they are reused.
+
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 600))
+
+if DATABASE_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DATABASE_NAME", "wezacare"),
+            "USER": os.environ.get("DATABASE_USER", ""),
+            "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+            "HOST": os.environ.get("DATABASE_HOST", ""),
+            "PORT": os.environ.get("DATABASE_PORT", ""),
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if django.VERSION >= (5, 1):
+        # take the write lock when a transaction starts, a deferred
+        # transaction that later writes fails with "database is locked"
+        # instead of waiting for busy_timeout. Older Django has no such option.
+        DATABASES["default"]["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+
+# Read replicas
+#  DATABASE_REPLICAS lists replicas of the database, comma separated: SQLite files,
+#  or PostgreSQL hosts with DATABASE_ENGINE=postgresql. Reads are spread over them
+#  (see app.routers) except for a user's reads within PIN_SECONDS of their last
+#  write. Pins live in CACHE_ALIAS, which must be shared by every worker.
+#  Keep SQLite replicas up to date with `python manage.py sync_replicas`.
+
+DATABASE_REPLICAS = [
+    location
+    for location in os.environ.get("DATABASE_REPLICAS", "").split(",")
+    if location
+]
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+for index, location in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        ("HOST" if DATABASE_ENGINE == "postgresql" else "NAME"): location,
+        "OPTIONS": dict(DATABASES["default"].get("OPTIONS", {})),
+        "TEST": {"MIRROR": "default"},
     }
+
+REPLICA_CONF = {
+    "ALIASES": [f"replica{index}" for index in range(1, len(DATABASE_REPLICAS) + 1)],
+    "PIN_SECONDS": int(os.environ.get("REPLICA_PIN_SECONDS", 5)),
+    "CACHE_ALIAS": os.environ.get("REPLICA_PIN_CACHE", "default"),
+}
+
+DATABASE_ROUTERS = ["app.routers.ReplicaRouter"]
+
+# SQLite PRAGMAs applied to every new connection, see app.signals.tune_sqlite.
+#  WAL lets readers run alongside the single writer, and with synchronous=NORMAL
+#  a commit no longer waits for fsync (a power cut may lose the last commits, but
+#  never corrupts the database). Writers wait up to BUSY_TIMEOUT ms for the lock.
+
+SQLITE_CONF = {
+    "JOURNAL_MODE": os.environ.get("SQLITE_JOURNAL_MODE", "wal"),
+    "SYNCHRONOUS": os.environ.get("SQLITE_SYNCHRONOUS", "normal"),
+    "BUSY_TIMEOUT": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
+    "MMAP_SIZE": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # negative sizes are in KiB, so 64MB of page cache per connection
+    "CACHE_SIZE": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+#  RESPONSE_CACHE_BACKEND, THROTTLE_CACHE_BACKEND, TOKEN_CACHE_BACKEND and
+#  IDEMPOTENCY_CACHE_BACKEND are "locmem" (default), "file", "db" or any cache backend dotted
+#  path. Rate limits, revoked tokens and idempotency keys are shared by the processes
+#  sharing the cache. WEB_CONCURRENCY is the number of worker processes, as read by
+#  gunicorn and uvicorn; with more than one, TOKEN_CACHE_BACKEND must be shared
+#  ("file", "db" after `manage.py createcachetable`, or a shared server's backend).
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+}
+
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "locmem")
+
+THROTTLE_CACHE_BACKEND = os.environ.get("THROTTLE_CACHE_BACKEND", "locmem")
+
+TOKEN_CACHE_BACKEND = os.environ.get("TOKEN_CACHE_BACKEND", "locmem")
+
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# a revocation kept in one worker's memory is not seen by the others
+if WEB_CONCURRENCY > 1 and CACHE_BACKENDS.get(
+    TOKEN_CACHE_BACKEND, TOKEN_CACHE_BACKEND
+) == CACHE_BACKENDS["locmem"]:
+    raise ImproperlyConfigured(
+        "TOKEN_CACHE_BACKEND must be shared by the WEB_CONCURRENCY workers, "
+        f"not {TOKEN_CACHE_BACKEND!r}."
+    )
+
+IDEMPOTENCY_CACHE_BACKEND = os.environ.get("IDEMPOTENCY_CACHE_BACKEND", "locmem")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "throttle": {
+        "BACKEND": CACHE_BACKENDS.get(THROTTLE_CACHE_BACKEND, THROTTLE_CACHE_BACKEND),
+        "LOCATION": os.environ.get(
+            "THROTTLE_CACHE_LOCATION",
+            str(BASE_DIR / ".cache" / "throttle")
+            if THROTTLE_CACHE_BACKEND == "file"
+            else "throttle",
+        ),
+    },
+    "tokens": {
+        "BACKEND": CACHE_BACKENDS.get(TOKEN_CACHE_BACKEND, TOKEN_CACHE_BACKEND),
+        "LOCATION": os.environ.get(
+            "TOKEN_CACHE_LOCATION",
+            str(BASE_DIR / ".cache" / "tokens")
+            if TOKEN_CACHE_BACKEND == "file"
+            else "tokens",
+        ),
+        # culling would drop live revocations, they expire with their token
+        "OPTIONS": {"MAX_ENTRIES": sys.maxsize},
+    },
+    "responses": {
+        "BACKEND": CACHE_BACKENDS.get(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_BACKEND),
+        "LOCATION": os.environ.get(
+            "RESPONSE_CACHE_LOCATION",
+            str(BASE_DIR / ".cache" / "responses")
+            if RESPONSE_CACHE_BACKEND == "file"
+            else "responses",
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "idempotency": {
+        "BACKEND": CACHE_BACKENDS.get(
+            IDEMPOTENCY_CACHE_BACKEND, IDEMPOTENCY_CACHE_BACKEND
+        ),
+        "LOCATION": os.environ.get(
+            "IDEMPOTENCY_CACHE_LOCATION",
+            str(BASE_DIR / ".cache" / "idempotency")
+            if IDEMPOTENCY_CACHE_BACKEND == "file"
+            else "idempotency",
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
 }
 
 
@@ -105,6 +303,38 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+#  PASSWORD_HASHER picks the algorithm of new hashes: "scrypt" (default), "argon2"
+#  (needs argon2-cffi) or "pbkdf2". Hashes made with another algorithm or cost still
+#  verify and are rehashed on the next successful login.
+#  Hashing runs on a pool of WORKERS threads, and at most MAX_PENDING more hashes
+#  may wait for it before login/register answer 429.
+
+PASSWORD_CONF = {
+    "ALGORITHM": os.environ.get("PASSWORD_HASHER", "scrypt"),
+    "SCRYPT_WORK_FACTOR": int(os.environ.get("SCRYPT_WORK_FACTOR", 2**14)),
+    "ARGON2_TIME_COST": int(os.environ.get("ARGON2_TIME_COST", 2)),
+    "ARGON2_MEMORY_COST": int(os.environ.get("ARGON2_MEMORY_COST", 102400)),
+    "PBKDF2_ITERATIONS": int(os.environ.get("PBKDF2_ITERATIONS", 600000)),
+    "WORKERS": int(os.environ.get("PASSWORD_WORKERS", os.cpu_count() or 1)),
+    "MAX_PENDING": int(os.environ.get("PASSWORD_MAX_PENDING", 32)),
+    "RETRY_AFTER": 1,
+}
+
+PASSWORD_HASHER_CLASSES = {
+    "scrypt": "app.hashers.TunedScryptPasswordHasher",
+    "argon2": "app.hashers.TunedArgon2PasswordHasher",
+    "pbkdf2": "app.hashers.TunedPBKDF2PasswordHasher",
+}
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_CONF["ALGORITHM"]]] + [
+    path
+    for name, path in PASSWORD_HASHER_CLASSES.items()
+    if name != PASSWORD_CONF["ALGORITHM"]
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -135,6 +365,162 @@ CORS_ALLOW_CREDENTIALS = True
 X_FRAME_OPTIONS = "DENY"
 
 # JWT settings
-JWT_CONF = {"TOKEN_LIFETIME_HOURS": 5}
+#  CACHE_SIZE is the number of verified tokens kept in memory per process, and
+#  PRINCIPAL_CACHE_SIZE the number of users, each for PRINCIPAL_TTL seconds.
+#  Revoked token ids are kept in the REVOCATION_CACHE_ALIAS cache until the token
+#  expires, it must be shared by every process and must not evict entries.
+JWT_CONF = {
+    "TOKEN_LIFETIME_HOURS": 5,
+    "CACHE_SIZE": 10000,
+    "PRINCIPAL_CACHE_SIZE": 10000,
+    "PRINCIPAL_TTL": int(os.environ.get("JWT_PRINCIPAL_TTL", 60)),
+    "REVOCATION_CACHE_ALIAS": "tokens",
+}
+
+REST_FRAMEWORK = {
+    "TEST_REQUEST_DEFAULT_FORMAT": "json",
+    "DEFAULT_AUTHENTICATION_CLASSES": ["app.auth.JWTAuthentication"],
+    # instead of django.contrib.auth's AnonymousUser, which needs the auth app
+    "UNAUTHENTICATED_USER": "app.auth.AnonymousPrincipal",
+    # orjson backed when it is installed, the stdlib json module otherwise
+    "DEFAULT_RENDERER_CLASSES": [
+        "app.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "app.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+if SETTINGS_PROFILE == "api":
+    # the browsable API needs the templates
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = ["app.renderers.ORJSONRenderer"]
 
-REST_FRAMEWORK = {"TEST_REQUEST_DEFAULT_FORMAT": "json"}
+# Serialization settings
+#  With VALUES_MODE list endpoints read `.values()` dicts and render them with
+#  app.serializers.ValuesSerializer instead of a ModelSerializer per row.
+SERIALIZATION_CONF = {
+    "VALUES_MODE": os.environ.get("SERIALIZATION_VALUES_MODE", "True") == "True",
+}
+
+# Response cache settings
+#  TIMEOUT bounds how long an entry lives, writes invalidate entries right away.
+#  A missing entry is built by one request at a time, holding its lock for at most
+#  LOCK_SECONDS; the others wait up to WAIT_SECONDS for it, or get the previous entry
+#  of the same URL when it was built at most STALE_SECONDS ago (0 turns that off).
+RESPONSE_CACHE_CONF = {
+    "ALIAS": "responses",
+    "TIMEOUT": 300,
+    "LOCK_SECONDS": 10,
+    "WAIT_SECONDS": 5,
+    "POLL_INTERVAL": 0.02,
+    "STALE_SECONDS": 2,
+}
+
+# Idempotency keys, see app.idempotency
+#  TTL is how long a response is replayed to retries with its key. A request holds its
+#  key for at most LOCK_SECONDS, and a duplicate waits up to WAIT_SECONDS for it before
+#  getting a 409.
+IDEMPOTENCY_CONF = {
+    "ALIAS": "idempotency",
+    "TTL": 24 * 60 * 60,
+    "LOCK_SECONDS": 60,
+    "WAIT_SECONDS": 10,
+    "POLL_INTERVAL": 0.05,
+    "MAX_KEY_LENGTH": 255,
+}
+
+# Bulk endpoint settings
+#  BATCH_SIZE rows are written per transaction, MAX_ITEMS bounds a single request
+BULK_CONF = {"BATCH_SIZE": 1000, "MAX_ITEMS": 50000}
+
+# Background jobs, run by `python manage.py run_jobs` (see app.jobs)
+#  A worker claims up to BATCH_SIZE due jobs at a time and has LEASE_SECONDS to
+#  finish them before another worker may claim them again. Failed jobs are retried
+#  after BACKOFF_BASE * 2 ** attempts seconds (at most BACKOFF_MAX, with jitter),
+#  MAX_ATTEMPTS times in all.
+#  Questions with more than SYNC_DELETE_MAX_ANSWERS answers are deleted by a job,
+#  DELETE_BATCH_SIZE answers per transaction, and their DELETE answers 202.
+JOBS_CONF = {
+    "BATCH_SIZE": int(os.environ.get("JOBS_BATCH_SIZE", 100)),
+    "LEASE_SECONDS": int(os.environ.get("JOBS_LEASE_SECONDS", 300)),
+    "MAX_ATTEMPTS": int(os.environ.get("JOBS_MAX_ATTEMPTS", 5)),
+    "BACKOFF_BASE": 2,
+    "BACKOFF_MAX": 600,
+    "POLL_INTERVAL": float(os.environ.get("JOBS_POLL_INTERVAL", 1)),
+    "SYNC_DELETE_MAX_ANSWERS": int(
+        os.environ.get("JOBS_SYNC_DELETE_MAX_ANSWERS", 100)
+    ),
+    "DELETE_BATCH_SIZE": 1000,
+}
+
+# Real-time answer events, streamed by GET /questions/<id>/events/ (see app.pubsub)
+#  BACKEND fans events out to the streams; the default only reaches the streams of
+#  the process that wrote the answer. A stream buffers up to QUEUE_SIZE events and is
+#  closed when its client falls further behind. Idle streams get a comment every
+#  HEARTBEAT_SECONDS, and clients reconnect after RETRY_MS.
+PUBSUB_CONF = {
+    "BACKEND": os.environ.get("PUBSUB_BACKEND", "app.pubsub.InProcessBroker"),
+    "QUEUE_SIZE": int(os.environ.get("PUBSUB_QUEUE_SIZE", 100)),
+    "HEARTBEAT_SECONDS": float(os.environ.get("PUBSUB_HEARTBEAT_SECONDS", 15)),
+    "RETRY_MS": 3000,
+}
+
+# Profiling settings
+#  ON_DEMAND lets a request sent with `X-Profile: 1` run under cProfile, and
+#  SAMPLE_RATE is the share of all requests that are profiled anyway. Any client
+#  can send the header, so ON_DEMAND is off unless PROFILE_ON_DEMAND turns it on.
+#  DIR keeps the MAX_DUMPS newest dumps. Only WSGI requests are profiled.
+PROFILING_CONF = {
+    "ON_DEMAND": os.environ.get("PROFILE_ON_DEMAND") == "True",
+    "SAMPLE_RATE": float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+    "DIR": os.environ.get("PROFILE_DIR", str(BASE_DIR / "profiles")),
+    "MAX_DUMPS": int(os.environ.get("PROFILE_MAX_DUMPS", 100)),
+}
+
+# Rate limiting settings
+#  Requests are "auth" (login, register), "write" (other POST/PUT/DELETE) or "read".
+#  RATES are token buckets per client IP and per JWT user of each class, "N/period"
+#  allowing bursts of N and refilling N per second/min/hour/day; None turns one off.
+#  CONCURRENCY caps the requests of a class served at once by a process.
+#  NUM_PROXIES is the number of trusted proxies in front of the app: the client
+#  IP is read that many addresses from the end of X-Forwarded-For, and with 0
+#  the header is ignored, as any client can send it.
+THROTTLE_CONF = {
+    "CACHE_ALIAS": "throttle",
+    "NUM_PROXIES": int(os.environ.get("THROTTLE_NUM_PROXIES", 0)),
+    "RATES": {
+        "auth_ip": os.environ.get("THROTTLE_AUTH_IP_RATE", "30/min"),
+        "write_ip": os.environ.get("THROTTLE_WRITE_IP_RATE", "600/min"),
+        "write_user": os.environ.get("THROTTLE_WRITE_USER_RATE", "120/min"),
+        "read_ip": os.environ.get("THROTTLE_READ_IP_RATE"),
+        "read_user": os.environ.get("THROTTLE_READ_USER_RATE"),
+    },
+    "CONCURRENCY": {
+        "auth": int(os.environ.get("CONCURRENCY_AUTH", 64)),
+        "write": int(os.environ.get("CONCURRENCY_WRITE", 32)),
+        "read": int(os.environ.get("CONCURRENCY_READ", 256)),
+    },
+    "RETRY_AFTER": 1,
+}
+
+# Trending feed settings, see app.ranking
+#  An answer counts half as much towards its question's trending score every
+#  HALF_LIFE_HOURS. Run `python manage.py rebuild_question_ranks` after changing it.
+RANKING_CONF = {
+    "HALF_LIFE_HOURS": float(os.environ.get("RANKING_HALF_LIFE_HOURS", 6)),
+}
+
+# Pagination settings
+#  STREAM_CHUNK_SIZE is the number of rows fetched per round trip when streaming
+#  MAX_IDS bounds the questions of one `?ids=` multi-get
+#  MAX_SEARCH_PAGE bounds the search `?page=`, whose hits are found with an OFFSET
+PAGINATION_CONF = {
+    "PAGE_SIZE": 20,
+    "MAX_PAGE_SIZE": 100,
+    "STREAM_CHUNK_SIZE": 2000,
+    "MAX_IDS": 100,
+    "MAX_SEARCH_PAGE": 100,
+}
@@ -13,10 +13,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path("", include("app.urls")),
-    path('admin/', admin.site.urls),
+    path("", include(settings.API_URLCONF)),
 ]
+
+# not installed in the "api" settings profile
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin/", admin.site.urls))